@@ -6,8 +6,14 @@ Application Module
 
 import warnings
 
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
+
 from .debugging import bacpypes_debugging, DebugContents, ModuleLogger
 from .comm import ApplicationServiceElement, bind
+from .task import FunctionTask, TaskManager
 from .iocb import IOController, SieveQueue
 
 from .pdu import Address
@@ -51,6 +57,11 @@ class DeviceInfo(DebugContents):
         'vendorID',
         'maxNpduLength',
         'maxSegmentsAccepted',
+        'smoothedRoundTripTime',
+        'roundTripTimeVariance',
+        'retryTimeout',
+        'noResponseCount',
+        'requestWindow',
         )
 
     def __init__(self):
@@ -64,6 +75,15 @@ class DeviceInfo(DebugContents):
         self.maxNpduLength = 1497           # maximum we can send in transit
         self.maxSegmentsAccepted = None     # value for proposed/actual window size
 
+        # this information is from the responses to confirmed requests
+        self.smoothedRoundTripTime = None   # milliseconds
+        self.roundTripTimeVariance = None   # milliseconds
+        self.retryTimeout = None            # milliseconds, None for the default
+        self.noResponseCount = 0            # requests in a row with no response
+
+        # confirmed requests that can be in flight, None for the default
+        self.requestWindow = None
+
 bacpypes_debugging(DeviceInfo)
 
 #
@@ -72,11 +92,23 @@ bacpypes_debugging(DeviceInfo)
 
 class DeviceInfoCache:
 
-    def __init__(self):
-        if _debug: DeviceInfoCache._debug("__init__")
+    def __init__(self, max_size=None, ttl=None):
+        if _debug: DeviceInfoCache._debug("__init__ max_size=%r ttl=%r", max_size, ttl)
 
         # empty cache
         self.cache = {}
+        self.size = 0
+
+        # limit on the number of records and seconds a record can go unused,
+        # records that are in use by a transaction are never evicted
+        self.max_size = max_size
+        self.ttl = ttl
+        self._next_expire = None
+
+        # statistics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
 
     def has_device_info(self, key):
         """Return true iff cache has information about the device."""
@@ -84,6 +116,33 @@ class DeviceInfoCache:
 
         return key in self.cache
 
+    def _lookup(self, key):
+        """Return the record for the key, counting the hit or miss and
+        evicting it if it has not been used in time."""
+        info = self.cache.get(key, None)
+        if info is None:
+            self.misses += 1
+            return None
+
+        now = TaskManager().get_time()
+        if self.ttl and (now - info._last_used > self.ttl) and not self._in_use(info):
+            if _debug: DeviceInfoCache._debug("    - expired")
+            self._evict(info)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        info._last_used = now
+
+        return info
+
+    def peek_device_info(self, key):
+        """Return the information about the device if the cache has it
+        without adding a reference, otherwise None."""
+        if _debug: DeviceInfoCache._debug("peek_device_info %r", key)
+
+        return self._lookup(key)
+
     def add_device_info(self, apdu):
         """Create a device information record based on the contents of an
         IAmRequest and put it in the cache."""
@@ -106,6 +165,11 @@ class DeviceInfoCache:
 
             info.deviceIdentifier = apdu.iAmDeviceIdentifier[1]
 
+            # the cache keeps this reference
+            if info._resident:
+                info._ref_count -= 1
+            info._resident = True
+
         # update the rest of the values
         info.maxApduLengthAccepted = apdu.maxAPDULengthAccepted
         info.segmentationSupported = apdu.segmentationSupported
@@ -121,7 +185,7 @@ class DeviceInfoCache:
         if _debug: DeviceInfoCache._debug("get_device_info %r", key)
 
         if isinstance(key, int):
-            current_info = self.cache.get(key, None)
+            current_info = self._lookup(key)
 
         elif not isinstance(key, Address):
             raise TypeError("key must be integer or an address")
@@ -130,14 +194,20 @@ class DeviceInfoCache:
             raise TypeError("address must be a local or remote station")
 
         else:
-            current_info = self.cache.get(key, None)
+            current_info = self._lookup(key)
             if not current_info:
                 current_info = DeviceInfo()
                 current_info.address = key
                 current_info._cache_keys = (None, key)
                 current_info._ref_count = 1
+                current_info._resident = False
+                current_info._last_used = TaskManager().get_time()
 
                 self.cache[key] = current_info
+                self.size += 1
+
+                # make room
+                self.trim()
             else:
                 if _debug: DeviceInfoCache._debug("    - reference bump")
                 current_info._ref_count += 1
@@ -164,6 +234,14 @@ class DeviceInfoCache:
 
             cache_id = info.deviceIdentifier
 
+        elif (cache_id is None) and (info.deviceIdentifier is not None):
+            if _debug: DeviceInfoCache._debug("    - device identifier added")
+
+            # records created by address can also be found by identifier
+            self.cache[info.deviceIdentifier] = info
+
+            cache_id = info.deviceIdentifier
+
         if (cache_address is not None) and (info.address != cache_address):
             if _debug: DeviceInfoCache._debug("    - device address updated")
 
@@ -192,10 +270,286 @@ class DeviceInfoCache:
             del self.cache[cache_id]
         if cache_address is not None:
             del self.cache[cache_address]
+        self.size -= 1
         if _debug: DeviceInfoCache._debug("    - released")
 
+    def _in_use(self, info):
+        """Return true if a transaction has a reference to the record."""
+        return info._ref_count > int(info._resident)
+
+    def _evict(self, info):
+        if _debug: DeviceInfoCache._debug("_evict %r", info)
+
+        cache_id, cache_address = info._cache_keys
+        if cache_id is not None:
+            del self.cache[cache_id]
+        if cache_address is not None:
+            del self.cache[cache_address]
+        self.size -= 1
+        self.evictions += 1
+
+    def trim(self):
+        """Evict the records that have not been used within the time to live
+        and, if there are still too many, the least recently used ones."""
+        if _debug: DeviceInfoCache._debug("trim")
+
+        now = TaskManager().get_time()
+
+        # look for expired records every so often rather than every time
+        expire = self.ttl and ((self._next_expire is None) or (now >= self._next_expire))
+        if not (expire or (self.max_size and (self.size > self.max_size))):
+            return
+        if expire:
+            self._next_expire = now + self.ttl
+
+        # records that are not in use, oldest first
+        records = [info for key, info in self.cache.items()
+            if isinstance(key, Address) and not self._in_use(info)]
+        records.sort(key=lambda info: info._last_used)
+        if _debug: DeviceInfoCache._debug("    - candidates: %r", len(records))
+
+        i = 0
+        if self.ttl:
+            while (i < len(records)) and (now - records[i]._last_used > self.ttl):
+                self._evict(records[i])
+                i += 1
+
+        # evict a little more than needed so this is not done every time
+        if self.max_size and (self.size > self.max_size):
+            low_water = self.max_size - max(1, self.max_size // 10)
+            while (i < len(records)) and (self.size > low_water):
+                self._evict(records[i])
+                i += 1
+
 bacpypes_debugging(DeviceInfoCache)
 
+#
+#   PersistentDeviceInfoCache
+#
+
+class PersistentDeviceInfoCache(DeviceInfoCache):
+
+    """A device information cache that is kept in an SQLite database.  The
+    records are loaded when it is created so an application that restarts
+    knows about the devices it has seen before, and the records that are
+    updated are written back in batches."""
+
+    # (attribute, column) of the information that is saved
+    _columns = (
+        ('deviceIdentifier', 'device_identifier'),
+        ('maxApduLengthAccepted', 'max_apdu_length_accepted'),
+        ('segmentationSupported', 'segmentation_supported'),
+        ('vendorID', 'vendor_id'),
+        ('maxNpduLength', 'max_npdu_length'),
+        ('maxSegmentsAccepted', 'max_segments_accepted'),
+        ('requestWindow', 'request_window'),
+        )
+
+    def __init__(self, filename, flush_interval=5.0, max_size=None, ttl=None):
+        if _debug: PersistentDeviceInfoCache._debug("__init__ %r flush_interval=%r max_size=%r ttl=%r", filename, flush_interval, max_size, ttl)
+        DeviceInfoCache.__init__(self, max_size, ttl)
+
+        if sqlite3 is None:
+            raise RuntimeError("sqlite3 not available")
+
+        # seconds to wait before writing the updated records
+        self.flush_interval = flush_interval
+
+        # records to write and the addresses of the ones to delete
+        self.dirty = {}
+        self.deleted = set()
+        self._flush_task = FunctionTask(self.flush)
+
+        # the connection is used by the thread running core.run()
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        self.connection.execute(
+            "create table if not exists device_info (address text primary key, "
+            + ", ".join(column for attr, column in self._columns)
+            + ")"
+            )
+        self.connection.execute(
+            "create index if not exists device_info_identifier on device_info (device_identifier)"
+            )
+        self.connection.commit()
+
+        self.load()
+
+    def load(self):
+        """Put the saved records in the cache, they stay in the cache like the
+        ones added from an IAmRequest."""
+        if _debug: PersistentDeviceInfoCache._debug("load")
+
+        now = TaskManager().get_time()
+
+        cursor = self.connection.execute(
+            "select address, "
+            + ", ".join(column for attr, column in self._columns)
+            + " from device_info"
+            )
+        for row in cursor.fetchall():
+            self._add_row(row, now)
+
+        # there might be more than there is room for
+        self.trim()
+
+    def _add_row(self, row, now):
+        """Put a saved record in the cache like one added from an IAmRequest
+        and return it."""
+        info = DeviceInfo()
+        info.address = Address(str(row[0]))
+        for (attr, column), value in zip(self._columns, row[1:]):
+            setattr(info, attr, value)
+        if _debug: PersistentDeviceInfoCache._debug("    - info: %r", info)
+
+        if info.deviceIdentifier is None:
+            info._cache_keys = (None, info.address)
+        else:
+            info._cache_keys = (info.deviceIdentifier, info.address)
+            self.cache[info.deviceIdentifier] = info
+        info._ref_count = 1
+        info._resident = True
+        info._last_used = now
+
+        self.cache[info.address] = info
+        self.size += 1
+
+        return info
+
+    def _lookup(self, key):
+        """Return the record for the key, records that have been evicted
+        are read back from the database."""
+        info = DeviceInfoCache._lookup(self, key)
+        if info is not None:
+            return info
+
+        now = TaskManager().get_time()
+
+        # evicted before it was written
+        if isinstance(key, Address):
+            info = self.dirty.get(key, None)
+        else:
+            for info in self.dirty.values():
+                if info.deviceIdentifier == key:
+                    break
+            else:
+                info = None
+
+        if info is not None:
+            if _debug: PersistentDeviceInfoCache._debug("    - from the dirty records")
+
+            # the keys might be used by another record by now
+            cache_id, cache_address = info._cache_keys
+            if (cache_address in self.cache) or ((cache_id is not None) and (cache_id in self.cache)):
+                return None
+
+            # back in the cache with the reference it keeps
+            if cache_id is not None:
+                self.cache[cache_id] = info
+            self.cache[cache_address] = info
+            self.size += 1
+            info._ref_count = 1
+            info._last_used = now
+        else:
+            if isinstance(key, Address):
+                where, value = "address", str(key)
+            else:
+                where, value = "device_identifier", key
+
+            cursor = self.connection.execute(
+                "select address, "
+                + ", ".join(column for attr, column in self._columns)
+                + " from device_info where " + where + " = ?",
+                (value,),
+                )
+            for row in cursor.fetchall():
+                # skip the ones that moved or would replace another record
+                address = Address(str(row[0]))
+                if (address in self.deleted) or (address in self.cache):
+                    continue
+                if (row[1] is not None) and (row[1] in self.cache):
+                    continue
+
+                if _debug: PersistentDeviceInfoCache._debug("    - from the database")
+                info = self._add_row(row, now)
+                break
+            else:
+                return None
+
+        # make room
+        self.trim()
+
+        return info
+
+    def update_device_info(self, info):
+        if _debug: PersistentDeviceInfoCache._debug("update_device_info %r", info)
+
+        old_address = info._cache_keys[1]
+        DeviceInfoCache.update_device_info(self, info)
+
+        # the record moved
+        if (old_address is not None) and (old_address != info.address):
+            self.dirty.pop(old_address, None)
+            self.deleted.add(old_address)
+
+        # only the records from an IAmRequest or the database are saved,
+        # not the ones made for the source of a request
+        if info._resident and (info.address is not None):
+            self.dirty[info.address] = info
+            self.deleted.discard(info.address)
+
+            # write it later along with the others
+            if not self._flush_task.isScheduled:
+                self._flush_task.install_task(delta=self.flush_interval)
+
+    def release_device_info(self, info):
+        if _debug: PersistentDeviceInfoCache._debug("release_device_info %r", info)
+
+        DeviceInfoCache.release_device_info(self, info)
+
+        # records that are no longer in the cache are not written
+        if (not info._resident) and (info.address is not None) \
+                and (self.dirty.get(info.address, None) is info) \
+                and (self.cache.get(info.address, None) is not info):
+            del self.dirty[info.address]
+
+    def flush(self):
+        """Write the updated records to the database."""
+        if _debug: PersistentDeviceInfoCache._debug("flush")
+
+        if self._flush_task.isScheduled:
+            self._flush_task.suspend_task()
+
+        dirty, self.dirty = self.dirty, {}
+        deleted, self.deleted = self.deleted, set()
+        if _debug: PersistentDeviceInfoCache._debug("    - dirty, deleted: %r, %r", len(dirty), len(deleted))
+        if not (dirty or deleted):
+            return
+
+        self.connection.executemany(
+            "delete from device_info where address = ?",
+            [(str(address),) for address in deleted],
+            )
+        self.connection.executemany(
+            "insert or replace into device_info (address, "
+            + ", ".join(column for attr, column in self._columns)
+            + ") values (?"
+            + ", ?" * len(self._columns)
+            + ")",
+            [ (str(address),) + tuple(getattr(info, attr) for attr, column in self._columns)
+                for address, info in dirty.items()
+                ],
+            )
+        self.connection.commit()
+
+    def close(self):
+        """Write what has been updated and close the database."""
+        if _debug: PersistentDeviceInfoCache._debug("close")
+
+        self.flush()
+        self.connection.close()
+
+bacpypes_debugging(PersistentDeviceInfoCache)
+
 #
 #   Application
 #
@@ -401,6 +755,30 @@ class ApplicationIOController(IOController, Application):
         # queues for each address
         self.queue_by_address = {}
 
+        # confirmed requests in flight to each address, unless the address
+        # or the device information has its own
+        self.window = 1
+        self.window_by_address = {}
+
+    def get_window(self, address):
+        """Return the number of confirmed requests that can be in flight to
+        an address at the same time."""
+        if _debug: ApplicationIOController._debug("get_window %r", address)
+
+        window = self.window_by_address.get(address, None)
+        if window is not None:
+            return window
+
+        # devices that have stopped responding get one at a time
+        device_info = self.deviceInfoCache.peek_device_info(address)
+        if device_info:
+            if device_info.noResponseCount:
+                return 1
+            if device_info.requestWindow is not None:
+                return device_info.requestWindow
+
+        return self.window
+
     def process_io(self, iocb):
         if _debug: ApplicationIOController._debug("process_io %r", iocb)
 
@@ -411,7 +789,7 @@ class ApplicationIOController(IOController, Application):
         # look up the queue
         queue = self.queue_by_address.get(destination_address, None)
         if not queue:
-            queue = SieveQueue(self.request, destination_address)
+            queue = SieveQueue(self.request, destination_address, self.get_window(destination_address))
             self.queue_by_address[destination_address] = queue
         if _debug: ApplicationIOController._debug("    - queue: %r", queue)
 
@@ -428,16 +806,19 @@ class ApplicationIOController(IOController, Application):
             return
         if _debug: ApplicationIOController._debug("    - queue: %r", queue)
 
-        # make sure it has an active iocb
-        if not queue.active_iocb:
+        # find the request it is for
+        iocb = queue.find_io(apdu)
+        if iocb is None:
             ApplicationIOController._debug("no active request for %r" % (address,))
             return
 
         # this request is complete
-        if isinstance(apdu, (None.__class__, SimpleAckPDU, ComplexAckPDU)):
-            queue.complete_io(queue.active_iocb, apdu)
+        if isinstance(apdu, UnconfirmedRequestPDU):
+            queue.complete_io(iocb, None)
+        elif isinstance(apdu, (SimpleAckPDU, ComplexAckPDU)):
+            queue.complete_io(iocb, apdu)
         elif isinstance(apdu, (ErrorPDU, RejectPDU, AbortPDU)):
-            queue.abort_io(queue.active_iocb, apdu)
+            queue.abort_io(iocb, apdu)
         else:
             raise RuntimeError("unrecognized APDU type")
         if _debug: Application._debug("    - controller finished")
@@ -455,7 +836,7 @@ class ApplicationIOController(IOController, Application):
 
         # if this was an unconfirmed request, it's complete, no message
         if isinstance(apdu, UnconfirmedRequestPDU):
-            self._app_complete(apdu.pduDestination, None)
+            self._app_complete(apdu.pduDestination, apdu)
 
     def confirmation(self, apdu):
         if _debug: ApplicationIOController._debug("confirmation %r", apdu)
@@ -9,12 +9,12 @@ from time import time as _time
 from .debugging import ModuleLogger, DebugContents, bacpypes_debugging
 
 from .comm import Client, ServiceAccessPoint, ApplicationServiceElement
-from .task import OneShotTask
+from .task import OneShotTask, TaskManager
 
 from .pdu import Address
 from .apdu import AbortPDU, AbortReason, ComplexAckPDU, \
     ConfirmedRequestPDU, Error, ErrorPDU, RejectPDU, SegmentAckPDU, \
-    SimpleAckPDU, UnconfirmedRequestPDU, apdu_types, \
+    SimpleAckPDU, UnconfirmedRequestPDU, APCISequence, apdu_types, \
     unconfirmed_request_types, confirmed_request_types, complex_ack_types, \
     error_types
 from .errors import RejectException, AbortException
@@ -44,7 +44,7 @@ class SSM(OneShotTask, DebugContents):
         , 'SEGMENTED_RESPONSE', 'SEGMENTED_CONFIRMATION', 'COMPLETED', 'ABORTED'
         ]
 
-    _debug_contents = ('ssmSAP', 'localDevice', 'remoteDevice', 'invokeID'
+    _debug_contents = ('ssmSAP', 'localDevice', 'remoteDevice', 'invokeID', 'transactionKey', 'networkPriority'
         , 'state', 'segmentAPDU', 'segmentSize', 'segmentCount', 'maxSegmentsAccepted'
         , 'retryCount', 'segmentRetryCount', 'sentAllSegments', 'lastSequenceNumber'
         , 'initialSequenceNumber', 'actualWindowSize', 'proposedWindowSize'
@@ -58,6 +58,8 @@ class SSM(OneShotTask, DebugContents):
         self.ssmSAP = sap                   # service access point
         self.remoteDevice = remoteDevice    # remote device information, a DeviceInfo instance
         self.invokeID = None                # invoke ID
+        self.transactionKey = None          # (address, invoke ID) in the SAP table
+        self.networkPriority = 0            # network priority of the request
 
         self.state = IDLE                   # initial state
         self.segmentAPDU = None             # refers to request or response
@@ -167,8 +169,9 @@ class SSM(OneShotTask, DebugContents):
         else:
             raise RuntimeError("invalid APDU type for segmentation context")
 
-        # maintain the the user data reference
+        # maintain the the user data reference and network priority
         segAPDU.pduUserData = self.segmentAPDU.pduUserData
+        segAPDU.pduNetworkPriority = max(self.segmentAPDU.pduNetworkPriority, self.networkPriority)
 
         # make sure the destination is set
         segAPDU.pduDestination = self.remoteDevice.address
@@ -241,6 +244,9 @@ class ClientSSM(SSM):
         # initialize the retry count
         self.retryCount = 0
 
+        # when the unsegmented request was sent, for the round trip time
+        self.requestTime = None
+
     def set_state(self, newState, timer=0):
         """This function is called when the client wants to change state."""
         if _debug: ClientSSM._debug("set_state %r (%s) timer=%r", newState, SSM.transactionLabels[newState], timer)
@@ -251,7 +257,7 @@ class ClientSSM(SSM):
         # when completed or aborted, remove tracking
         if (newState == COMPLETED) or (newState == ABORTED):
             if _debug: ClientSSM._debug("    - remove from active transactions")
-            self.ssmSAP.clientTransactions.remove(self)
+            self.ssmSAP.remove_client_transaction(self)
 
             if _debug: ClientSSM._debug("    - release device information")
             self.ssmSAP.deviceInfoCache.release_device_info(self.remoteDevice)
@@ -265,6 +271,9 @@ class ClientSSM(SSM):
         apdu.pduSource = None
         apdu.pduDestination = self.remoteDevice.address
 
+        # segments, acks and aborts go at the priority of the request
+        apdu.pduNetworkPriority = max(apdu.pduNetworkPriority, self.networkPriority)
+
         # send it via the device
         self.ssmSAP.request(apdu)
 
@@ -295,8 +304,9 @@ class ClientSSM(SSM):
             # this request overrides the default
             self.maxSegmentsAccepted = apdu.apduMaxSegs
 
-        # save the invoke ID
+        # save the invoke ID and network priority
         self.invokeID = apdu.apduInvokeID
+        self.networkPriority = apdu.pduNetworkPriority
         if _debug: ClientSSM._debug("    - invoke ID: %r", self.invokeID)
 
         # compute the segment count ### minus the header?
@@ -330,7 +340,8 @@ class ClientSSM(SSM):
             # SendConfirmedUnsegmented
             self.sentAllSegments = True
             self.retryCount = 0
-            self.set_state(AWAIT_CONFIRMATION, self.ssmSAP.retryTimeout)
+            self.requestTime = TaskManager().get_time()
+            self.set_state(AWAIT_CONFIRMATION, self.ssmSAP.get_retry_timeout(self.remoteDevice))
         else:
             # SendConfirmedSegmented
             self.sentAllSegments = False
@@ -419,7 +430,7 @@ class ClientSSM(SSM):
             # final ack received?
             elif self.sentAllSegments:
                 if _debug: ClientSSM._debug("    - all done sending request")
-                self.set_state(AWAIT_CONFIRMATION, self.ssmSAP.retryTimeout)
+                self.set_state(AWAIT_CONFIRMATION, self.ssmSAP.get_retry_timeout(self.remoteDevice))
 
             # more segments to send
             else:
@@ -494,6 +505,15 @@ class ClientSSM(SSM):
     def await_confirmation(self, apdu):
         if _debug: ClientSSM._debug("await_confirmation %r", apdu)
 
+        # the device is responding, if the request wasn't resent this is a
+        # round trip time sample
+        if (self.retryCount == 0) and (self.requestTime is not None):
+            rtt = (TaskManager().get_time() - self.requestTime) * 1000.0
+            if _debug: ClientSSM._debug("    - round trip time: %r", rtt)
+
+            self.ssmSAP.update_retry_timeout(self.remoteDevice, rtt)
+        self.remoteDevice.noResponseCount = 0
+
         if (apdu.apduType == AbortPDU.pduType):
             if _debug: ClientSSM._debug("    - server aborted")
 
@@ -554,9 +574,18 @@ class ClientSSM(SSM):
     def await_confirmation_timeout(self):
         if _debug: ClientSSM._debug("await_confirmation_timeout")
 
+        # give the device more time to respond
+        self.ssmSAP.backoff_retry_timeout(self.remoteDevice)
+
+        # devices that haven't responded recently only get one try
+        if self.remoteDevice.noResponseCount and self.ssmSAP.adaptiveRetryTimeout:
+            retryCount = 1
+        else:
+            retryCount = self.ssmSAP.retryCount
+
         self.retryCount += 1
-        if self.retryCount < self.ssmSAP.retryCount:
-            if _debug: ClientSSM._debug("    - no response, try again (%d < %d)", self.retryCount, self.ssmSAP.retryCount)
+        if self.retryCount < retryCount:
+            if _debug: ClientSSM._debug("    - no response, try again (%d < %d)", self.retryCount, retryCount)
 
             # save the retry count, indication acts like the request is coming
             # from the application so the retryCount gets re-initialized.
@@ -565,6 +594,11 @@ class ClientSSM(SSM):
             self.retryCount = saveCount
         else:
             if _debug: ClientSSM._debug("    - retry count exceeded")
+
+            # the device isn't slow, it isn't there
+            self.remoteDevice.noResponseCount += 1
+            self.ssmSAP.update_retry_timeout(self.remoteDevice)
+
             abort = self.abort(AbortReason.noResponse)
             self.response(abort)
 
@@ -658,7 +692,7 @@ class ServerSSM(SSM):
         # when completed or aborted, remove tracking
         if (newState == COMPLETED) or (newState == ABORTED):
             if _debug: ServerSSM._debug("    - remove from active transactions")
-            self.ssmSAP.serverTransactions.remove(self)
+            del self.ssmSAP.serverTransactions[self.transactionKey]
 
             if _debug: ServerSSM._debug("    - release device information")
             self.ssmSAP.deviceInfoCache.release_device_info(self.remoteDevice)
@@ -700,6 +734,9 @@ class ServerSSM(SSM):
         apdu.pduSource = None
         apdu.pduDestination = self.remoteDevice.address
 
+        # responses go at the priority of the request (6.2.2)
+        apdu.pduNetworkPriority = max(apdu.pduNetworkPriority, self.networkPriority)
+
         # send it via the device
         self.ssmSAP.request(apdu)
 
@@ -834,8 +871,9 @@ class ServerSSM(SSM):
         if not isinstance(apdu, ConfirmedRequestPDU):
             raise RuntimeError("invalid APDU (5)")
 
-        # save the invoke ID
+        # save the invoke ID and network priority
         self.invokeID = apdu.apduInvokeID
+        self.networkPriority = apdu.pduNetworkPriority
         if _debug: ServerSSM._debug("    - invoke ID: %r", self.invokeID)
 
         # make sure the device information is synced with the request
@@ -1066,18 +1104,32 @@ class StateMachineAccessPoint(Client, ServiceAccessPoint):
         # save a reference to the device information cache
         self.deviceInfoCache = deviceInfoCache
 
-        # client settings
-        self.nextInvokeID = 1
-        self.clientTransactions = []
+        # client settings, next invoke ID by address and transactions
+        # by (address, invoke ID), when there are more than the maximum
+        # number of devices the ones with no transactions that have gone
+        # the longest without a request are forgotten
+        self.nextInvokeID = {}
+        self.clientTransactions = {}
+        self.clientTransactionCount = {}
+        self.maxInvokeIDDevices = 1024
+        self._invokeIDUsed = {}
+        self._invokeIDSequence = 0
 
-        # server settings
-        self.serverTransactions = []
+        # server settings, transactions by (address, invoke ID)
+        self.serverTransactions = {}
 
         # confirmed request defaults
         self.retryCount = 3
         self.retryTimeout = 3000
         self.maxApduLengthAccepted = 1024
 
+        # the retry timeout for a device is estimated from the round trip
+        # time of its responses within these bounds, until there is an
+        # estimate the retry timeout above is used
+        self.adaptiveRetryTimeout = True
+        self.minRetryTimeout = 500
+        self.maxRetryTimeout = 10000
+
         # segmentation defaults
         self.segmentationSupported = 'noSegmentation'
         self.segmentTimeout = 1500
@@ -1099,27 +1151,113 @@ class StateMachineAccessPoint(Client, ServiceAccessPoint):
         # layer to form a response and send it
         self.applicationTimeout = 3000
 
-    def get_next_invoke_id(self, addr):
-        """Called by clients to get an unused invoke ID."""
-        if _debug: StateMachineAccessPoint._debug("get_next_invoke_id")
+    def get_retry_timeout(self, remoteDevice):
+        """Return the number of milliseconds to wait for a response to a
+        confirmed request sent to a device."""
+        if _debug: StateMachineAccessPoint._debug("get_retry_timeout %r", remoteDevice)
 
-        initialID = self.nextInvokeID
-        while 1:
-            invokeID = self.nextInvokeID
-            self.nextInvokeID = (self.nextInvokeID + 1) % 256
+        if (not self.adaptiveRetryTimeout) or (remoteDevice.retryTimeout is None):
+            return self.retryTimeout
 
-            # see if we've checked for them all
-            if initialID == self.nextInvokeID:
-                raise RuntimeError("no available invoke ID")
+        return remoteDevice.retryTimeout
 
-            for tr in self.clientTransactions:
-                if (invokeID == tr.invokeID) and (addr == tr.remoteDevice.address):
-                    break
-            else:
+    def update_retry_timeout(self, remoteDevice, rtt=None):
+        """Update the round trip time estimates of a device with a new
+        sample in milliseconds, like RFC 6298, and compute its retry timeout.
+        With no sample the retry timeout goes back to what the estimates
+        say it should be."""
+        if _debug: StateMachineAccessPoint._debug("update_retry_timeout %r %r", remoteDevice, rtt)
+
+        srtt = remoteDevice.smoothedRoundTripTime
+        rttvar = remoteDevice.roundTripTimeVariance
+
+        if rtt is None:
+            pass
+        elif srtt is None:
+            srtt = rtt
+            rttvar = rtt / 2.0
+        else:
+            rttvar = 0.75 * rttvar + 0.25 * abs(srtt - rtt)
+            srtt = 0.875 * srtt + 0.125 * rtt
+
+        remoteDevice.smoothedRoundTripTime = srtt
+        remoteDevice.roundTripTimeVariance = rttvar
+
+        if srtt is None:
+            remoteDevice.retryTimeout = None
+        else:
+            remoteDevice.retryTimeout = min(max(srtt + 4.0 * rttvar, self.minRetryTimeout), self.maxRetryTimeout)
+        if _debug: StateMachineAccessPoint._debug("    - retry timeout: %r", remoteDevice.retryTimeout)
+
+    def backoff_retry_timeout(self, remoteDevice):
+        """A request to the device has timed out, double its retry
+        timeout."""
+        if _debug: StateMachineAccessPoint._debug("backoff_retry_timeout %r", remoteDevice)
+
+        if not self.adaptiveRetryTimeout:
+            return
+
+        remoteDevice.retryTimeout = min(2 * self.get_retry_timeout(remoteDevice), max(self.maxRetryTimeout, self.retryTimeout))
+        if _debug: StateMachineAccessPoint._debug("    - retry timeout: %r", remoteDevice.retryTimeout)
+
+    def get_next_invoke_id(self, addr):
+        """Called by clients to get an unused invoke ID, each device has its
+        own sequence of them."""
+        if _debug: StateMachineAccessPoint._debug("get_next_invoke_id %r", addr)
+
+        # pick up where the last one for this device left off
+        nextInvokeID = self.nextInvokeID.get(addr, None)
+        if nextInvokeID is None:
+            nextInvokeID = 1
+
+            # make room
+            if len(self.nextInvokeID) >= self.maxInvokeIDDevices:
+                self._trim_invoke_ids()
+
+        for i in range(256):
+            invokeID = (nextInvokeID + i) % 256
+            if (addr, invokeID) not in self.clientTransactions:
                 break
+        else:
+            raise RuntimeError("no available invoke ID")
+
+        self.nextInvokeID[addr] = (invokeID + 1) % 256
+
+        # remember when it was used
+        self._invokeIDSequence += 1
+        self._invokeIDUsed[addr] = self._invokeIDSequence
 
         return invokeID
 
+    def _trim_invoke_ids(self):
+        """Forget the devices that have no client transactions and have gone
+        the longest without a request."""
+        if _debug: StateMachineAccessPoint._debug("_trim_invoke_ids")
+
+        addrs = [addr for addr in self.nextInvokeID
+            if addr not in self.clientTransactionCount]
+        addrs.sort(key=lambda addr: self._invokeIDUsed.get(addr, 0))
+        if _debug: StateMachineAccessPoint._debug("    - candidates: %r", len(addrs))
+
+        # forget a little more than needed so this is not done every time
+        low_water = self.maxInvokeIDDevices - max(1, self.maxInvokeIDDevices // 10)
+        for addr in addrs[:max(0, len(self.nextInvokeID) - low_water)]:
+            del self.nextInvokeID[addr]
+            self._invokeIDUsed.pop(addr, None)
+
+    def remove_client_transaction(self, tr):
+        """Called by a client transaction when it is finished."""
+        if _debug: StateMachineAccessPoint._debug("remove_client_transaction %r", tr)
+
+        del self.clientTransactions[tr.transactionKey]
+
+        addr = tr.transactionKey[0]
+        count = self.clientTransactionCount.get(addr, 1) - 1
+        if count:
+            self.clientTransactionCount[addr] = count
+        else:
+            self.clientTransactionCount.pop(addr, None)
+
     def confirmation(self, pdu):
         """Packets coming up the stack are APDU's."""
         if _debug: StateMachineAccessPoint._debug("confirmation %r", pdu)
@@ -1153,10 +1291,9 @@ class StateMachineAccessPoint(Client, ServiceAccessPoint):
 
         if isinstance(apdu, ConfirmedRequestPDU):
             # find duplicates of this request
-            for tr in self.serverTransactions:
-                if (apdu.pduSource == tr.remoteDevice.address) and (apdu.apduInvokeID == tr.invokeID):
-                    break
-            else:
+            key = (apdu.pduSource, apdu.apduInvokeID)
+            tr = self.serverTransactions.get(key)
+            if tr is None:
                 # find the remote device information
                 remoteDevice = self.deviceInfoCache.get_device_info(apdu.pduSource)
 
@@ -1164,7 +1301,8 @@ class StateMachineAccessPoint(Client, ServiceAccessPoint):
                 tr = ServerSSM(self, remoteDevice)
 
                 # add it to our transactions to track it
-                self.serverTransactions.append(tr)
+                tr.transactionKey = key
+                self.serverTransactions[key] = tr
 
             # let it run with the apdu
             tr.indication(apdu)
@@ -1179,10 +1317,8 @@ class StateMachineAccessPoint(Client, ServiceAccessPoint):
             or isinstance(apdu, RejectPDU):
 
             # find the client transaction this is acking
-            for tr in self.clientTransactions:
-                if (apdu.apduInvokeID == tr.invokeID) and (apdu.pduSource == tr.remoteDevice.address):
-                    break
-            else:
+            tr = self.clientTransactions.get((apdu.pduSource, apdu.apduInvokeID))
+            if tr is None:
                 return
 
             # send the packet on to the transaction
@@ -1191,19 +1327,15 @@ class StateMachineAccessPoint(Client, ServiceAccessPoint):
         elif isinstance(apdu, AbortPDU):
             # find the transaction being aborted
             if apdu.apduSrv:
-                for tr in self.clientTransactions:
-                    if (apdu.apduInvokeID == tr.invokeID) and (apdu.pduSource == tr.remoteDevice.address):
-                        break
-                else:
+                tr = self.clientTransactions.get((apdu.pduSource, apdu.apduInvokeID))
+                if tr is None:
                     return
 
                 # send the packet on to the transaction
                 tr.confirmation(apdu)
             else:
-                for tr in self.serverTransactions:
-                    if (apdu.apduInvokeID == tr.invokeID) and (apdu.pduSource == tr.remoteDevice.address):
-                        break
-                else:
+                tr = self.serverTransactions.get((apdu.pduSource, apdu.apduInvokeID))
+                if tr is None:
                     return
 
                 # send the packet on to the transaction
@@ -1212,19 +1344,15 @@ class StateMachineAccessPoint(Client, ServiceAccessPoint):
         elif isinstance(apdu, SegmentAckPDU):
             # find the transaction being aborted
             if apdu.apduSrv:
-                for tr in self.clientTransactions:
-                    if (apdu.apduInvokeID == tr.invokeID) and (apdu.pduSource == tr.remoteDevice.address):
-                        break
-                else:
+                tr = self.clientTransactions.get((apdu.pduSource, apdu.apduInvokeID))
+                if tr is None:
                     return
 
                 # send the packet on to the transaction
                 tr.confirmation(apdu)
             else:
-                for tr in self.serverTransactions:
-                    if (apdu.apduInvokeID == tr.invokeID) and (apdu.pduSource == tr.remoteDevice.address):
-                        break
-                else:
+                tr = self.serverTransactions.get((apdu.pduSource, apdu.apduInvokeID))
+                if tr is None:
                     return
 
                 # send the packet on to the transaction
@@ -1265,9 +1393,8 @@ class StateMachineAccessPoint(Client, ServiceAccessPoint):
                 apdu.apduInvokeID = self.get_next_invoke_id(apdu.pduDestination)
             else:
                 # verify the invoke ID isn't already being used
-                for tr in self.clientTransactions:
-                    if (apdu.apduInvokeID == tr.invokeID) and (apdu.pduDestination == tr.remoteDevice.address):
-                        raise RuntimeError("invoke ID in use")
+                if (apdu.pduDestination, apdu.apduInvokeID) in self.clientTransactions:
+                    raise RuntimeError("invoke ID in use")
 
             # warning for bogus requests
             if (apdu.pduDestination.addrType != Address.localStationAddr) and (apdu.pduDestination.addrType != Address.remoteStationAddr):
@@ -1282,7 +1409,10 @@ class StateMachineAccessPoint(Client, ServiceAccessPoint):
             if _debug: StateMachineAccessPoint._debug("    - client segmentation state machine: %r", tr)
 
             # add it to our transactions to track it
-            self.clientTransactions.append(tr)
+            tr.transactionKey = (apdu.pduDestination, apdu.apduInvokeID)
+            self.clientTransactions[tr.transactionKey] = tr
+            self.clientTransactionCount[apdu.pduDestination] = \
+                self.clientTransactionCount.get(apdu.pduDestination, 0) + 1
 
             # let it run
             tr.indication(apdu)
@@ -1301,10 +1431,8 @@ class StateMachineAccessPoint(Client, ServiceAccessPoint):
                 or isinstance(apdu, RejectPDU) \
                 or isinstance(apdu, AbortPDU):
             # find the appropriate server transaction
-            for tr in self.serverTransactions:
-                if (apdu.apduInvokeID == tr.invokeID) and (apdu.pduDestination == tr.remoteDevice.address):
-                    break
-            else:
+            tr = self.serverTransactions.get((apdu.pduDestination, apdu.apduInvokeID))
+            if tr is None:
                 return
 
             # pass control to the transaction
@@ -1422,6 +1550,10 @@ class ApplicationServiceAccessPoint(ApplicationServiceElement, ServiceAccessPoin
                 ApplicationServiceAccessPoint._exception("confirmed request encoding error: %r", err)
                 return
 
+        elif isinstance(apdu, UnconfirmedRequestPDU) and not isinstance(apdu, APCISequence):
+            if _debug: ApplicationServiceAccessPoint._debug("    - already encoded")
+            xpdu = apdu
+
         elif isinstance(apdu, UnconfirmedRequestPDU):
             try:
                 xpdu = UnconfirmedRequestPDU()
@@ -25,6 +25,8 @@ def register_bvlpdu_type(klass):
 
 class BVLCI(PCI, DebugContents):
 
+    __slots__ = ('bvlciType', 'bvlciFunction', 'bvlciLength')
+
     _debug_contents = ('bvlciType', 'bvlciFunction', 'bvlciLength')
 
     result                              = 0x00
@@ -54,20 +56,18 @@ class BVLCI(PCI, DebugContents):
         self.bvlciFunction = bvlci.bvlciFunction
         self.bvlciLength = bvlci.bvlciLength
 
-    def encode(self, pdu):
-        """encode the contents of the BVLCI into the PDU."""
+    def encode(self, pdu, data=''):
+        """encode the contents of the BVLCI into the PDU, followed by the data."""
         if _debug: BVLCI._debug("encode %s", str(pdu))
 
         # copy the basics
         PCI.update(pdu, self)
 
-        pdu.put( self.bvlciType )               # 0x81
-        pdu.put( self.bvlciFunction )
-
         if (self.bvlciLength != len(self.pduData) + 4):
             raise EncodingError("invalid BVLCI length")
 
-        pdu.put_short( self.bvlciLength )
+        # type (0x81), function, and length
+        pdu.put_header('>BBH', (self.bvlciType, self.bvlciFunction, self.bvlciLength & 0xFFFF), data)
 
     def decode(self, pdu):
         """decode the contents of the PDU into the BVLCI."""
@@ -115,8 +115,7 @@ class BVLPDU(BVLCI, PDUData):
         super(BVLPDU, self).__init__(*args, **kwargs)
 
     def encode(self, pdu):
-        BVLCI.encode(self, pdu)
-        pdu.put_data(self.pduData)
+        BVLCI.encode(self, pdu, self.pduData)
 
     def decode(self, pdu):
         BVLCI.decode(self, pdu)
@@ -229,9 +228,12 @@ class WriteBroadcastDistributionTable(BVLPDU):
     def decode(self, bvlpdu):
         BVLCI.update(self, bvlpdu)
         self.bvlciBDT = []
-        while bvlpdu.pduData:
+        while bvlpdu.remaining():
             bdte = Address(unpack_ip_addr(bvlpdu.get_data(6)))
-            bdte.addrMask = bvlpdu.get_long()
+            mask = bvlpdu.get_long()
+            if mask != bdte.addrMask:
+                # addresses are shared, this entry needs its own
+                bdte = bdte.replace(addrMask=mask)
             self.bvlciBDT.append(bdte)
 
     def bvlpdu_contents(self, use_dict=None, as_class=dict):
@@ -309,9 +311,12 @@ class ReadBroadcastDistributionTableAck(BVLPDU):
 
         # decode the table
         self.bvlciBDT = []
-        while bvlpdu.pduData:
+        while bvlpdu.remaining():
             bdte = Address(unpack_ip_addr(bvlpdu.get_data(6)))
-            bdte.addrMask = bvlpdu.get_long()
+            mask = bvlpdu.get_long()
+            if mask != bdte.addrMask:
+                # addresses are shared, this entry needs its own
+                bdte = bdte.replace(addrMask=mask)
             self.bvlciBDT.append(bdte)
 
     def bvlpdu_contents(self, use_dict=None, as_class=dict):
@@ -511,7 +516,7 @@ class ReadForeignDeviceTableAck(BVLPDU):
     def decode(self, bvlpdu):
         BVLCI.update(self, bvlpdu)
         self.bvlciFDT = []
-        while bvlpdu.pduData:
+        while bvlpdu.remaining():
             fdte = FDTEntry()
             fdte.fdAddress = Address(unpack_ip_addr(bvlpdu.get_data(6)))
             fdte.fdTTL = bvlpdu.get_short()
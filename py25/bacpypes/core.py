@@ -12,6 +12,13 @@ import time
 import traceback
 import warnings
 
+from collections import deque
+
+try:
+    import selectors
+except ImportError:
+    selectors = None
+
 from .task import TaskManager
 from .debugging import bacpypes_debugging, ModuleLogger
 
@@ -22,8 +29,9 @@ _log = ModuleLogger(globals())
 # globals
 running = False
 taskManager = None
-deferredFns = []
+deferredFns = deque()
 sleeptime = 0.0
+loopBackend = None
 
 #
 #   stop
@@ -96,13 +104,177 @@ def print_stack(sig, frame):
 
 bacpypes_debugging(print_stack)
 
+#
+#   AsyncoreLoopBackend
+#
+#   Wait for socket activity the way BACpypes always has, by calling
+#   asyncore.loop() for a single pass.
+#
+
+class AsyncoreLoopBackend:
+
+    def __init__(self, socket_map=None):
+        if _debug: AsyncoreLoopBackend._debug("__init__")
+
+        # the map of file descriptors to dispatchers
+        if socket_map is None:
+            socket_map = asyncore.socket_map
+        self.socket_map = socket_map
+
+    def poll(self, timeout):
+        """Wait for socket activity or the timeout, None waits forever."""
+        asyncore.loop(timeout=timeout, count=1, map=self.socket_map)
+
+    def close(self):
+        """Nothing to release."""
+        pass
+
+bacpypes_debugging(AsyncoreLoopBackend)
+
+#
+#   SelectorLoopBackend
+#
+#   Wait for socket activity using the most efficient selector available for
+#   the platform (epoll on Linux, kqueue on BSD and macOS).  The dispatchers
+#   are still the asyncore dispatchers in the socket map, so the UDP and TCP
+#   directors do not change, but the registrations are kept in the kernel
+#   between calls rather than being rebuilt for every select().
+#
+
+class SelectorLoopBackend:
+
+    def __init__(self, socket_map=None):
+        if _debug: SelectorLoopBackend._debug("__init__")
+
+        if not selectors:
+            raise RuntimeError("selectors module not available")
+
+        # the map of file descriptors to dispatchers
+        if socket_map is None:
+            socket_map = asyncore.socket_map
+        self.socket_map = socket_map
+
+        # the selector and what has been registered with it
+        self.selector = selectors.DefaultSelector()
+        self.registered = {}        # fd -> (dispatcher, events)
+
+    def update_registrations(self):
+        """Bring the selector up to date with the readable() and writable()
+        state of the dispatchers in the socket map."""
+        registered = self.registered
+
+        # forget about the dispatchers that have been closed
+        for fd in list(registered):
+            obj, events = registered[fd]
+            if self.socket_map.get(fd) is not obj:
+                if _debug: SelectorLoopBackend._debug("    - unregister %r", fd)
+                del registered[fd]
+                try:
+                    self.selector.unregister(fd)
+                except (KeyError, ValueError, OSError):
+                    pass
+
+        # match the events the dispatchers are interested in
+        for fd, obj in list(self.socket_map.items()):
+            events = 0
+            if obj.readable():
+                events |= selectors.EVENT_READ
+            if obj.writable() and not obj.accepting:
+                events |= selectors.EVENT_WRITE
+
+            current = registered.get(fd)
+            if current is None:
+                if events:
+                    self.selector.register(fd, events)
+                    registered[fd] = (obj, events)
+            elif current[1] != events:
+                if events:
+                    self.selector.modify(fd, events)
+                    registered[fd] = (obj, events)
+                else:
+                    self.selector.unregister(fd)
+                    del registered[fd]
+
+    def poll(self, timeout):
+        """Wait for socket activity or the timeout, None waits forever."""
+        self.update_registrations()
+
+        # nothing to wait for, just let the time pass
+        if not self.registered:
+            if timeout:
+                time.sleep(timeout)
+            return
+
+        try:
+            ready = self.selector.select(timeout)
+        except InterruptedError:
+            # a signal, let the caller check if it is still running
+            return
+
+        for key, mask in ready:
+            obj = self.socket_map.get(key.fd)
+            if obj is None:
+                continue
+
+            if mask & selectors.EVENT_READ:
+                asyncore.read(obj)
+            if (mask & selectors.EVENT_WRITE) and (self.socket_map.get(key.fd) is obj):
+                asyncore.write(obj)
+
+    def close(self):
+        """Release the selector."""
+        if _debug: SelectorLoopBackend._debug("close")
+
+        self.selector.close()
+        self.registered = {}
+
+bacpypes_debugging(SelectorLoopBackend)
+
+#
+#   set_loop_backend
+#
+
+def set_loop_backend(backend):
+    """Change the way run() waits for socket activity, the backend is an
+    object with poll(timeout) and close() methods."""
+    if _debug: set_loop_backend._debug("set_loop_backend %r", backend)
+    global loopBackend
+
+    # release the old one
+    if loopBackend and (loopBackend is not backend):
+        loopBackend.close()
+
+    loopBackend = backend
+
+bacpypes_debugging(set_loop_backend)
+
+#
+#   get_loop_backend
+#
+
+def get_loop_backend():
+    """Return the current loop backend, building the default one if one
+    hasn't been provided."""
+    global loopBackend
+
+    if not loopBackend:
+        if selectors:
+            loopBackend = SelectorLoopBackend()
+        else:
+            loopBackend = AsyncoreLoopBackend()
+        if _debug: get_loop_backend._debug("    - loopBackend: %r", loopBackend)
+
+    return loopBackend
+
+bacpypes_debugging(get_loop_backend)
+
 #
 #   run
 #
 
 SPIN = 1.0
 
-def run(spin=SPIN, sigterm=stop, sigusr1=print_stack):
+def run(spin=None, sigterm=stop, sigusr1=print_stack):
     if _debug: run._debug("run spin=%r sigterm=%r, sigusr1=%r", spin, sigterm, sigusr1)
     global running, taskManager, deferredFns, sleeptime
 
@@ -118,6 +290,13 @@ def run(spin=SPIN, sigterm=stop, sigusr1=print_stack):
     # reference the task manager (a singleton)
     taskManager = TaskManager()
 
+    # without a trigger to break out of the wait, check back periodically
+    if (spin is None) and (not taskManager.trigger):
+        spin = SPIN
+
+    # get the backend that waits for socket activity
+    backend = get_loop_backend()
+
     # count how many times we are going through the loop
     loopCount = 0
 
@@ -135,39 +314,35 @@ def run(spin=SPIN, sigterm=stop, sigusr1=print_stack):
                 # if _debug: run._debug("    - task: %r", task)
                 taskManager.process_task(task)
 
-            # if delta is None, there are no tasks, default to spinning
+            # if delta is None, there are no tasks, wait for the spin value
+            # which could be forever
             if delta is None:
                 delta = spin
 
             # there may be threads around, sleep for a bit
-            if sleeptime and (delta > sleeptime):
+            if sleeptime and ((delta is None) or (delta > sleeptime)):
                 time.sleep(sleeptime)
-                delta -= sleeptime
+                if delta is not None:
+                    delta -= sleeptime
 
             # delta should be no more than the spin value
-            delta = min(delta, spin)
+            if (spin is not None) and (delta is not None):
+                delta = min(delta, spin)
 
-            # if there are deferred functions, use a small delta
+            # if there are deferred functions, do not wait
             if deferredFns:
-                delta = min(delta, 0.001)
+                delta = 0.0
 #           if _debug: run._debug("    - delta: %r", delta)
 
-            # loop for socket activity
-            asyncore.loop(timeout=delta, count=1)
+            # wait for socket activity, a task to be due, or a trigger
+            backend.poll(delta)
 
-            # check for deferred functions
+            # check for deferred functions, other threads may be adding
+            # more while this is running
             while deferredFns:
-                # get a reference to the list
-                fnlist = deferredFns
-                deferredFns = []
-
-                # call the functions
-                for fn, args, kwargs in fnlist:
-#                   if _debug: run._debug("    - call: %r %r %r", fn, args, kwargs)
-                    fn(*args, **kwargs)
-
-                # done with this list
-                del fnlist
+                fn, args, kwargs = deferredFns.popleft()
+#               if _debug: run._debug("    - call: %r %r %r", fn, args, kwargs)
+                fn(*args, **kwargs)
 
         except KeyboardInterrupt:
             if _debug: run._info("keyboard interrupt")
@@ -208,17 +383,9 @@ def run_once():
 
             # check for deferred functions
             while deferredFns:
-                # get a reference to the list
-                fnlist = deferredFns
-                deferredFns = []
-
-                # call the functions
-                for fn, args, kwargs in fnlist:
-                    if _debug: run_once._debug("    - call: %r %r %r", fn, args, kwargs)
-                    fn(*args, **kwargs)
-
-                # done with this list
-                del fnlist
+                fn, args, kwargs = deferredFns.popleft()
+                if _debug: run_once._debug("    - call: %r %r %r", fn, args, kwargs)
+                fn(*args, **kwargs)
 
     except KeyboardInterrupt:
         if _debug: run_once._info("keyboard interrupt")
@@ -232,10 +399,13 @@ bacpypes_debugging(run_once)
 #
 
 def deferred(fn, *args, **kwargs):
+    """Call a function the next time through the run() loop.  This is safe
+    to call from other threads, appending to the deque is atomic and the
+    trigger wakes up the loop."""
     if _debug: deferred._debug("deferred %r %r %r", fn, args, kwargs)
     global deferredFns, taskManager
 
-    # append it to the list
+    # append it to the queue
     deferredFns.append((fn, args, kwargs))
 
     # trigger the task manager event
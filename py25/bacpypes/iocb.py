@@ -70,6 +70,9 @@ _strftime = lambda: "%011.6f" % (_time() % 3600,)
 _identNext = 1
 _identLock = threading.Lock()
 
+# building completion events
+_completeLock = threading.Lock()
+
 class IOCB(DebugContents):
 
     _debug_contents = \
@@ -110,9 +113,8 @@ class IOCB(DebugContents):
         # blocks are bound to a controller
         self.ioController = None
 
-        # each block gets a completion event
-        self.ioComplete = threading.Event()
-        self.ioComplete.clear()
+        # the completion event is only built when something waits for it
+        self._ioComplete = None
 
         # applications can set a callback functions
         self.ioCallback = []
@@ -137,9 +139,29 @@ class IOCB(DebugContents):
         self.ioCallback.append((fn, args, kwargs))
 
         # already complete?
-        if self.ioComplete.isSet():
+        if self.ioState >= COMPLETED:
             self.trigger()
 
+    @property
+    def ioComplete(self):
+        """The completion event, most blocks are only given callbacks so it
+        is built the first time it is asked for."""
+        event = self._ioComplete
+        if event is None:
+            _completeLock.acquire()
+            try:
+                event = self._ioComplete
+                if event is None:
+                    event = self._ioComplete = threading.Event()
+
+                    # set it now if the trigger has already been pulled
+                    if self.ioState >= COMPLETED:
+                        event.set()
+            finally:
+                _completeLock.release()
+
+        return event
+
     def wait(self, *args):
         """Wait for the completion event to be set."""
         if _debug: IOCB._debug("wait(%d) %r", self.ioID, args)
@@ -161,9 +183,11 @@ class IOCB(DebugContents):
             if _debug: IOCB._debug("    - cancel timeout")
             self.ioTimeout.suspend_task()
 
-        # set the completion event
-        self.ioComplete.set()
-        if _debug: IOCB._debug("    - complete event set")
+        # set the completion event if there is one
+        event = self._ioComplete
+        if event is not None:
+            event.set()
+            if _debug: IOCB._debug("    - complete event set")
 
         # make the callback(s)
         for fn, args, kwargs in self.ioCallback:
@@ -221,6 +245,35 @@ class IOCB(DebugContents):
 
 bacpypes_debugging(IOCB)
 
+#
+#   call_soon_threadsafe
+#
+
+def call_soon_threadsafe(fn, *args, **kwargs):
+    """Call a function in the thread running core.run() and return an IOCB
+    that is completed with what the function returns or aborted with the
+    exception it raises.  This is safe to call from any thread."""
+    if _debug: call_soon_threadsafe._debug("call_soon_threadsafe %r %r %r", fn, args, kwargs)
+
+    # this is the future
+    iocb = IOCB()
+
+    def _call_soon():
+        if _debug: call_soon_threadsafe._debug("_call_soon(%d) %r", iocb.ioID, fn)
+        try:
+            response = fn(*args, **kwargs)
+        except Exception, err:
+            iocb.abort(err)
+        else:
+            iocb.complete(response)
+
+    # let the loop call it
+    deferred(_call_soon)
+
+    return iocb
+
+bacpypes_debugging(call_soon_threadsafe)
+
 #
 #   IOChainMixIn
 #
@@ -380,7 +433,6 @@ class IOGroup(IOCB, DebugContents):
         # group that is not already completed, this state will
         # change to PENDING.
         self.ioState = COMPLETED
-        self.ioComplete.set()
 
     def add(self, iocb):
         """Add an IOCB to the group, you can also add other groups."""
@@ -391,7 +443,8 @@ class IOGroup(IOCB, DebugContents):
 
         # assume all of our members have not completed yet
         self.ioState = PENDING
-        self.ioComplete.clear()
+        if self._ioComplete is not None:
+            self._ioComplete.clear()
 
         # when this completes, call back to the group.  If this
         # has already completed, it will trigger
@@ -403,7 +456,7 @@ class IOGroup(IOCB, DebugContents):
 
         # check all the members
         for iocb in self.ioMembers:
-            if not iocb.ioComplete.isSet():
+            if iocb.ioState < COMPLETED:
                 if _debug: IOGroup._debug("    - waiting for child: %r", iocb)
                 break
         else:
@@ -894,14 +947,19 @@ bacpypes_debugging(ClientController)
 
 class SieveQueue(IOQController):
 
-    def __init__(self, request_fn, address=None):
-        if _debug: SieveQueue._debug("__init__ %r %r", request_fn, address)
+    def __init__(self, request_fn, address=None, window=1):
+        if _debug: SieveQueue._debug("__init__ %r %r window=%r", request_fn, address, window)
         IOQController.__init__(self, str(address))
 
         # save a reference to the request function
         self.request_fn = request_fn
         self.address = address
 
+        # number of requests that can be waiting for a response at the
+        # same time, and the ones that are, oldest first
+        self.window = window
+        self.active_iocbs = []
+
     def process_io(self, iocb):
         if _debug: SieveQueue._debug("process_io %r", iocb)
 
@@ -911,6 +969,69 @@ class SieveQueue(IOQController):
         # send the request
         self.request_fn(iocb.args[0])
 
+    def active_io(self, iocb):
+        """Called when a request is being sent, the queue stays idle while
+        the window has room for more."""
+        if _debug: SieveQueue._debug("active_io %r", iocb)
+
+        # base class work first, the active_iocb is the latest one
+        IOQController.active_io(self, iocb)
+
+        # keep track of the iocb
+        self.active_iocbs.append(iocb)
+
+        # room for more
+        if len(self.active_iocbs) < self.window:
+            self.state = CTRL_IDLE
+
+    def find_io(self, pdu):
+        """Return the active request that the pdu is for.  Responses are
+        matched by invoke ID when they and the request have one, otherwise
+        it is for the oldest one."""
+        if _debug: SieveQueue._debug("find_io %r", pdu)
+
+        # the request itself
+        for iocb in self.active_iocbs:
+            if iocb.args[0] is pdu:
+                return iocb
+
+        invokeID = getattr(pdu, 'apduInvokeID', None)
+        for iocb in self.active_iocbs:
+            requestID = getattr(iocb.args[0], 'apduInvokeID', None)
+            if (invokeID is None) or (requestID is None) or (invokeID == requestID):
+                return iocb
+
+        return None
+
+    def complete_io(self, iocb, msg):
+        """Called by a handler to return data to the client."""
+        if _debug: SieveQueue._debug("complete_io %r %r", iocb, msg)
+
+        # check to see if it is completing an active one
+        if iocb not in self.active_iocbs:
+            raise RuntimeError("not an active iocb")
+        self.active_iocbs.remove(iocb)
+
+        # the base class completes the active one
+        self.active_iocb = iocb
+        IOQController.complete_io(self, iocb, msg)
+
+        # latest one still waiting
+        self.active_iocb = self.active_iocbs[-1] if self.active_iocbs else None
+
+    def abort_io(self, iocb, err):
+        """Called by a handler or a client to abort a transaction."""
+        if _debug: SieveQueue._debug("abort_io %r %r", iocb, err)
+
+        # the base class aborts the active one
+        if iocb in self.active_iocbs:
+            self.active_iocbs.remove(iocb)
+            self.active_iocb = iocb
+        IOQController.abort_io(self, iocb, err)
+
+        # latest one still waiting
+        self.active_iocb = self.active_iocbs[-1] if self.active_iocbs else None
+
 bacpypes_debugging(SieveQueue)
 
 #
@@ -919,8 +1040,8 @@ bacpypes_debugging(SieveQueue)
 
 class SieveClientController(Client, IOController):
 
-    def __init__(self, queue_class=SieveQueue):
-        if _debug: SieveClientController._debug("__init__")
+    def __init__(self, queue_class=SieveQueue, window=1):
+        if _debug: SieveClientController._debug("__init__ window=%r", window)
         Client.__init__(self)
         IOController.__init__(self)
 
@@ -932,6 +1053,15 @@ class SieveClientController(Client, IOController):
         self.queues = {}
         self.queue_class = queue_class
 
+        # requests in flight to each address, unless the address has its own
+        self.window = window
+        self.window_by_address = {}
+
+    def get_window(self, address):
+        """Return the number of requests that can be in flight to an
+        address at the same time."""
+        return self.window_by_address.get(address, self.window)
+
     def process_io(self, iocb):
         if _debug: SieveClientController._debug("process_io %r", iocb)
 
@@ -943,7 +1073,7 @@ class SieveClientController(Client, IOController):
         queue = self.queues.get(destination_address, None)
         if not queue:
             if _debug: SieveClientController._debug("    - new queue")
-            queue = self.queue_class(self.request, destination_address)
+            queue = self.queue_class(self.request, destination_address, self.get_window(destination_address))
             self.queues[destination_address] = queue
         if _debug: SieveClientController._debug("    - queue: %r", queue)
 
@@ -970,16 +1100,17 @@ class SieveClientController(Client, IOController):
             return
         if _debug: SieveClientController._debug("    - queue: %r", queue)
 
-        # make sure it has an active iocb
-        if not queue.active_iocb:
+        # find the request it is for
+        iocb = queue.find_io(pdu)
+        if iocb is None:
             if _debug: SieveClientController._debug("    - no active request")
             return
 
         # complete the request
         if isinstance(pdu, Exception):
-            queue.abort_io(queue.active_iocb, pdu)
+            queue.abort_io(iocb, pdu)
         else:
-            queue.complete_io(queue.active_iocb, pdu)
+            queue.complete_io(iocb, pdu)
 
         # if the queue is empty and idle, forget about the controller
         if not queue.ioQueue.queue and not queue.active_iocb:
@@ -4,10 +4,12 @@
 Network Service
 """
 
+import struct
 from copy import deepcopy as _deepcopy
 
 from .debugging import ModuleLogger, DebugContents, bacpypes_debugging
 from .errors import ConfigurationError
+from .task import FunctionTask, TaskManager
 
 from .comm import Client, Server, bind, \
     ServiceAccessPoint, ApplicationServiceElement
@@ -39,7 +41,7 @@ class RouterInfo(DebugContents):
     def __init__(self, snet, address, dnets, status=ROUTER_AVAILABLE):
         self.snet = snet        # source network
         self.address = address  # address of the router
-        self.dnets = dnets      # list of reachable networks through this router
+        self.dnets = dnets      # set of reachable networks through this router
         self.status = status    # router status
 
 #
@@ -54,58 +56,52 @@ class RouterInfoCache:
         self.routers = {}           # (snet, address) -> RouterInfo
         self.networks = {}          # network -> RouterInfo
 
+        # the answers to get_router_info() are built when the information
+        # changes rather than each time a message is routed, and the
+        # routers on each network are kept for delete_router_info()
+        self.paths = {}             # network -> (snet, address, status)
+        self.snet_routers = {}      # snet -> set of router addresses
+
     def get_router_info(self, dnet):
         if _debug: RouterInfoCache._debug("get_router_info %r", dnet)
 
-        # check to see if we know about it
-        if dnet not in self.networks:
-            if _debug: RouterInfoCache._debug("   - no route")
-            return None
-
-        # return the network and address
-        router_info = self.networks[dnet]
-        if _debug: RouterInfoCache._debug("   - router_info: %r", router_info)
-
         # return the network, address, and status
-        return (router_info.snet, router_info.address, router_info.status)
+        path = self.paths.get(dnet, None)
+        if _debug: RouterInfoCache._debug("   - path: %r", path)
+
+        return path
 
     def update_router_info(self, snet, address, dnets):
         if _debug: RouterInfoCache._debug("update_router_info %r %r %r", snet, address, dnets)
 
         # look up the router reference, make a new record if necessary
         key = (snet, address)
-        if key not in self.routers:
+        router_info = self.routers.get(key, None)
+        if router_info is None:
             if _debug: RouterInfoCache._debug("   - new router")
-            router_info = self.routers[key] = RouterInfo(snet, address, list())
-        else:
-            router_info = self.routers[key]
+            router_info = self.routers[key] = RouterInfo(snet, address, set())
+            self.snet_routers.setdefault(snet, set()).add(address)
 
         # add (or move) the destination networks
         for dnet in dnets:
-            if dnet in self.networks:
-                other_router = self.networks[dnet]
-                if other_router is router_info:
-                    if _debug: RouterInfoCache._debug("   - existing router, match")
-                    continue
-                elif dnet not in other_router.dnets:
-                    if _debug: RouterInfoCache._debug("   - where did it go?")
-                else:
-                    other_router.dnets.remove(dnet)
-                    if not other_router.dnets:
-                        if _debug: RouterInfoCache._debug("    - no longer care about this router")
-                        del self.routers[(snet, other_router.address)]
+            other_router = self.networks.get(dnet, None)
+            if other_router is router_info:
+                if _debug: RouterInfoCache._debug("   - existing router, match")
+                continue
+            elif other_router is not None:
+                other_router.dnets.discard(dnet)
+                if not other_router.dnets:
+                    if _debug: RouterInfoCache._debug("    - no longer care about this router")
+                    self._delete_router(other_router)
 
             # add a reference to the router
             self.networks[dnet] = router_info
+            self.paths[dnet] = (snet, address, router_info.status)
+            router_info.dnets.add(dnet)
             if _debug: RouterInfoCache._debug("   - reference added")
 
-            # maybe update the list of networks for this router
-            if dnet not in router_info.dnets:
-                router_info.dnets.append(dnet)
-                if _debug: RouterInfoCache._debug("   - dnet added, now: %r", router_info.dnets)
-
-    def update_router_status(self, snet, address, status):
-        if _debug: RouterInfoCache._debug("update_router_status %r %r %r", snet, address, status)
+    def update_router_status(self, snet, address, status, dnets=None):
+        if _debug: RouterInfoCache._debug("update_router_status %r %r %r %r", snet, address, status, dnets)
 
         key = (snet, address)
         if key not in self.routers:
@@ -113,18 +109,30 @@ class RouterInfoCache:
             return
 
         router_info = self.routers[key]
-        router_info.status = status
+
+        # if dnets is None, the status is for the router and all of its
+        # networks, otherwise just the paths to those networks
+        if dnets is None:
+            router_info.status = status
+            dnets = router_info.dnets
+        elif status == ROUTER_AVAILABLE:
+            router_info.status = status
+
+        # the paths through this router
+        path = (snet, address, status)
+        for dnet in dnets:
+            if dnet in router_info.dnets:
+                self.paths[dnet] = path
         if _debug: RouterInfoCache._debug("   - status updated")
 
     def delete_router_info(self, snet, address=None, dnets=None):
-        if _debug: RouterInfoCache._debug("delete_router_info %r %r %r", dnets)
+        if _debug: RouterInfoCache._debug("delete_router_info %r %r %r", snet, address, dnets)
 
         # if address is None, remove all the routers for the network
         if address is None:
-            for rnet, raddress in self.routers.keys():
-                if snet == rnet:
-                    if _debug: RouterInfoCache._debug("   - going down")
-                    self.delete_router_info(snet, raddress)
+            for raddress in list(self.snet_routers.get(snet, ())):
+                if _debug: RouterInfoCache._debug("   - going down")
+                self.delete_router_info(snet, raddress)
             if _debug: RouterInfoCache._debug("   - back topside")
             return
 
@@ -139,24 +147,50 @@ class RouterInfoCache:
 
         # if dnets is None, remove all the networks for the router
         if dnets is None:
-            dnets = router_info.dnets
+            dnets = list(router_info.dnets)
 
         # loop through the list of networks to be deleted
         for dnet in dnets:
-            if dnet in self.networks:
-                del self.networks[dnet]
-                if _debug: RouterInfoCache._debug("   - removed from networks: %r", dnet)
             if dnet in router_info.dnets:
                 router_info.dnets.remove(dnet)
-                if _debug: RouterInfoCache._debug("   - removed from router_info: %r", dnet)
+                del self.networks[dnet]
+                del self.paths[dnet]
+                if _debug: RouterInfoCache._debug("   - removed: %r", dnet)
 
         # see if we still care
         if not router_info.dnets:
             if _debug: RouterInfoCache._debug("    - no longer care about this router")
-            del self.routers[key]
+            self._delete_router(router_info)
+
+    def _delete_router(self, router_info):
+        del self.routers[(router_info.snet, router_info.address)]
+
+        addresses = self.snet_routers[router_info.snet]
+        addresses.discard(router_info.address)
+        if not addresses:
+            del self.snet_routers[router_info.snet]
 
 bacpypes_debugging(RouterInfoCache)
 
+#
+#   PendingNetwork
+#
+
+class PendingNetwork(DebugContents):
+    """These objects are the messages waiting for a path to a network and
+    the progress looking for it, or waiting for the router to a network to
+    stop being busy."""
+
+    _debug_contents = ('dnet', 'adapter', 'npdus', 'attempts', 'next_time', 'dropped')
+
+    def __init__(self, dnet, adapter=None):
+        self.dnet = dnet            # destination network
+        self.adapter = adapter      # not asked about on this adapter
+        self.npdus = []             # messages waiting to be sent
+        self.attempts = 0           # requests sent or times found busy
+        self.next_time = None       # when to ask (again), give up, or send
+        self.dropped = 0            # messages that did not fit
+
 #
 #   NetworkAdapter
 #
@@ -175,6 +209,11 @@ class NetworkAdapter(Client, DebugContents):
         """Decode upstream PDUs and pass them up to the service access point."""
         if _debug: NetworkAdapter._debug("confirmation %r (net=%r)", pdu, self.adapterNet)
 
+        # routers pass most application layer messages along without
+        # decoding them
+        if self.adapterSAP.forward_npdu(self, pdu):
+            return
+
         npdu = NPDU(user_data=pdu.pduUserData)
         npdu.decode(pdu)
         self.adapterSAP.process_npdu(self, npdu)
@@ -216,8 +255,43 @@ class NetworkServiceAccessPoint(ServiceAccessPoint, Server, DebugContents):
         # use the provided cache or make a default one
         self.router_info_cache = routerInfoCache or RouterInfoCache()
 
-        # map to a list of application layer packets waiting for a path
-        self.pending_nets = {}
+        # map to the application layer packets waiting for a path
+        self.pending_nets = {}      # net -> PendingNetwork
+
+        # messages held for each network, which ones are dropped when there
+        # are too many ('oldest' or 'newest'), and the number of networks
+        # that can be waited for at once
+        self.pending_net_size = 20
+        self.pending_net_drop = 'oldest'
+        self.pending_net_limit = 100
+
+        # seconds to wait for an I-Am-Router-To-Network, times to ask again,
+        # seconds before asking again about a network that was not found,
+        # and the least number of seconds between requests, when there is
+        # more than one network to ask about one request asks for all of them
+        self.router_discovery_timeout = 5.0
+        self.router_discovery_retries = 2
+        self.router_discovery_holdoff = 30.0
+        self.router_discovery_interval = 0.5
+
+        # networks that were not found and when to ask again, when the last
+        # request was sent, and the task that asks again or gives up
+        self.unreachable_nets = {}
+        self._router_discovery_time = None
+        self._pending_nets_task = FunctionTask(self._pending_nets_process)
+
+        # messages held for networks with a busy router, they are sent when
+        # the router is available again or the busy timeout expires, which
+        # doubles when the network is busy again before the last timeout
+        # would have expired, up to the most seconds to wait
+        self.busy_nets = {}
+        self.router_busy_timeout = 30.0
+        self.router_busy_max_timeout = 240.0
+
+        # networks that were busy recently, how many times, and when to
+        # forget about it, and the task that stops waiting
+        self._busy_backoff = {}
+        self._busy_nets_task = FunctionTask(self._busy_nets_process)
 
         # these are set when bind() is called
         self.local_adapter = None
@@ -262,6 +336,23 @@ class NetworkServiceAccessPoint(ServiceAccessPoint, Server, DebugContents):
         # pass this along to the cache
         self.router_info_cache.update_router_info(snet, address, dnets)
 
+        # send the messages that were waiting for these networks
+        for dnet in dnets:
+            self.unreachable_nets.pop(dnet, None)
+
+            pending = self.pending_nets.pop(dnet, None)
+            if pending is not None:
+                if _debug: NetworkServiceAccessPoint._debug("    - %d pending to %r", len(pending.npdus), dnet)
+                self._send_held_npdus(dnet, pending.npdus)
+
+            # the network might have moved away from a busy router
+            if (dnet in self.busy_nets) and (self.router_info_cache.get_router_info(dnet)[2] != ROUTER_BUSY):
+                self._busy_net_available(dnet)
+
+        # nothing left to look for
+        if (not self.pending_nets) and self._pending_nets_task.isScheduled:
+            self._pending_nets_task.suspend_task()
+
     def delete_router_references(self, snet, address=None, dnets=None):
         """Delete references to routers/networks."""
         if _debug: NetworkServiceAccessPoint._debug("delete_router_references %r %r %r", snet, address, dnets)
@@ -273,6 +364,43 @@ class NetworkServiceAccessPoint(ServiceAccessPoint, Server, DebugContents):
         # pass this along to the cache
         self.router_info_cache.delete_router_info(snet, address, dnets)
 
+    def update_router_status(self, snet, address, status, dnets=None):
+        """Update the status of a router, or of the paths through it to some
+        of its networks.  Messages for networks with a busy router are held
+        until it is available again."""
+        if _debug: NetworkServiceAccessPoint._debug("update_router_status %r %r %r %r", snet, address, status, dnets)
+
+        # see if we have an adapter for the snet
+        if snet not in self.adapters:
+            raise RuntimeError("no adapter for network: %d" % (snet,))
+
+        # the networks through this router
+        router_info = self.router_info_cache.routers.get((snet, address), None)
+        if router_info is None:
+            if _debug: NetworkServiceAccessPoint._debug("    - unknown router")
+            return
+        if dnets is None:
+            dnets = list(router_info.dnets)
+        else:
+            dnets = [dnet for dnet in dnets if dnet in router_info.dnets]
+
+        # pass this along to the cache
+        self.router_info_cache.update_router_status(snet, address, status,
+            None if (len(dnets) == len(router_info.dnets)) else dnets)
+
+        if status == ROUTER_BUSY:
+            now = TaskManager().get_time()
+
+            # wait for the router, starting over when it is still busy
+            for dnet in dnets:
+                busy = self._busy_net(dnet, now)
+                busy.next_time = now + self._busy_timeout(busy.attempts)
+            self._busy_nets_schedule()
+        else:
+            for dnet in dnets:
+                if dnet in self.busy_nets:
+                    self._busy_net_available(dnet)
+
     #-----
 
     def indication(self, pdu):
@@ -343,7 +471,7 @@ class NetworkServiceAccessPoint(ServiceAccessPoint, Server, DebugContents):
         # we might already be waiting for a path for this network
         if dnet in self.pending_nets:
             if _debug: NetworkServiceAccessPoint._debug("    - already waiting for path")
-            self.pending_nets[dnet].append(npdu)
+            self.add_pending_npdu(dnet, npdu)
             return
 
         # check cache for an available path
@@ -360,6 +488,12 @@ class NetworkServiceAccessPoint(ServiceAccessPoint, Server, DebugContents):
             adapter = self.adapters[snet]
             if _debug: NetworkServiceAccessPoint._debug("    - adapter: %r", adapter)
 
+            # hold it until the router is not busy
+            if status == ROUTER_BUSY:
+                if _debug: NetworkServiceAccessPoint._debug("    - router busy")
+                self.add_busy_npdu(dnet, npdu)
+                return
+
             # fix the destination
             npdu.pduDestination = address
 
@@ -369,20 +503,338 @@ class NetworkServiceAccessPoint(ServiceAccessPoint, Server, DebugContents):
 
         if _debug: NetworkServiceAccessPoint._debug("    - no known path to network")
 
-        # add it to the list of packets waiting for the network
-        net_list = self.pending_nets.get(dnet, None)
-        if net_list is None:
-            net_list = self.pending_nets[dnet] = []
-        net_list.append(npdu)
+        # add it to the packets waiting for the network
+        self.add_pending_npdu(dnet, npdu)
+
+    def add_pending_npdu(self, dnet, npdu, adapter=None):
+        """Hold a message until a path to the network is found, the adapter
+        is where a message being forwarded came from and the network is not
+        asked about there."""
+        if _debug: NetworkServiceAccessPoint._debug("add_pending_npdu %r %r %r", dnet, npdu, adapter)
+
+        now = TaskManager().get_time()
+
+        # networks that were not found are not asked about again for a while
+        holdoff_time = self.unreachable_nets.get(dnet, None)
+        if holdoff_time is not None:
+            if now < holdoff_time:
+                if _debug: NetworkServiceAccessPoint._debug("    - unreachable")
+                return
+            del self.unreachable_nets[dnet]
+
+        pending = self.pending_nets.get(dnet, None)
+        if pending is None:
+            if len(self.pending_nets) >= self.pending_net_limit:
+                if _debug: NetworkServiceAccessPoint._debug("    - waiting for too many networks")
+                return
+
+            # ask about it as soon as possible
+            pending = self.pending_nets[dnet] = PendingNetwork(dnet, adapter)
+            pending.next_time = now
+            is_new = True
+        else:
+            if pending.adapter is not adapter:
+                pending.adapter = None
+            is_new = False
+
+        self._hold_npdu(pending, npdu)
+
+        if is_new:
+            self._pending_nets_process()
+
+    def _hold_npdu(self, pending, npdu):
+        """Add a message to the ones waiting for a network, making room
+        for it when there are too many."""
+        if len(pending.npdus) >= self.pending_net_size:
+            if _debug: NetworkServiceAccessPoint._debug("    - dropping the %s", self.pending_net_drop)
+            pending.dropped += 1
+            if self.pending_net_drop == 'newest':
+                return
+            del pending.npdus[0]
+        pending.npdus.append(npdu)
+
+    def _send_held_npdus(self, dnet, npdus):
+        """Send the messages that were waiting for a network along the
+        path to it, higher network priority first."""
+        if _debug: NetworkServiceAccessPoint._debug("_send_held_npdus %r %r", dnet, len(npdus))
+
+        npdus.sort(key=lambda held_npdu: -held_npdu.pduNetworkPriority)
+        for held_npdu in npdus:
+            if _debug: NetworkServiceAccessPoint._debug("    - sending %s", repr(held_npdu))
+
+            # the path might have gone away or become busy again
+            path_info = self.router_info_cache.get_router_info(dnet)
+            if not path_info:
+                self.add_pending_npdu(dnet, held_npdu)
+                continue
+            snet, address, status = path_info
+            if status == ROUTER_BUSY:
+                self.add_busy_npdu(dnet, held_npdu)
+                continue
+
+            # the destination is the address of the router
+            held_npdu.pduDestination = address
+
+            # send the packet downstream
+            self.adapters[snet].process_npdu(held_npdu)
+
+    def add_busy_npdu(self, dnet, npdu):
+        """Hold a message for a network until its router is not busy."""
+        if _debug: NetworkServiceAccessPoint._debug("add_busy_npdu %r %r", dnet, npdu)
+
+        busy = self.busy_nets.get(dnet, None)
+        if busy is None:
+            now = TaskManager().get_time()
+
+            # the router was already busy when the path was added
+            busy = self._busy_net(dnet, now)
+            busy.next_time = now + self._busy_timeout(busy.attempts)
+            self._busy_nets_schedule()
+
+        self._hold_npdu(busy, npdu)
+
+    def _busy_timeout(self, attempts):
+        """Return the seconds to wait for a router that has been busy this
+        many times in a row."""
+        return min(self.router_busy_timeout * (2 ** (attempts - 1)), self.router_busy_max_timeout)
+
+    def _busy_net(self, dnet, now):
+        """Return the messages held for a busy network, counting the times
+        it has been busy in a row when it is new."""
+        busy = self.busy_nets.get(dnet, None)
+        if busy is None:
+            attempts, forget_time = self._busy_backoff.pop(dnet, (0, now))
+            if forget_time <= now:
+                attempts = 0
+
+            busy = self.busy_nets[dnet] = PendingNetwork(dnet)
+            busy.attempts = attempts + 1
+            if _debug: NetworkServiceAccessPoint._debug("    - %r busy, attempts: %r", dnet, busy.attempts)
+
+        return busy
+
+    def _busy_net_available(self, dnet):
+        """Send the messages held for a network that is not busy."""
+        if _debug: NetworkServiceAccessPoint._debug("_busy_net_available %r", dnet)
+
+        busy = self.busy_nets.pop(dnet)
+
+        # being busy again soon after means waiting longer next time
+        now = TaskManager().get_time()
+        self._busy_backoff[dnet] = (busy.attempts, now + self._busy_timeout(busy.attempts))
+
+        self._send_held_npdus(dnet, busy.npdus)
+        self._busy_nets_schedule()
+
+    def _busy_nets_process(self):
+        if _debug: NetworkServiceAccessPoint._debug("_busy_nets_process")
+
+        now = TaskManager().get_time()
+
+        # assume the routers that have not said otherwise are available
+        for busy in list(self.busy_nets.values()):
+            if busy.next_time > now:
+                continue
+            if _debug: NetworkServiceAccessPoint._debug("    - %r busy timeout", busy.dnet)
+
+            path_info = self.router_info_cache.get_router_info(busy.dnet)
+            if path_info and (path_info[2] == ROUTER_BUSY):
+                self.router_info_cache.update_router_status(path_info[0], path_info[1], ROUTER_AVAILABLE, [busy.dnet])
+            self._busy_net_available(busy.dnet)
+
+        # forget the networks that have not been busy for a while
+        for dnet, (attempts, forget_time) in list(self._busy_backoff.items()):
+            if forget_time <= now:
+                del self._busy_backoff[dnet]
+
+        self._busy_nets_schedule()
+
+    def _busy_nets_schedule(self):
+        # wake up for the next busy timeout
+        if self.busy_nets:
+            self._busy_nets_task.install_task(when=min(busy.next_time for busy in self.busy_nets.values()))
+        elif self._busy_nets_task.isScheduled:
+            self._busy_nets_task.suspend_task()
+
+    def _pending_nets_process(self):
+        if _debug: NetworkServiceAccessPoint._debug("_pending_nets_process")
+
+        now = TaskManager().get_time()
+
+        # the networks that are due to be asked about, and the ones that
+        # have been asked about enough
+        due = []
+        for pending in list(self.pending_nets.values()):
+            if pending.next_time > now:
+                continue
+
+            if pending.attempts > self.router_discovery_retries:
+                if _debug: NetworkServiceAccessPoint._debug("    - no path to %r, dropping %d", pending.dnet, len(pending.npdus))
+                del self.pending_nets[pending.dnet]
+                self.unreachable_nets[pending.dnet] = now + self.router_discovery_holdoff
+                continue
+
+            due.append(pending)
+
+        # forget the networks that can be asked about again
+        for dnet, holdoff_time in list(self.unreachable_nets.items()):
+            if holdoff_time <= now:
+                del self.unreachable_nets[dnet]
+
+        next_request_time = None
+        if due:
+            if (self._router_discovery_time is not None):
+                next_request_time = self._router_discovery_time + self.router_discovery_interval
+
+            if (next_request_time is None) or (next_request_time <= now):
+                self._router_discovery_time = now
+                next_request_time = None
+
+                # one request for one network, or for every network
+                if len(due) == 1:
+                    xnpdu = WhoIsRouterToNetwork(due[0].dnet)
+                    skip_adapter = due[0].adapter
+                else:
+                    xnpdu = WhoIsRouterToNetwork()
+                    skip_adapter = None
+                xnpdu.pduDestination = LocalBroadcast()
+                if _debug: NetworkServiceAccessPoint._debug("    - xnpdu: %r", xnpdu)
+
+                for pending in due:
+                    pending.attempts += 1
+                    pending.next_time = now + self.router_discovery_timeout
+
+                # send it to the connected adapters
+                for adapter in self.adapters.values():
+                    if adapter is not skip_adapter:
+                        self.sap_indication(adapter, xnpdu)
+
+        # wake up for the next request or to give up, the networks that are
+        # due have to wait for the next request
+        wake_times = [pending.next_time for pending in self.pending_nets.values()
+            if pending.next_time > now]
+        if next_request_time is not None:
+            wake_times.append(next_request_time)
+        if wake_times:
+            self._pending_nets_task.install_task(when=min(wake_times))
+        elif self._pending_nets_task.isScheduled:
+            self._pending_nets_task.suspend_task()
+
+    def forward_npdu(self, adapter, pdu):
+        """Forward an application layer message from an adapter to another
+        network by changing the header of the encoded message rather than
+        decoding it and encoding a new one.  Returns False when the message
+        should be decoded and given to process_npdu() instead, like network
+        layer messages, broadcasts, messages for this device, and messages
+        for a network without a known path."""
+        if _debug: NetworkServiceAccessPoint._debug("forward_npdu %r %r", adapter, pdu)
+
+        # make sure we're really a router
+        if len(self.adapters) < 2:
+            return False
+
+        data = pdu.pduData
+        try:
+            version, control, dnet, dlen = struct.unpack_from('>BBHB', data, 0)
+        except struct.error:
+            return False
+
+        # application layer message with a destination network, global
+        # broadcasts are also processed locally
+        if (version != 0x01) or ((control & 0xA0) != 0x20) or (dnet == 0xFFFF):
+            return False
+
+        # messages addressed to the network they came from are path errors
+        if dnet == adapter.adapterNet:
+            return False
+        dadr = data[5:5 + dlen]
+        offset = 5 + dlen
+
+        # messages for this device or broadcast on its network
+        if self.local_adapter and (dnet == self.local_adapter.adapterNet):
+            if (not dlen) or (dadr == self.local_address.addrAddr):
+                return False
+
+        # the source address, the SADR is kept as it is
+        if control & 0x08:
+            try:
+                snet, slen = struct.unpack_from('>HB', data, offset)
+            except struct.error:
+                return False
+            if (snet == 0xFFFF) or (not slen):
+                return False
+            sadr = data[offset + 3:offset + 3 + slen]
+            offset += 3 + slen
+        else:
+            snet = adapter.adapterNet
+            sadr = pdu.pduSource.addrAddr
+
+        # the hop count ends the header
+        if len(data) <= offset:
+            return False
+        hop_count, = struct.unpack_from('B', data, offset)
+        offset += 1
+
+        # check for source routing
+        if control & 0x08:
+            # see if this is attempting to spoof a directly connected network
+            if snet in self.adapters:
+                NetworkServiceAccessPoint._warning("    - path error (1)")
+                return True
+
+            # new path or the router has changed
+            router_info = self.router_info_cache.get_router_info(snet)
+            if (not router_info) or (not (router_info[1] == pdu.pduSource)):
+                if _debug: NetworkServiceAccessPoint._debug("    - new path")
+                self.router_info_cache.update_router_info(adapter.adapterNet, pdu.pduSource, [snet])
+
+        # make sure it hasn't looped
+        if not hop_count:
+            if _debug: NetworkServiceAccessPoint._debug("    - no more hops")
+            return True
+
+        xadapter = self.adapters.get(dnet, None)
+        if xadapter:
+            if _debug: NetworkServiceAccessPoint._debug("    - found path via %r", xadapter)
+
+            # last leg in routing, if this was a remote broadcast it's now
+            # a local one
+            if dlen:
+                destination = LocalStation(dadr)
+            else:
+                destination = LocalBroadcast()
+
+            fmt = '>BBHB%ds' % (len(sadr),)
+            values = [version, (control & ~0x20) | 0x08, snet, len(sadr), sadr]
+        else:
+            # see if there is routing information for this destination network
+            router_info = self.router_info_cache.get_router_info(dnet)
+            if not router_info:
+                return False
+
+            router_net, router_address, router_status = router_info
+            if router_status == ROUTER_BUSY:
+                return False
+            xadapter = self.adapters.get(router_net, None)
+            if not xadapter:
+                return False
+            if _debug: NetworkServiceAccessPoint._debug("    - found path via %r", xadapter)
+
+            # the destination is the address of the router
+            destination = router_address
+
+            fmt = '>BBHB%dsHB%dsB' % (dlen, len(sadr))
+            values = [version, control | 0x08, dnet, dlen, dadr, snet, len(sadr), sadr, hop_count - 1]
 
-        # build a request for the network and send it to all of the adapters
-        xnpdu = WhoIsRouterToNetwork(dnet)
-        xnpdu.pduDestination = LocalBroadcast()
+        xpdu = PDU(user_data=pdu.pduUserData, destination=destination,
+            expectingReply=(control & 0x04) != 0, networkPriority=control & 0x03)
+        xpdu.put_header(fmt, values, data[offset:])
+        if _debug: NetworkServiceAccessPoint._debug("    - xpdu: %r", xpdu)
 
-        # send it to all of the connected adapters
-        for adapter in self.adapters.values():
-            ### make sure the adapter is OK
-            self.sap_indication(adapter, xnpdu)
+        # send the packet downstream
+        xadapter.request(xpdu)
+
+        return True
 
     def process_npdu(self, adapter, npdu):
         if _debug: NetworkServiceAccessPoint._debug("process_npdu %r %r", adapter, npdu)
@@ -470,9 +922,10 @@ class NetworkServiceAccessPoint(ServiceAccessPoint, Server, DebugContents):
             if processLocally and self.serverPeer:
                 if _debug: NetworkServiceAccessPoint._debug("    - processing APDU locally")
 
-                # decode as a generic APDU
+                # decode as a generic APDU, decoding consumes the data so
+                # only make a copy when it is also being forwarded
                 apdu = _APDU(user_data=npdu.pduUserData)
-                apdu.decode(_deepcopy(npdu))
+                apdu.decode(_deepcopy(npdu) if forwardMessage else npdu)
                 if _debug: NetworkServiceAccessPoint._debug("    - apdu: %r", apdu)
 
                 # see if it needs to look routed
@@ -523,7 +976,7 @@ class NetworkServiceAccessPoint(ServiceAccessPoint, Server, DebugContents):
 
                 # do a deeper decode of the NPDU
                 xpdu = npdu_types[npdu.npduNetMessage](user_data=npdu.pduUserData)
-                xpdu.decode(_deepcopy(npdu))
+                xpdu.decode(_deepcopy(npdu) if forwardMessage else npdu)
 
                 # pass to the service element
                 self.sap_request(adapter, xpdu)
@@ -608,6 +1061,12 @@ class NetworkServiceAccessPoint(ServiceAccessPoint, Server, DebugContents):
                     if _debug: NetworkServiceAccessPoint._debug("    - path error (5)")
                     return
 
+                # hold it until the router is not busy
+                if router_status == ROUTER_BUSY:
+                    if _debug: NetworkServiceAccessPoint._debug("    - router busy")
+                    self.add_busy_npdu(dnet, newpdu)
+                    return
+
                 xadapter = self.adapters[router_net]
                 if _debug: NetworkServiceAccessPoint._debug("    - found path via %r", xadapter)
 
@@ -620,21 +1079,9 @@ class NetworkServiceAccessPoint(ServiceAccessPoint, Server, DebugContents):
 
             if _debug: NetworkServiceAccessPoint._debug("    - no router info found")
 
-            ### queue this message for reprocessing when the response comes back
-
-            # try to find a path to the network
-            xnpdu = WhoIsRouterToNetwork(dnet)
-            xnpdu.pduDestination = LocalBroadcast()
-
-            # send it to all of the connected adapters
-            for xadapter in self.adapters.values():
-                # skip the horse it rode in on
-                if (xadapter is adapter):
-                    continue
-
-                # pass this along as if it came from the NSE
-                self.sap_indication(xadapter, xnpdu)
-
+            # hold it until the path is found, the network is not asked
+            # about on the adapter it came from
+            self.add_pending_npdu(dnet, newpdu, adapter)
             return
 
         if _debug: NetworkServiceAccessPoint._debug("    - bad DADR: %r", npdu.npduDADR)
@@ -718,7 +1165,11 @@ class NetworkServiceElement(ApplicationServiceElement):
                 # add the direct network
                 netlist.append(xadapter.adapterNet)
 
-                ### add the other reachable
+            # add the networks reachable through other routers, but not the
+            # ones back through the network that is asking
+            for dnet, router_info in sap.router_info_cache.networks.items():
+                if router_info.snet != adapter.adapterNet:
+                    netlist.append(dnet)
 
             if netlist:
                 if _debug: NetworkServiceElement._debug("    - found these: %r", netlist)
@@ -795,7 +1246,8 @@ class NetworkServiceElement(ApplicationServiceElement):
         sap = self.elementService
         if _debug: NetworkServiceElement._debug("    - sap: %r", sap)
 
-        # pass along to the service access point
+        # pass along to the service access point, which sends the messages
+        # that were waiting for the networks
         sap.add_router_references(adapter.adapterNet, npdu.pduSource, npdu.iartnNetworkList)
 
         # skip if this is not a router
@@ -813,25 +1265,6 @@ class NetworkServiceElement(ApplicationServiceElement):
                 # request this
                 self.request(xadapter, iamrtn)
 
-        # look for pending NPDUs for the networks
-        for dnet in npdu.iartnNetworkList:
-            pending_npdus = sap.pending_nets.get(dnet, None)
-            if pending_npdus is not None:
-                if _debug: NetworkServiceElement._debug("    - %d pending to %r", len(pending_npdus), dnet)
-
-                # delete the references
-                del sap.pending_nets[dnet]
-
-                # now reprocess them
-                for pending_npdu in pending_npdus:
-                    if _debug: NetworkServiceElement._debug("    - sending %s", repr(pending_npdu))
-
-                    # the destination is the address of the router
-                    pending_npdu.pduDestination = npdu.pduSource
-
-                    # send the packet downstream
-                    adapter.process_npdu(pending_npdu)
-
     def ICouldBeRouterToNetwork(self, adapter, npdu):
         if _debug: NetworkServiceElement._debug("ICouldBeRouterToNetwork %r %r", adapter, npdu)
 
@@ -848,13 +1281,24 @@ class NetworkServiceElement(ApplicationServiceElement):
         if _debug: NetworkServiceElement._debug("RouterBusyToNetwork %r %r", adapter, npdu)
 
         # reference the service access point
-        # sap = self.elementService
+        sap = self.elementService
+        if _debug: NetworkServiceElement._debug("    - sap: %r", sap)
+
+        # an empty list is all of the networks through the router
+        sap.update_router_status(adapter.adapterNet, npdu.pduSource, ROUTER_BUSY,
+            npdu.rbtnNetworkList or None)
 
     def RouterAvailableToNetwork(self, adapter, npdu):
         if _debug: NetworkServiceElement._debug("RouterAvailableToNetwork %r %r", adapter, npdu)
 
         # reference the service access point
-        # sap = self.elementService
+        sap = self.elementService
+        if _debug: NetworkServiceElement._debug("    - sap: %r", sap)
+
+        # an empty list is all of the networks through the router, send the
+        # messages that were waiting for them
+        sap.update_router_status(adapter.adapterNet, npdu.pduSource, ROUTER_AVAILABLE,
+            npdu.ratnNetworkList or None)
 
     def InitializeRoutingTable(self, adapter, npdu):
         if _debug: NetworkServiceElement._debug("InitializeRoutingTable %r %r", adapter, npdu)
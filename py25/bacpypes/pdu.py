@@ -24,6 +24,47 @@ _long_mask = 0xFFFFFFFFL
 _debug = 0
 _log = ModuleLogger(globals())
 
+#
+#   _AddressMetaclass
+#
+#   Addresses built from the same arguments are interned, the address is
+#   decoded the first time and the same instance is returned after that, so
+#   addresses are shared and cannot be modified once they are built, use
+#   replace() for a modified copy.  Equality checks between interned
+#   addresses are identity checks and the hash is computed once.  The cache
+#   is cleared when it gets too large.
+#
+
+_address_cache = {}
+_address_cache_size = 4096
+
+class _AddressMetaclass(type):
+
+    def __call__(cls, *args):
+        global _address_cache
+
+        # look for the address, addresses built from arguments that are not
+        # hashable are not cached
+        key = (cls,) + args
+        try:
+            return _address_cache[key]
+        except KeyError:
+            pass
+        except TypeError:
+            key = None
+
+        # build a new one, it cannot be changed after this
+        addr = super(_AddressMetaclass, cls).__call__(*args)
+        addr._freeze()
+
+        # save it
+        if key is not None:
+            if len(_address_cache) >= _address_cache_size:
+                _address_cache.clear()
+            _address_cache[key] = addr
+
+        return addr
+
 #
 #   Address
 #
@@ -31,7 +72,15 @@ _log = ModuleLogger(globals())
 ip_address_mask_port_re = re.compile(r'^(?:(\d+):)?(\d+\.\d+\.\d+\.\d+)(?:/(\d+))?(?::(\d+))?$')
 ethernet_re = re.compile(r'^([0-9A-Fa-f][0-9A-Fa-f][:]){5}([0-9A-Fa-f][0-9A-Fa-f])$' )
 
-class Address:
+class Address(object):
+
+    __metaclass__ = _AddressMetaclass
+
+    __slots__ = ('addrType', 'addrNet', 'addrAddr', 'addrLen'
+        , 'addrIP', 'addrMask', 'addrHost', 'addrSubnet', 'addrPort'
+        , 'addrTuple', 'addrBroadcastTuple', '_hash'
+        )
+
     nullAddr = 0
     localBroadcastAddr = 1
     localStationAddr = 2
@@ -340,10 +389,56 @@ class Address:
     def __repr__(self):
         return "<%s %s>" % (self.__class__.__name__, self.__str__())
 
+    def __setattr__(self, attr, value):
+        # addresses are shared, they are complete when they have a hash
+        if hasattr(self, '_hash'):
+            raise AttributeError("addresses cannot be modified, use replace()")
+        object.__setattr__(self, attr, value)
+
+    def _freeze(self):
+        try:
+            _hash = hash( (self.addrType, self.addrNet, self.addrAddr) )
+        except TypeError:
+            _hash = None
+        object.__setattr__(self, '_hash', _hash)
+
+    def replace(self, **kwargs):
+        """Return a copy of the address with some of the attributes changed,
+        like replace(addrMask=0xFFFFFF00)."""
+        if _debug: Address._debug("replace %r", kwargs)
+
+        state = self.__getstate__()
+        for attr, value in kwargs.items():
+            if (attr not in Address.__slots__) or (attr == '_hash'):
+                raise AttributeError("not an address attribute: %r" % (attr,))
+            state[attr] = value
+
+        addr = object.__new__(self.__class__)
+        addr.__setstate__(state)
+
+        return addr
+
+    def __getstate__(self):
+        # the hash is not the same in another process
+        return dict((attr, getattr(self, attr)) for attr in Address.__slots__
+            if (attr != '_hash') and hasattr(self, attr))
+
+    def __setstate__(self, state):
+        for attr, value in state.items():
+            object.__setattr__(self, attr, value)
+        self._freeze()
+
     def __hash__(self):
-        return hash( (self.addrType, self.addrNet, self.addrAddr) )
+        _hash = self._hash
+        if _hash is None:
+            raise TypeError("unhashable address: %r" % (self,))
+        return _hash
 
     def __eq__(self,arg):
+        # interned addresses are the same object
+        if arg is self:
+            return True
+
         # try an coerce it into an address
         if not isinstance(arg, Address):
             arg = Address(arg)
@@ -383,6 +478,8 @@ def unpack_ip_addr(addr):
 
 class LocalStation(Address):
 
+    __slots__ = ()
+
     def __init__(self, addr):
         self.addrType = Address.localStationAddr
         self.addrNet = None
@@ -409,6 +506,8 @@ class LocalStation(Address):
 
 class RemoteStation(Address):
 
+    __slots__ = ()
+
     def __init__(self, net, addr):
         if not isinstance(net, int):
             raise TypeError("integer network required")
@@ -440,6 +539,8 @@ class RemoteStation(Address):
 
 class LocalBroadcast(Address):
 
+    __slots__ = ()
+
     def __init__(self):
         self.addrType = Address.localBroadcastAddr
         self.addrNet = None
@@ -452,6 +553,8 @@ class LocalBroadcast(Address):
 
 class RemoteBroadcast(Address):
 
+    __slots__ = ()
+
     def __init__(self, net):
         if not isinstance(net, int):
             raise TypeError("integer network required")
@@ -469,6 +572,8 @@ class RemoteBroadcast(Address):
 
 class GlobalBroadcast(Address):
 
+    __slots__ = ()
+
     def __init__(self):
         self.addrType = Address.globalBroadcastAddr
         self.addrNet = None
@@ -481,6 +586,8 @@ class GlobalBroadcast(Address):
 
 class PCI(_PCI):
 
+    __slots__ = ('pduExpectingReply', 'pduNetworkPriority')
+
     _debug_contents = ('pduExpectingReply', 'pduNetworkPriority')
 
     def __init__(self, *args, **kwargs):
@@ -27,6 +27,8 @@ _log = ModuleLogger(globals())
 
 class Tag(object):
 
+    __slots__ = ('tagClass', 'tagNumber', 'tagLVT', 'tagData')
+
     applicationTagClass     = 0
     contextTagClass         = 1
     openingTagClass         = 2
@@ -71,6 +73,12 @@ class Tag(object):
             else:
                 raise ValueError("invalid Tag ctor arguments")
 
+    def __getstate__(self):
+        return (self.tagClass, self.tagNumber, self.tagLVT, self.tagData)
+
+    def __setstate__(self, state):
+        self.tagClass, self.tagNumber, self.tagLVT, self.tagData = state
+
     def set(self, tclass, tnum, tlvt=0, tdata=''):
         """set the values of the tag."""
         if not isinstance(tdata, str):
@@ -269,6 +277,8 @@ class Tag(object):
 
 class ApplicationTag(Tag):
 
+    __slots__ = ()
+
     def __init__(self, *args):
         if len(args) == 1 and isinstance(args[0], PDUData):
             Tag.__init__(self, args[0])
@@ -286,6 +296,8 @@ class ApplicationTag(Tag):
 
 class ContextTag(Tag):
 
+    __slots__ = ()
+
     def __init__(self, *args):
         if len(args) == 1 and isinstance(args[0], PDUData):
             Tag.__init__(self, args[0])
@@ -303,6 +315,8 @@ class ContextTag(Tag):
 
 class OpeningTag(Tag):
 
+    __slots__ = ()
+
     def __init__(self, context):
         if isinstance(context, PDUData):
             Tag.__init__(self, context)
@@ -319,6 +333,8 @@ class OpeningTag(Tag):
 
 class ClosingTag(Tag):
 
+    __slots__ = ()
+
     def __init__(self, context):
         if isinstance(context, PDUData):
             Tag.__init__(self, context)
@@ -335,6 +351,8 @@ class ClosingTag(Tag):
 
 class TagList(object):
 
+    __slots__ = ('tagList',)
+
     def __init__(self, arg=None):
         self.tagList = []
 
@@ -345,6 +363,12 @@ class TagList(object):
         elif isinstance(arg, PDUData):
             self.decode(arg)
 
+    def __getstate__(self):
+        return (self.tagList,)
+
+    def __setstate__(self, state):
+        self.tagList, = state
+
     def append(self, tag):
         self.tagList.append(tag)
 
@@ -436,7 +460,7 @@ class TagList(object):
 
     def decode(self, pdu):
         """decode the tags from a PDU."""
-        while pdu.pduData:
+        while pdu.remaining():
             self.tagList.append( Tag(pdu) )
 
     def debug_contents(self, indent=1, file=sys.stdout, _ids=None):
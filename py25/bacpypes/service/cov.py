@@ -7,24 +7,29 @@ Change Of Value Service
 from ..debugging import bacpypes_debugging, DebugContents, ModuleLogger
 from ..capability import Capability
 
-from ..task import OneShotTask, TaskManager
+from ..task import OneShotTask, TaskManager, FunctionTask
 from ..iocb import IOCB
 
 from ..basetypes import DeviceAddress, COVSubscription, PropertyValue, \
-    Recipient, RecipientProcess, ObjectPropertyReference
+    Recipient, RecipientProcess, ObjectPropertyReference, PropertyReference
 from ..constructeddata import ListOf, Any
 from ..apdu import ConfirmedCOVNotificationRequest, \
     UnconfirmedCOVNotificationRequest, \
-    SimpleAckPDU, Error, RejectPDU, AbortPDU
+    SubscribeCOVRequest, SubscribeCOVPropertyRequest, \
+    SimpleAckPDU, Error, RejectPDU, AbortPDU, RejectReason
 from ..errors import ExecutionError
 
 from ..object import Property
 from .detect import DetectionAlgorithm, monitor_filter
+from .poll import PointPoller, _value_key, _error_key
 
 # some debugging
 _debug = 0
 _log = ModuleLogger(globals())
 
+# reject reason when the device does not support the service
+_unrecognized_service = RejectReason('unrecognizedService').get_long()
+
 #
 #   SubscriptionList
 #
@@ -653,3 +658,373 @@ class ChangeOfValueServices(Capability):
 
 bacpypes_debugging(ChangeOfValueServices)
 
+#
+#   ClientSubscription
+#
+
+class ClientSubscription(DebugContents):
+
+    _debug_contents = (
+        'address',
+        'objid',
+        'property_reference',
+        'points',
+        'pending',
+        'active',
+        'expires',
+        )
+
+    def __init__(self, address, objid, property_reference=None):
+        if _debug: ClientSubscription._debug("__init__ %r %r %r", address, objid, property_reference)
+
+        # the property reference is a (property, index) tuple, or None for
+        # the present value and status flags of the object
+        self.address = address
+        self.objid = objid
+        self.property_reference = property_reference
+        self.key = (address, objid, property_reference)
+
+        # watched points that are in the notifications
+        self.points = []
+
+        # a request is in flight, the device has accepted it and when it
+        # will expire in seconds
+        self.pending = False
+        self.active = False
+        self.expires = None
+bacpypes_debugging(ClientSubscription)
+
+#
+#   WatchedPoint
+#
+
+class WatchedPoint(DebugContents):
+
+    _debug_contents = (
+        'point',
+        'interval',
+        'subscription',
+        'polled',
+        'value',
+        'error',
+        )
+
+    def __init__(self, point):
+        if _debug: WatchedPoint._debug("__init__ %r", point)
+
+        self.point = point
+
+        # list of (interval, fn, args, kwargs), the interval in milliseconds
+        # is for polling
+        self.subscribers = []
+        self.interval = None
+
+        # the subscription it is in, or it is polled
+        self.subscription = None
+        self.polled = False
+
+        # what was last delivered
+        self.delivered = False
+        self.value = None
+        self.error = None
+        self._key = None
+bacpypes_debugging(WatchedPoint)
+
+#
+#   ChangeOfValueClientServices
+#
+
+class ChangeOfValueClientServices(Capability):
+
+    def __init__(self):
+        if _debug: ChangeOfValueClientServices._debug("__init__")
+        Capability.__init__(self)
+
+        # subscription parameters, the lifetime is in seconds
+        self.cov_client_process_identifier = 1
+        self.cov_client_confirmed = False
+        self.cov_client_lifetime = 300
+
+        # watched points and subscriptions by (address, object, reference)
+        self.cov_client_points = {}
+        self.cov_client_subscriptions = {}
+
+        # points of devices that do not support COV, or that could not be
+        # subscribed to, are polled
+        self.cov_client_unsupported = set()
+        self.cov_client_poller = PointPoller(self)
+
+        # subscriptions that are close to expiring are renewed together
+        self._cov_client_renew_task = FunctionTask(self._cov_client_renew)
+
+    def watch_point(self, point, interval, fn, *args, **kwargs):
+        """Call the function with the point, value and error when either
+        one changes, using COV when the device supports it and polling every
+        interval milliseconds when it does not."""
+        if _debug: ChangeOfValueClientServices._debug("watch_point %r %r %r %r %r", point, interval, fn, args, kwargs)
+
+        point = self.normalize_point(point)
+
+        watched = self.cov_client_points.get(point, None)
+        if watched is None:
+            watched = self.cov_client_points[point] = WatchedPoint(point)
+            watched.subscribers.append((interval, fn, args, kwargs))
+            watched.interval = interval
+
+            if point[0] in self.cov_client_unsupported:
+                self._cov_client_poll(watched)
+            else:
+                self._cov_client_subscribe(watched)
+        else:
+            watched.subscribers.append((interval, fn, args, kwargs))
+
+            if interval < watched.interval:
+                watched.interval = interval
+                if watched.polled:
+                    self.cov_client_poller.remove_point(point)
+                    self._cov_client_poll(watched)
+
+            # give the new subscriber what is already known
+            if watched.delivered:
+                fn(point, watched.value, watched.error, *args, **kwargs)
+
+        return point
+
+    def unwatch_point(self, point, fn=None):
+        """Stop delivering changes of a point to a function, or to all of
+        them, and cancel the subscription when there are no more."""
+        if _debug: ChangeOfValueClientServices._debug("unwatch_point %r %r", point, fn)
+
+        point = self.normalize_point(point)
+
+        watched = self.cov_client_points.get(point, None)
+        if watched is None:
+            raise RuntimeError("point not watched")
+
+        watched.subscribers = [subscriber for subscriber in watched.subscribers
+            if (fn is not None) and (subscriber[1] != fn)]
+        if watched.subscribers:
+            interval = min(subscriber[0] for subscriber in watched.subscribers)
+            if interval != watched.interval:
+                watched.interval = interval
+                if watched.polled:
+                    self.cov_client_poller.remove_point(point)
+                    self._cov_client_poll(watched)
+            return
+
+        # forget about it
+        del self.cov_client_points[point]
+        if watched.polled:
+            self.cov_client_poller.remove_point(point)
+
+        subscription = watched.subscription
+        if subscription:
+            subscription.points.remove(watched)
+            if not subscription.points:
+                if _debug: ChangeOfValueClientServices._debug("    - cancel %r", subscription)
+                del self.cov_client_subscriptions[subscription.key]
+                self._cov_client_request(subscription, cancel=True)
+
+    def _cov_client_subscribe(self, watched):
+        if _debug: ChangeOfValueClientServices._debug("_cov_client_subscribe %r", watched)
+
+        address, objid, propid, index = watched.point
+
+        # the present value and status flags come with an object subscription
+        if (propid in ('presentValue', 'statusFlags')) and (index is None):
+            property_reference = None
+        else:
+            property_reference = (propid, index)
+
+        key = (address, objid, property_reference)
+        subscription = self.cov_client_subscriptions.get(key, None)
+        if subscription is None:
+            subscription = self.cov_client_subscriptions[key] = \
+                ClientSubscription(address, objid, property_reference)
+            self._cov_client_request(subscription)
+
+        subscription.points.append(watched)
+        watched.subscription = subscription
+
+    def _cov_client_poll(self, watched):
+        if _debug: ChangeOfValueClientServices._debug("_cov_client_poll %r", watched)
+
+        watched.polled = True
+        self.cov_client_poller.add_point(watched.point, watched.interval, self._cov_client_polled)
+
+    def _cov_client_request(self, subscription, cancel=False):
+        if _debug: ChangeOfValueClientServices._debug("_cov_client_request %r cancel=%r", subscription, cancel)
+
+        if subscription.property_reference is None:
+            request = SubscribeCOVRequest(
+                subscriberProcessIdentifier=self.cov_client_process_identifier,
+                monitoredObjectIdentifier=subscription.objid,
+                )
+        else:
+            propid, index = subscription.property_reference
+            request = SubscribeCOVPropertyRequest(
+                subscriberProcessIdentifier=self.cov_client_process_identifier,
+                monitoredObjectIdentifier=subscription.objid,
+                monitoredPropertyIdentifier=PropertyReference(
+                    propertyIdentifier=propid,
+                    propertyArrayIndex=index,
+                    ),
+                )
+        request.pduDestination = subscription.address
+
+        # leaving these out cancels the subscription
+        if not cancel:
+            request.issueConfirmedNotifications = self.cov_client_confirmed
+            request.lifetime = self.cov_client_lifetime
+        if _debug: ChangeOfValueClientServices._debug("    - request: %r", request)
+
+        iocb = IOCB(request)
+        if not cancel:
+            subscription.pending = True
+            iocb.add_callback(self._cov_client_request_complete, subscription)
+
+        self.request_io(iocb)
+
+    def _cov_client_request_complete(self, iocb, subscription):
+        if _debug: ChangeOfValueClientServices._debug("_cov_client_request_complete %r %r", iocb, subscription)
+
+        subscription.pending = False
+
+        # it might have been cancelled
+        if self.cov_client_subscriptions.get(subscription.key, None) is not subscription:
+            return
+
+        if iocb.ioResponse:
+            subscription.active = True
+            subscription.expires = TaskManager().get_time() + self.cov_client_lifetime
+            self._cov_client_schedule(subscription.expires)
+            return
+
+        error = iocb.ioError
+        if _debug: ChangeOfValueClientServices._debug("    - error: %r", error)
+
+        if isinstance(error, RejectPDU) and (error.apduAbortRejectReason == _unrecognized_service):
+            if _debug: ChangeOfValueClientServices._debug("    - COV not supported")
+            self.cov_client_unsupported.add(subscription.address)
+
+            # poll all of the points of the device
+            for other in list(self.cov_client_subscriptions.values()):
+                if other.address == subscription.address:
+                    self._cov_client_fallback(other)
+        else:
+            self._cov_client_fallback(subscription)
+
+    def _cov_client_fallback(self, subscription):
+        if _debug: ChangeOfValueClientServices._debug("_cov_client_fallback %r", subscription)
+
+        del self.cov_client_subscriptions[subscription.key]
+        subscription.active = False
+
+        for watched in subscription.points:
+            watched.subscription = None
+            self._cov_client_poll(watched)
+
+    def _cov_client_schedule(self, expires):
+        """Make sure the renewal task runs before a quarter of the lifetime
+        is left."""
+        when = expires - self.cov_client_lifetime * 0.25
+
+        task = self._cov_client_renew_task
+        if (not task.isScheduled) or (when < task.taskTime):
+            task.install_task(when=when)
+
+    def _cov_client_renew(self):
+        if _debug: ChangeOfValueClientServices._debug("_cov_client_renew")
+
+        now = TaskManager().get_time()
+
+        # renew everything with less than half of the lifetime left
+        next_expires = None
+        for subscription in list(self.cov_client_subscriptions.values()):
+            if subscription.pending or (not subscription.active):
+                continue
+
+            if subscription.expires - now <= self.cov_client_lifetime * 0.5:
+                self._cov_client_request(subscription)
+            elif (next_expires is None) or (subscription.expires < next_expires):
+                next_expires = subscription.expires
+
+        if next_expires is not None:
+            self._cov_client_schedule(next_expires)
+
+    def _cov_client_polled(self, point, value, error):
+        if _debug: ChangeOfValueClientServices._debug("_cov_client_polled %r %r %r", point, value, error)
+
+        watched = self.cov_client_points.get(point, None)
+        if watched is not None:
+            self._cov_client_deliver(watched, value, error)
+
+    def _cov_client_deliver(self, watched, value, error):
+        if _debug: ChangeOfValueClientServices._debug("_cov_client_deliver %r %r %r", watched, value, error)
+
+        if error is None:
+            key = _value_key(value)
+        else:
+            key = _error_key(error)
+
+        # only changes
+        if watched.delivered and (key == watched._key):
+            return
+
+        watched.delivered = True
+        watched.value = value
+        watched.error = error
+        watched._key = key
+
+        for interval, fn, args, kwargs in list(watched.subscribers):
+            fn(watched.point, value, error, *args, **kwargs)
+
+    def _cov_client_notification(self, apdu):
+        """Deliver the values in a notification, returns false if it is not
+        for one of the subscriptions."""
+        if _debug: ChangeOfValueClientServices._debug("_cov_client_notification %r", apdu)
+
+        if apdu.subscriberProcessIdentifier != self.cov_client_process_identifier:
+            return False
+
+        address = apdu.pduSource
+        objid = apdu.monitoredObjectIdentifier
+
+        found = (address, objid, None) in self.cov_client_subscriptions
+        for element in apdu.listOfValues:
+            propid = element.propertyIdentifier
+            index = element.propertyArrayIndex
+            if (address, objid, (propid, index)) in self.cov_client_subscriptions:
+                found = True
+
+            watched = self.cov_client_points.get((address, objid, propid, index), None)
+            if (watched is None) or (watched.subscription is None):
+                continue
+
+            try:
+                value = self.decode_point_value(watched.point, element.value)
+            except Exception, err:
+                self._cov_client_deliver(watched, None, err)
+            else:
+                self._cov_client_deliver(watched, value, None)
+
+        return found
+
+    def do_ConfirmedCOVNotificationRequest(self, apdu):
+        if _debug: ChangeOfValueClientServices._debug("do_ConfirmedCOVNotificationRequest %r", apdu)
+
+        if not self._cov_client_notification(apdu):
+            raise ExecutionError(errorClass='services', errorCode='unknownSubscription')
+
+        # success
+        response = SimpleAckPDU(context=apdu)
+
+        # return the result
+        self.response(response)
+
+    def do_UnconfirmedCOVNotificationRequest(self, apdu):
+        if _debug: ChangeOfValueClientServices._debug("do_UnconfirmedCOVNotificationRequest %r", apdu)
+
+        self._cov_client_notification(apdu)
+
+bacpypes_debugging(ChangeOfValueClientServices)
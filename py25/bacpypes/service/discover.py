@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+
+"""
+Discovery Services
+"""
+
+from ..debugging import bacpypes_debugging, ModuleLogger, DebugContents
+from ..task import OneShotTask, TaskManager
+
+# some debugging
+_debug = 0
+_log = ModuleLogger(globals())
+
+# highest device instance number
+MAX_INSTANCE = 4194303
+
+#
+#   DiscoveryRange
+#
+
+class DiscoveryRange(DebugContents):
+
+    _debug_contents = (
+        'low_limit',
+        'high_limit',
+        'attempt',
+        'expected',
+        'deadline',
+        'count',
+        )
+
+    def __init__(self, low_limit, high_limit, expected=None, attempt=0):
+        if _debug: DiscoveryRange._debug("__init__ %r %r expected=%r attempt=%r", low_limit, high_limit, expected, attempt)
+
+        self.low_limit = low_limit
+        self.high_limit = high_limit
+
+        # times it has been asked for before and the number of responses
+        # that are expected, None when it is not known
+        self.attempt = attempt
+        self.expected = expected
+
+        # when the responses are in and how many there have been
+        self.deadline = None
+        self.count = 0
+
+    def __len__(self):
+        return self.high_limit - self.low_limit + 1
+
+bacpypes_debugging(DiscoveryRange)
+
+#
+#   WhoIsDiscovery
+#
+
+class WhoIsDiscovery(OneShotTask):
+
+    """Find the devices in a range of instance numbers with Who-Is requests
+    for smaller ranges, so the devices do not all answer at once.  The size
+    of the ranges and the time between requests follow the number of I-Am
+    responses, ranges with too many responses to trust are split and asked
+    for again."""
+
+    _debug_contents = (
+        'low_limit',
+        'high_limit',
+        'span',
+        'max_responses',
+        'response_rate',
+        'requests',
+        'responses',
+        'covered',
+        )
+
+    def __init__(self, app, low_limit=0, high_limit=MAX_INSTANCE, address=None,
+            span=1024, max_responses=100, response_rate=100.0,
+            request_interval=0.1, timeout=3.0, retries=1, max_outstanding=1):
+        if _debug: WhoIsDiscovery._debug("__init__ %r %r %r address=%r span=%r max_responses=%r response_rate=%r request_interval=%r timeout=%r retries=%r max_outstanding=%r", app, low_limit, high_limit, address, span, max_responses, response_rate, request_interval, timeout, retries, max_outstanding)
+        OneShotTask.__init__(self)
+
+        if (low_limit < 0) or (high_limit > MAX_INSTANCE) or (low_limit > high_limit):
+            raise ValueError("invalid instance range")
+
+        # the application sends the requests and its WhoIsIAmServices
+        # passes along the responses
+        self.app = app
+        self.address = address
+
+        # the instance numbers to look for
+        self.low_limit = low_limit
+        self.high_limit = high_limit
+
+        # number of instances in the next range, it grows when there are
+        # few responses and shrinks when there are too many
+        self.span = span
+
+        # responses in one range that are too many to trust, the number of
+        # responses per second to aim for, and the least number of seconds
+        # between requests
+        self.max_responses = max_responses
+        self.response_rate = response_rate
+        self.request_interval = request_interval
+
+        # seconds to wait for the responses to a request, times to ask
+        # again for a range with no responses, and requests at a time
+        self.timeout = timeout
+        self.retries = retries
+        self.max_outstanding = max_outstanding
+
+        # the next instance number to ask about, ranges to ask about again,
+        # and ranges waiting for their responses
+        self.next_low_limit = low_limit
+        self.pending = []
+        self.outstanding = []
+        self.next_request_time = None
+
+        # devices that have been found by instance number
+        self.devices = {}
+
+        # responses per instance number in the last range, devices are
+        # usually numbered in clusters
+        self.density = 0.0
+
+        # statistics, covered is the number of instances that have been
+        # answered for
+        self.requests = 0
+        self.responses = 0
+        self.covered = 0
+
+        self.running = False
+
+    def start(self):
+        """Start looking."""
+        if _debug: WhoIsDiscovery._debug("start")
+
+        if self.running:
+            raise RuntimeError("already running")
+        self.running = True
+
+        # the application passes along the I-Am requests
+        self.app.device_discoveries.append(self)
+
+        self.install_task(when=TaskManager().get_time())
+
+    def stop(self):
+        """Stop looking."""
+        if _debug: WhoIsDiscovery._debug("stop")
+
+        if not self.running:
+            return
+        self.running = False
+
+        self.app.device_discoveries.remove(self)
+        if self.isScheduled:
+            self.suspend_task()
+
+    def coverage(self):
+        """Return the fraction of the instance numbers that have an answer."""
+        return float(self.covered) / (self.high_limit - self.low_limit + 1)
+
+    def process_task(self):
+        if _debug: WhoIsDiscovery._debug("process_task")
+
+        now = TaskManager().get_time()
+
+        # ranges with their responses in
+        for discovery_range in list(self.outstanding):
+            if discovery_range.deadline <= now:
+                self.outstanding.remove(discovery_range)
+                self._range_complete(discovery_range)
+
+        # ask about more
+        while (len(self.outstanding) < self.max_outstanding) and \
+                ((self.next_request_time is None) or (self.next_request_time <= now)):
+            discovery_range = self._next_range()
+            if discovery_range is None:
+                break
+            self._send_range(discovery_range, now)
+
+        # all done
+        if not self.outstanding and not self.pending and (self.next_low_limit > self.high_limit):
+            if _debug: WhoIsDiscovery._debug("    - complete")
+            self.stop()
+            self.complete()
+            return
+
+        # wake up for the next deadline or request
+        wake_times = [discovery_range.deadline for discovery_range in self.outstanding]
+        if (len(self.outstanding) < self.max_outstanding) and \
+                (self.pending or (self.next_low_limit <= self.high_limit)):
+            wake_times.append(self.next_request_time)
+        self.install_task(when=min(wake_times))
+
+    def _next_range(self):
+        if _debug: WhoIsDiscovery._debug("_next_range")
+
+        # ranges to ask about again come first, split the ones that look
+        # like they will have too many responses
+        while self.pending:
+            discovery_range = self.pending.pop(0)
+            if (len(discovery_range) > 1) and (self._expected(discovery_range) >= self.max_responses):
+                self._split_range(discovery_range)
+                continue
+            return discovery_range
+
+        if self.next_low_limit > self.high_limit:
+            return None
+
+        low_limit = self.next_low_limit
+        high_limit = min(low_limit + self.span - 1, self.high_limit)
+        self.next_low_limit = high_limit + 1
+
+        return DiscoveryRange(low_limit, high_limit)
+
+    def _send_range(self, discovery_range, now):
+        if _debug: WhoIsDiscovery._debug("_send_range %r %r", discovery_range, now)
+
+        # leave time for the responses before the next request
+        expected = self._expected(discovery_range)
+        self.next_request_time = now + max(self.request_interval, expected / self.response_rate)
+
+        discovery_range.deadline = now + self.timeout
+        discovery_range.count = 0
+        self.outstanding.append(discovery_range)
+        self.requests += 1
+
+        self.app.who_is(discovery_range.low_limit, discovery_range.high_limit, self.address)
+
+    def _expected(self, discovery_range):
+        """Return the number of responses expected for a range."""
+        # there were none the last time
+        if discovery_range.attempt:
+            return 0.0
+
+        # guess from the last range
+        expected = self.density * len(discovery_range)
+        if discovery_range.expected is not None:
+            expected = max(expected, discovery_range.expected)
+
+        return expected
+
+    def _split_range(self, discovery_range):
+        if _debug: WhoIsDiscovery._debug("_split_range %r", discovery_range)
+
+        # ask about each half before anything else
+        expected = self._expected(discovery_range) / 2.0
+        middle = discovery_range.low_limit + len(discovery_range) // 2
+        self.pending[:0] = [
+            DiscoveryRange(discovery_range.low_limit, middle - 1, expected),
+            DiscoveryRange(middle, discovery_range.high_limit, expected),
+            ]
+
+    def _range_complete(self, discovery_range):
+        if _debug: WhoIsDiscovery._debug("_range_complete %r", discovery_range)
+
+        count = discovery_range.count
+        size = len(discovery_range)
+
+        if (count >= self.max_responses) and (size > 1):
+            if _debug: WhoIsDiscovery._debug("    - too many responses")
+
+            # there are at least this many
+            discovery_range.expected = max(discovery_range.expected or 0.0, count)
+            self.density = max(self.density, float(count) / size)
+            self._split_range(discovery_range)
+
+            # smaller ranges from now on
+            self.span = max(1, min(self.span, size) // 2)
+            return
+
+        if (not count) and (discovery_range.attempt < self.retries):
+            if _debug: WhoIsDiscovery._debug("    - no responses, try again")
+
+            self.pending.append(DiscoveryRange(discovery_range.low_limit,
+                discovery_range.high_limit, 0, discovery_range.attempt + 1))
+            return
+
+        # the instances in this range have been answered for
+        self.covered += size
+        self.density = float(count) / size
+
+        # aim for half the responses that are too many, growing no faster
+        # than twice the size each time
+        span = self.span * 2
+        if count:
+            span = min(span, int(size * self.max_responses / 2.0 / count))
+        self.span = max(1, min(span, self.high_limit - self.low_limit + 1))
+
+    def i_am(self, apdu):
+        """Called by the application with each I-Am request."""
+        if _debug: WhoIsDiscovery._debug("i_am %r", apdu)
+
+        device_instance = apdu.iAmDeviceIdentifier[1]
+        if (device_instance < self.low_limit) or (device_instance > self.high_limit):
+            return
+
+        # count it for the range that asked
+        for discovery_range in self.outstanding:
+            if discovery_range.low_limit <= device_instance <= discovery_range.high_limit:
+                discovery_range.count += 1
+                self.responses += 1
+                break
+
+        # add it to the cache as it comes in
+        self.app.deviceInfoCache.add_device_info(apdu)
+
+        if device_instance not in self.devices:
+            self.devices[device_instance] = apdu.pduSource
+            self.found(device_instance, apdu.pduSource)
+
+    def found(self, device_instance, address):
+        """Called when a device is found."""
+        if _debug: WhoIsDiscovery._debug("found %r %r", device_instance, address)
+
+    def complete(self):
+        """Called when every range has been asked about."""
+        if _debug: WhoIsDiscovery._debug("complete")
+
+bacpypes_debugging(WhoIsDiscovery)
@@ -6,6 +6,7 @@ Task
 
 import sys
 
+from math import ceil
 from time import time as _time
 from heapq import heapify, heappush, heappop
 
@@ -20,6 +21,9 @@ _log = ModuleLogger(globals())
 _task_manager = None
 _unscheduled_tasks = []
 
+# minimum number of stale heap entries before compacting
+COMPACT_THRESHOLD = 1024
+
 # only defined for linux platforms
 if sys.platform in ('linux2', 'darwin'):
     from .event import WaitableEvent
@@ -36,8 +40,8 @@ if sys.platform in ('linux2', 'darwin'):
         def handle_read(self):
             if _debug: _Trigger._debug("handle_read")
 
-            # read in the character, highlander
-            data = self.recv(1)
+            # read in the character (or eventfd counter), highlander
+            data = self.recv(8)
             if _debug: _Trigger._debug("    - data: %r", data)
 else:
     _Trigger = None
@@ -50,6 +54,9 @@ class _Task(DebugContents, Logging):
 
     _debug_contents = ('taskTime', 'isScheduled')
 
+    # the entry in the task manager heap when scheduled
+    _task_entry = None
+
     def __init__(self):
         self.taskTime = None
         self.isScheduled = False
@@ -259,6 +266,144 @@ def recurring_function(interval, offset=None):
 
 bacpypes_debugging(recurring_function)
 
+#
+#   TimingWheel
+#
+#   A hierarchical timing wheel that can be given to the task manager to
+#   hold tasks that are not due yet.  Arming a task is appending its entry
+#   to a slot, and suspending it leaves the entry behind like the heap, so
+#   both are O(1).  When the task manager runs out of tasks in its heap it
+#   asks the wheel to advance to the next slot with entries and pushes them
+#   into the heap, so tasks still run in order and at their exact time, the
+#   tick only sets how many of them are in the heap at once.
+#
+
+class TimingWheel(DebugContents):
+
+    _debug_contents = ('tick', 'slotBits', 'levels', 'current', 'count')
+
+    def __init__(self, tick=0.01, slot_bits=8, levels=4):
+        if _debug: TimingWheel._debug("__init__ tick=%r slot_bits=%r levels=%r", tick, slot_bits, levels)
+
+        if tick <= 0.0:
+            raise ValueError("tick must be greater than zero")
+        if (slot_bits < 1) or (levels < 1):
+            raise ValueError("at least one slot bit and one level required")
+
+        self.tick = float(tick)
+        self.slotBits = slot_bits
+        self.levels = levels
+
+        # a list of slots for each level and a list for everything beyond
+        self.slotMask = (1 << slot_bits) - 1
+        self.wheels = [[[] for i in range(1 << slot_bits)] for j in range(levels)]
+        self.overflow = []
+
+        # the current tick, everything in the wheel is after this
+        self.current = None
+
+        # number of entries in the wheel, including stale ones
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def arm(self, entry, now):
+        """Put a (when, sequence, task) entry in a slot and return True, or return
+        False if it is already due and belongs in the heap."""
+        # if the wheel is empty the current tick can jump forward
+        if (not self.count) and (now is not None):
+            now = int(now / self.tick)
+            if (self.current is None) or (now > self.current):
+                self.current = now
+
+        tick = int(ceil(entry[0] / self.tick))
+        if (self.current is None) or (tick <= self.current):
+            return False
+
+        self._arm(tick, entry)
+        self.count += 1
+
+        return True
+
+    def _arm(self, tick, entry):
+        # find the lowest level where the rest of the tick matches
+        slot_bits = self.slotBits
+        diff = tick ^ self.current
+        for level in range(self.levels):
+            shift = slot_bits * level
+            if not (diff >> (shift + slot_bits)):
+                self.wheels[level][(tick >> shift) & self.slotMask].append(entry)
+                return
+
+        self.overflow.append(entry)
+
+    def advance(self):
+        """Move the current tick to the next slot with entries and return
+        them, or an empty list when the wheel is empty."""
+        if _debug: TimingWheel._debug("advance")
+
+        slot_bits = self.slotBits
+        slot_mask = self.slotMask
+
+        due = []
+        while self.count and not due:
+            current = self.current
+
+            # look for the next slot with something in it
+            for level in range(self.levels):
+                shift = slot_bits * level
+                slots = self.wheels[level]
+                for index in range(((current >> shift) & slot_mask) + 1, slot_mask + 1):
+                    if slots[index]:
+                        break
+                else:
+                    continue
+                break
+            else:
+                level = None
+
+            if level is None:
+                # jump to the earliest entry beyond the wheel
+                entries = self.overflow
+                self.overflow = []
+                self.current = min(int(ceil(entry[0] / self.tick)) for entry in entries)
+            else:
+                # move to the start of the slot
+                entries = slots[index]
+                slots[index] = []
+                shift += slot_bits
+                self.current = ((current >> shift) << shift) | (index << (shift - slot_bits))
+            if _debug: TimingWheel._debug("    - current: %r", self.current)
+
+            # entries are either due or cascade into lower levels
+            for entry in entries:
+                tick = int(ceil(entry[0] / self.tick))
+                if tick <= self.current:
+                    due.append(entry)
+                else:
+                    self._arm(tick, entry)
+
+            self.count -= len(due)
+
+        return due
+
+    def compact(self):
+        """Drop the entries of tasks that have been suspended or moved."""
+        if _debug: TimingWheel._debug("compact")
+
+        count = 0
+        for slots in self.wheels:
+            for index, entries in enumerate(slots):
+                if entries:
+                    slots[index] = entries = [entry for entry in entries if entry[2]._task_entry is entry]
+                    count += len(entries)
+
+        self.overflow = [entry for entry in self.overflow if entry[2]._task_entry is entry]
+        self.count = count + len(self.overflow)
+
+bacpypes_debugging(TimingWheel)
+
 #
 #   TaskManager
 #
@@ -266,12 +411,19 @@ bacpypes_debugging(recurring_function)
 # @bacpypes_debugging - implicit via metaclass
 class TaskManager(SingletonLogging):
 
-    def __init__(self):
-        if _debug: TaskManager._debug("__init__")
+    def __init__(self, wheel=None):
+        if _debug: TaskManager._debug("__init__ wheel=%r", wheel)
         global _task_manager, _unscheduled_tasks
 
-        # initialize
+        # initialize, the tasks are a heap of (when, sequence, task) entries
+        # and the entries of suspended or rescheduled tasks are left behind,
+        # the sequence keeps tasks scheduled for the same time in order
         self.tasks = []
+        self.stale_tasks = 0
+        self.sequence = 0
+
+        # tasks that are not due yet can be held in a timing wheel
+        self.wheel = wheel
         if _Trigger:
             self.trigger = _Trigger()
         else:
@@ -299,16 +451,24 @@ class TaskManager(SingletonLogging):
         if task.taskTime is None:
             raise RuntimeError("task time is None")
 
-        # if this is already installed, suspend it
+        # if this is already installed, the old entry is left behind
         if task.isScheduled:
-            self.suspend_task(task)
-
-        # save this in the task list
-        heappush( self.tasks, (task.taskTime, task) )
+            if _debug: TaskManager._debug("    - rescheduled")
+            self.stale_tasks += 1
+
+        # save this in the wheel or the task list
+        self.sequence += 1
+        task._task_entry = entry = (task.taskTime, self.sequence, task)
+        if (self.wheel is None) or (not self.wheel.arm(entry, self.get_time())):
+            heappush(self.tasks, entry)
         if _debug: TaskManager._debug("    - tasks: %r", self.tasks)
 
         task.isScheduled = True
 
+        # maybe clean up
+        if self.stale_tasks > COMPACT_THRESHOLD:
+            self.compact_tasks()
+
         # trigger the event
         if self.trigger:
             self.trigger.set()
@@ -316,15 +476,15 @@ class TaskManager(SingletonLogging):
     def suspend_task(self, task):
         if _debug: TaskManager._debug("suspend_task %r", task)
 
-        # remove this guy
-        for i, (when, curtask) in enumerate(self.tasks):
-            if task is curtask:
-                if _debug: TaskManager._debug("    - task found")
-                del self.tasks[i]
+        # forget about the entry, it will be skipped when it comes up
+        if task.isScheduled and (task._task_entry is not None):
+            if _debug: TaskManager._debug("    - task found")
+            task._task_entry = None
+            task.isScheduled = False
 
-                task.isScheduled = False
-                heapify(self.tasks)
-                break
+            self.stale_tasks += 1
+            if self.stale_tasks > COMPACT_THRESHOLD:
+                self.compact_tasks()
         else:
             if _debug: TaskManager._debug("    - task not found")
 
@@ -338,6 +498,59 @@ class TaskManager(SingletonLogging):
         # just re-install it
         self.install_task(task)
 
+    def compact_tasks(self):
+        """Rebuild the heap without the stale entries when they are more
+        than half of it, which keeps the cost of a rebuild amortized."""
+        if _debug: TaskManager._debug("compact_tasks")
+
+        total = len(self.tasks)
+        if self.wheel is not None:
+            total += len(self.wheel)
+        if self.stale_tasks * 2 <= total:
+            return
+
+        self.tasks = [entry for entry in self.tasks if entry[2]._task_entry is entry]
+        heapify(self.tasks)
+        if self.wheel is not None:
+            self.wheel.compact()
+        self.stale_tasks = 0
+
+    def peek_task(self):
+        """Return the (when, task) of the next scheduled task or None if
+        there isn't one, dropping stale entries along the way."""
+        tasks = self.tasks
+        while True:
+            while tasks:
+                entry = tasks[0]
+                if entry[2]._task_entry is entry:
+                    return (entry[0], entry[2])
+
+                heappop(tasks)
+                if self.stale_tasks:
+                    self.stale_tasks -= 1
+
+            # refill the heap from the next slot in the wheel
+            if (self.wheel is None) or (not self.wheel.count):
+                return None
+
+            for entry in self.wheel.advance():
+                if entry[2]._task_entry is entry:
+                    heappush(tasks, entry)
+                elif self.stale_tasks:
+                    self.stale_tasks -= 1
+
+    def pop_task(self):
+        """Remove the next scheduled task from the heap, mark that it's no
+        longer scheduled, and return its (when, task)."""
+        if self.peek_task() is None:
+            raise RuntimeError("no scheduled tasks")
+
+        when, _, task = heappop(self.tasks)
+        task._task_entry = None
+        task.isScheduled = False
+
+        return (when, task)
+
     def get_next_task(self):
         """get the next task if there's one that should be processed,
         and return how long it will be until the next one should be
@@ -350,19 +563,18 @@ class TaskManager(SingletonLogging):
         task = None
         delta = None
 
-        if self.tasks:
-            # look at the first task
-            when, nxttask = self.tasks[0]
+        # look at the first task
+        entry = self.peek_task()
+        if entry:
+            when, nxttask = entry
             if when <= now:
                 # pull it off the list and mark that it's no longer scheduled
-                heappop(self.tasks)
-                task = nxttask
-                task.isScheduled = False
-
-                if self.tasks:
-                    when, nxttask = self.tasks[0]
-                    # peek at the next task, return how long to wait
-                    delta = max(when - now, 0.0)
+                when, task = self.pop_task()
+
+                # peek at the next task, return how long to wait
+                entry = self.peek_task()
+                if entry:
+                    delta = max(entry[0] - now, 0.0)
             else:
                 delta = when - now
 
@@ -35,6 +35,8 @@ element_map = {}
 @bacpypes_debugging
 class PCI(DebugContents):
 
+    __slots__ = ('pduUserData', 'pduSource', 'pduDestination')
+
     _debug_contents = ('pduUserData+', 'pduSource', 'pduDestination')
 
     def __init__(self, *args, **kwargs):
@@ -96,6 +98,12 @@ class PCI(DebugContents):
 #
 #   PDUData
 #
+#   The data is kept in a string with a read cursor, getting octets moves
+#   the cursor along rather than slicing a new string for what is left, so
+#   decoding is a single pass over the data.  The pduData attribute is the
+#   data that has not been read, the string is trimmed when it is
+#   referenced.
+#
 
 @bacpypes_debugging
 class PDUData(object):
@@ -117,23 +125,42 @@ class PDUData(object):
         else:
             raise TypeError("string expected")
 
+    def _get_pdu_data(self):
+        # trim off what has been read
+        if self._pduOffset:
+            self._pduBuffer = self._pduBuffer[self._pduOffset:]
+            self._pduOffset = 0
+
+        return self._pduBuffer
+
+    def _set_pdu_data(self, data):
+        self._pduBuffer = data
+        self._pduOffset = 0
+
+    pduData = property(_get_pdu_data, _set_pdu_data)
+
+    def remaining(self):
+        """Return the number of octets that have not been read."""
+        return len(self._pduBuffer) - self._pduOffset
+
     def get(self):
-        if len(self.pduData) == 0:
+        offset = self._pduOffset
+        if offset >= len(self._pduBuffer):
             raise DecodingError("no more packet data")
 
-        octet = ord(self.pduData[0])
-        self.pduData = self.pduData[1:]
+        self._pduOffset = offset + 1
 
-        return octet
+        return ord(self._pduBuffer[offset])
 
     def get_data(self, dlen):
-        if len(self.pduData) < dlen:
+        offset = self._pduOffset
+        if len(self._pduBuffer) - offset < dlen:
             raise DecodingError("no more packet data")
 
-        data = self.pduData[:dlen]
-        self.pduData = self.pduData[dlen:]
+        # strings are immutable, all of the rest of the data is not copied
+        self._pduOffset = offset + dlen
 
-        return data
+        return self._pduBuffer[offset:offset + dlen]
 
     def get_short(self):
         return struct.unpack('>H',self.get_data(2))[0]
@@ -154,6 +181,11 @@ class PDUData(object):
     def put_long(self, n):
         self.pduData += struct.pack('>L',n & _long_mask)
 
+    def put_header(self, fmt, values, data=b''):
+        """Append a header packed with a struct format followed by the data,
+        strings are immutable so they are put together in one step."""
+        self.pduData += struct.pack(fmt, *values) + data
+
     def debug_contents(self, indent=1, file=sys.stdout, _ids=None):
         if isinstance(self.pduData, str):
             if len(self.pduData) > 20:
@@ -11,3 +11,6 @@ from . import device
 from . import object
 from . import cov
 from . import file
+from . import read
+from . import poll
+from . import discover
@@ -5,11 +5,13 @@ UDP Communications Module
 """
 
 import asyncore
+import errno
 import socket
 import cPickle as pickle
 import Queue as queue
 
 from time import time as _time
+from collections import deque
 
 from .debugging import ModuleLogger, bacpypes_debugging
 
@@ -22,6 +24,33 @@ from .comm import ServiceAccessPoint
 _debug = 0
 _log = ModuleLogger(globals())
 
+# maximum number of datagrams read from the socket at once
+READ_LIMIT = 32
+
+#
+#   _RequestQueue
+#
+#   The outbound queue of a director.  PDUs with a higher network priority
+#   are sent first, and in the order they were queued within a priority.
+#   PDUs without a network priority are normal (zero).
+#
+
+class _RequestQueue(queue.Queue):
+
+    def _init(self, maxsize):
+        self.queue = [deque() for i in range(4)]
+
+    def _qsize(self, len=len):
+        return sum([len(q) for q in self.queue])
+
+    def _put(self, pdu):
+        self.queue[getattr(pdu, 'pduNetworkPriority', 0) & 0x03].append(pdu)
+
+    def _get(self):
+        for q in reversed(self.queue):
+            if q:
+                return q.popleft()
+
 #
 #   UDPActor
 #
@@ -125,8 +154,8 @@ class UDPPickleActor(UDPActor):
 @bacpypes_debugging
 class UDPDirector(asyncore.dispatcher, Server, ServiceAccessPoint):
 
-    def __init__(self, address, timeout=0, reuse=False, actorClass=UDPActor, sid=None, sapID=None):
-        if _debug: UDPDirector._debug("__init__ %r timeout=%r reuse=%r actorClass=%r sid=%r sapID=%r", address, timeout, reuse, actorClass, sid, sapID)
+    def __init__(self, address, timeout=0, reuse=False, actorClass=UDPActor, priorityFn=None, sid=None, sapID=None):
+        if _debug: UDPDirector._debug("__init__ %r timeout=%r reuse=%r actorClass=%r priorityFn=%r sid=%r sapID=%r", address, timeout, reuse, actorClass, priorityFn, sid, sapID)
         Server.__init__(self, sid)
         ServiceAccessPoint.__init__(self, sapID)
 
@@ -138,6 +167,9 @@ class UDPDirector(asyncore.dispatcher, Server, ServiceAccessPoint):
         # save the timeout for actors
         self.timeout = timeout
 
+        # function to get the network priority of an incoming datagram
+        self.priorityFn = priorityFn
+
         # save the address
         self.address = address
 
@@ -158,7 +190,7 @@ class UDPDirector(asyncore.dispatcher, Server, ServiceAccessPoint):
         self.socket.setsockopt( socket.SOL_SOCKET, socket.SO_BROADCAST, 1 )
 
         # create the request queue
-        self.request = queue.Queue()
+        self.request = _RequestQueue()
 
         # start with an empty peer pool
         self.peers = {}
@@ -202,18 +234,20 @@ class UDPDirector(asyncore.dispatcher, Server, ServiceAccessPoint):
     def handle_read(self):
         if _debug: UDPDirector._debug("handle_read")
 
+        # read what is waiting, up to a limit
+        pdus = []
         try:
-            msg, addr = self.socket.recvfrom(65536)
-            if _debug: UDPDirector._debug("    - received %d octets from %s", len(msg), addr)
+            while len(pdus) < READ_LIMIT:
+                msg, addr = self.socket.recvfrom(65536)
+                if _debug: UDPDirector._debug("    - received %d octets from %s", len(msg), addr)
 
-            # send the PDU up to the client
-            deferred(self._response, PDU(msg, source=addr))
+                pdus.append(PDU(msg, source=addr))
 
         except socket.timeout as err:
             if _debug: UDPDirector._debug("    - socket timeout: %s", err)
 
         except socket.error as err:
-            if err.args[0] == 11:
+            if err.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
                 pass
             else:
                 if _debug: UDPDirector._debug("    - socket error: %s", err)
@@ -221,6 +255,14 @@ class UDPDirector(asyncore.dispatcher, Server, ServiceAccessPoint):
                 # pass along to a handler
                 self.handle_error(err)
 
+        # higher priority datagrams go first, the sort is stable
+        if self.priorityFn and (len(pdus) > 1):
+            pdus.sort(key=lambda pdu: -self.priorityFn(pdu.pduData))
+
+        # send the PDUs up to the client
+        for pdu in pdus:
+            deferred(self._response, pdu)
+
     def writable(self):
         """Return true iff there is a request pending."""
         return (not self.request.empty())
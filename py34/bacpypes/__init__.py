@@ -31,6 +31,7 @@ from . import task
 from . import singleton
 from . import capability
 from . import iocb
+from . import aio
 
 #
 #   Link Layer Modules
@@ -0,0 +1,139 @@
+#!/usr/bin/python
+
+"""
+Asyncio
+"""
+
+import asyncio
+import threading
+import weakref
+
+from .debugging import bacpypes_debugging, ModuleLogger
+from .core import deferred
+
+# some debugging
+_debug = 0
+_log = ModuleLogger(globals())
+
+#
+#   RequestError
+#
+
+class RequestError(RuntimeError):
+
+    """This error is raised by a future when the IOCB it is waiting for
+    was aborted with something that is not an exception, like an Error,
+    Reject or Abort PDU, which is kept in the error attribute.
+    """
+
+    def __init__(self, error):
+        RuntimeError.__init__(self, error)
+        self.error = error
+
+#
+#   FutureBridge
+#
+
+@bacpypes_debugging
+class FutureBridge:
+
+    """Pass the results of IOCBs completed in the thread running core.run()
+    to the futures waiting for them in an event loop.  The results are
+    collected and the loop is woken up once for as many as are ready rather
+    than once for each request."""
+
+    def __init__(self, loop):
+        if _debug: FutureBridge._debug("__init__ %r", loop)
+
+        self.loop = loop
+
+        # list of (future, response, error) waiting to be set
+        self.lock = threading.Lock()
+        self.ready = []
+        self.scheduled = False
+
+    def add_iocb(self, iocb, fn=None):
+        """Return a future for an IOCB, the function is called with the
+        response in the core.run() thread and the future gets what it
+        returns."""
+        if _debug: FutureBridge._debug("add_iocb %r %r", iocb, fn)
+
+        future = asyncio.Future(loop=self.loop)
+        future.add_done_callback(lambda future: self._future_done(future, iocb))
+
+        iocb.add_callback(self._iocb_complete, future, fn)
+
+        return future
+
+    def _iocb_complete(self, iocb, future, fn):
+        if _debug: FutureBridge._debug("_iocb_complete %r %r %r", iocb, future, fn)
+
+        response = error = None
+        if iocb.ioError is not None:
+            error = iocb.ioError
+            if not isinstance(error, Exception):
+                error = RequestError(error)
+        elif fn:
+            try:
+                response = fn(iocb.ioResponse)
+            except Exception as err:
+                error = err
+        else:
+            response = iocb.ioResponse
+
+        with self.lock:
+            self.ready.append((future, response, error))
+            if self.scheduled:
+                return
+            self.scheduled = True
+
+        # the loop picks up everything that is ready by the time it runs
+        self.loop.call_soon_threadsafe(self._set_futures)
+
+    def _set_futures(self):
+        if _debug: FutureBridge._debug("_set_futures")
+
+        with self.lock:
+            ready, self.ready = self.ready, []
+            self.scheduled = False
+        if _debug: FutureBridge._debug("    - ready: %r", len(ready))
+
+        for future, response, error in ready:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(response)
+
+    def _future_done(self, future, iocb):
+        if _debug: FutureBridge._debug("_future_done %r %r", future, iocb)
+
+        # stop the request when nothing is waiting for it
+        if future.cancelled():
+            deferred(iocb.abort, asyncio.CancelledError())
+
+#
+#   iocb_future
+#
+
+_bridges = weakref.WeakKeyDictionary()
+_bridges_lock = threading.Lock()
+
+@bacpypes_debugging
+def iocb_future(iocb, loop=None, fn=None):
+    """Return a future in the event loop, or the current one, that gets the
+    response of the IOCB or raises its error.  The optional function is
+    called with the response in the core.run() thread, the future gets what
+    it returns."""
+    if _debug: iocb_future._debug("iocb_future %r %r %r", iocb, loop, fn)
+
+    if loop is None:
+        loop = asyncio.get_event_loop()
+
+    with _bridges_lock:
+        bridge = _bridges.get(loop, None)
+        if bridge is None:
+            bridge = _bridges[loop] = FutureBridge(loop)
+
+    return bridge.add_iocb(iocb, fn)
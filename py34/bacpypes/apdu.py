@@ -100,6 +100,11 @@ def decode_max_apdu_length_accepted(arg):
 @bacpypes_debugging
 class APCI(PCI, DebugContents):
 
+    __slots__ = ('apduType', 'apduSeg', 'apduMor', 'apduSA', 'apduSrv'
+        , 'apduNak', 'apduSeq', 'apduWin', 'apduMaxSegs', 'apduMaxResp'
+        , 'apduService', 'apduInvokeID', 'apduAbortRejectReason'
+        )
+
     _debug_contents = ('apduType', 'apduSeg', 'apduMor', 'apduSA', 'apduSrv'
         , 'apduNak', 'apduSeq', 'apduWin', 'apduMaxSegs', 'apduMaxResp'
         , 'apduService', 'apduInvokeID', 'apduAbortRejectReason'
@@ -158,8 +163,8 @@ class APCI(PCI, DebugContents):
         # put it together
         return "<{0}({1}) instance at {2}>".format(sname, stype, hex(id(self)))
 
-    def encode(self, pdu):
-        """encode the contents of the APCI into the PDU."""
+    def encode(self, pdu, data=b''):
+        """encode the contents of the APCI into the PDU, followed by the data."""
         if _debug: APCI._debug("encode %r", pdu)
 
         PCI.update(pdu, self)
@@ -173,22 +178,19 @@ class APCI(PCI, DebugContents):
                 buff += 0x04
             if self.apduSA:
                 buff += 0x02
-            pdu.put(buff)
-            pdu.put((encode_max_segments_accepted(self.apduMaxSegs) << 4) + encode_max_apdu_length_accepted(self.apduMaxResp))
-            pdu.put(self.apduInvokeID)
+            header = [buff]
+            header.append((encode_max_segments_accepted(self.apduMaxSegs) << 4) + encode_max_apdu_length_accepted(self.apduMaxResp))
+            header.append(self.apduInvokeID)
             if self.apduSeg:
-                pdu.put(self.apduSeq)
-                pdu.put(self.apduWin)
-            pdu.put(self.apduService)
+                header.append(self.apduSeq)
+                header.append(self.apduWin)
+            header.append(self.apduService)
 
         elif (self.apduType == UnconfirmedRequestPDU.pduType):
-            pdu.put(self.apduType << 4)
-            pdu.put(self.apduService)
+            header = [self.apduType << 4, self.apduService]
 
         elif (self.apduType == SimpleAckPDU.pduType):
-            pdu.put(self.apduType << 4)
-            pdu.put(self.apduInvokeID)
-            pdu.put(self.apduService)
+            header = [self.apduType << 4, self.apduInvokeID, self.apduService]
 
         elif (self.apduType == ComplexAckPDU.pduType):
             # PDU type
@@ -197,12 +199,11 @@ class APCI(PCI, DebugContents):
                 buff += 0x08
             if self.apduMor:
                 buff += 0x04
-            pdu.put(buff)
-            pdu.put(self.apduInvokeID)
+            header = [buff, self.apduInvokeID]
             if self.apduSeg:
-                pdu.put(self.apduSeq)
-                pdu.put(self.apduWin)
-            pdu.put(self.apduService)
+                header.append(self.apduSeq)
+                header.append(self.apduWin)
+            header.append(self.apduService)
 
         elif (self.apduType == SegmentAckPDU.pduType):
             # PDU type
@@ -211,33 +212,27 @@ class APCI(PCI, DebugContents):
                 buff += 0x02
             if self.apduSrv:
                 buff += 0x01
-            pdu.put(buff)
-            pdu.put(self.apduInvokeID)
-            pdu.put(self.apduSeq)
-            pdu.put(self.apduWin)
+            header = [buff, self.apduInvokeID, self.apduSeq, self.apduWin]
 
         elif (self.apduType == ErrorPDU.pduType):
-            pdu.put(self.apduType << 4)
-            pdu.put(self.apduInvokeID)
-            pdu.put(self.apduService)
+            header = [self.apduType << 4, self.apduInvokeID, self.apduService]
 
         elif (self.apduType == RejectPDU.pduType):
-            pdu.put(self.apduType << 4)
-            pdu.put(self.apduInvokeID)
-            pdu.put(self.apduAbortRejectReason)
+            header = [self.apduType << 4, self.apduInvokeID, self.apduAbortRejectReason]
 
         elif (self.apduType == AbortPDU.pduType):
             # PDU type
             buff = self.apduType << 4
             if self.apduSrv:
                 buff += 0x01
-            pdu.put(buff)
-            pdu.put(self.apduInvokeID)
-            pdu.put(self.apduAbortRejectReason)
+            header = [buff, self.apduInvokeID, self.apduAbortRejectReason]
 
         else:
             raise ValueError("invalid APCI.apduType")
 
+        # the header and the data go together
+        pdu.put_header('%dB' % (len(header),), header, data)
+
     def decode(self, pdu):
         """decode the contents of the PDU into the APCI."""
         if _debug: APCI._debug("decode %r", pdu)
@@ -358,8 +353,7 @@ class APDU(APCI, PDUData):
 
     def encode(self, pdu):
         if _debug: APDU._debug("encode %s", str(pdu))
-        APCI.encode(self, pdu)
-        pdu.put_data(self.pduData)
+        APCI.encode(self, pdu, self.pduData)
 
     def decode(self, pdu):
         if _debug: APDU._debug("decode %s", str(pdu))
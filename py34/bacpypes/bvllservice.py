@@ -50,6 +50,30 @@ class _MultiplexServer(Server):
     def indication(self, pdu):
         self.multiplexer.indication(self, pdu)
 
+#
+#   _network_priority
+#
+#   Peek into a BVLL message for the network priority of the NPDU that it
+#   carries, messages without an NPDU are normal priority.
+#
+
+def _network_priority(data):
+    if (len(data) < 2) or (data[0] != 0x81):
+        return 0
+
+    # Forwarded-NPDU has the original source address
+    if data[1] == 0x04:
+        offset = 10
+    elif data[1] in (0x09, 0x0A, 0x0B):
+        offset = 4
+    else:
+        return 0
+
+    # check the NPDU version and extract the priority from the control
+    if (len(data) < offset + 2) or (data[offset] != 0x01):
+        return 0
+    return data[offset + 1] & 0x03
+
 #
 #   UDPMultiplexer
 #
@@ -93,13 +117,13 @@ class UDPMultiplexer:
 
         # create and bind the direct address
         self.direct = _MultiplexClient(self)
-        self.directPort = UDPDirector(self.addrTuple)
+        self.directPort = UDPDirector(self.addrTuple, priorityFn=_network_priority)
         bind(self.direct, self.directPort)
 
         # create and bind the broadcast address for non-Windows
         if specialBroadcast and (not noBroadcast) and sys.platform in ('linux', 'darwin'):
             self.broadcast = _MultiplexClient(self)
-            self.broadcastPort = UDPDirector(self.addrBroadcastTuple, reuse=True)
+            self.broadcastPort = UDPDirector(self.addrBroadcastTuple, reuse=True, priorityFn=_network_priority)
             bind(self.direct, self.broadcastPort)
         else:
             self.broadcast = None
@@ -136,7 +160,15 @@ class UDPMultiplexer:
         else:
             raise RuntimeError("invalid destination address type")
 
-        self.directPort.indication(PDU(pdu, destination=dest))
+        # the network priority decides the order of the outbound queue
+        xpdu = PDU(user_data=pdu.pduUserData, destination=dest,
+            networkPriority=_network_priority(pdu.pduData),
+            )
+
+        # the encoded message is passed along rather than copied
+        xpdu.pduData = pdu.pduData
+
+        self.directPort.indication(xpdu)
 
     def confirmation(self, client, pdu):
         if _debug: UDPMultiplexer._debug("confirmation %r %r", client, pdu)
@@ -35,6 +35,8 @@ element_map = {}
 @bacpypes_debugging
 class PCI(DebugContents):
 
+    __slots__ = ('pduUserData', 'pduSource', 'pduDestination')
+
     _debug_contents = ('pduUserData+', 'pduSource', 'pduDestination')
 
     def __init__(self, *args, **kwargs):
@@ -96,6 +98,11 @@ class PCI(DebugContents):
 #
 #   PDUData
 #
+#   Getting octets from the front of the data does not copy what is left,
+#   a bytearray keeps track of where the data starts so deleting a prefix is
+#   cheap, and the rest of the data is handed over to the next layer up the
+#   stack rather than copied.
+#
 
 @bacpypes_debugging
 class PDUData(object):
@@ -117,6 +124,10 @@ class PDUData(object):
         else:
             raise TypeError("bytes or bytearray expected")
 
+    def remaining(self):
+        """Return the number of octets that have not been read."""
+        return len(self.pduData)
+
     def get(self):
         if len(self.pduData) == 0:
             raise DecodingError("no more packet data")
@@ -130,8 +141,13 @@ class PDUData(object):
         if len(self.pduData) < dlen:
             raise DecodingError("no more packet data")
 
-        data = self.pduData[:dlen]
-        del self.pduData[:dlen]
+        # the rest of the data is handed over rather than copied
+        if dlen == len(self.pduData):
+            data = self.pduData
+            self.pduData = bytearray()
+        else:
+            data = self.pduData[:dlen]
+            del self.pduData[:dlen]
 
         return data
 
@@ -143,7 +159,7 @@ class PDUData(object):
 
     def put(self, n):
         # pduData is a bytearray
-        self.pduData += bytes([n])
+        self.pduData.append(n)
 
     def put_data(self, data):
         if isinstance(data, bytes):
@@ -164,6 +180,20 @@ class PDUData(object):
     def put_long(self, n):
         self.pduData += struct.pack('>L',n & _long_mask)
 
+    def put_header(self, fmt, values, data=b''):
+        """Append a header packed with a struct format followed by the data.
+        When there is nothing here yet the buffer is allocated once with room
+        for both and the header is packed in place."""
+        if self.pduData:
+            self.pduData += struct.pack(fmt, *values)
+            self.pduData += data
+        else:
+            hlen = struct.calcsize(fmt)
+            buff = bytearray(hlen + len(data))
+            struct.pack_into(fmt, buff, 0, *values)
+            buff[hlen:] = data
+            self.pduData = buff
+
     def debug_contents(self, indent=1, file=sys.stdout, _ids=None):
         if isinstance(self.pduData, bytearray):
             if len(self.pduData) > 20:
@@ -40,6 +40,364 @@ class Element:
 
         return '<' + desc + ' instance at 0x%08x' % (id(self),) + '>'
 
+#
+#   Element Codecs
+#
+#   The encoders and decoders for the elements of a Sequence or Choice are
+#   built the first time a class is encoded or decoded and cached, so the
+#   kind of element (SequenceOf, atomic, structure, etc.) is only figured out
+#   once rather than every time a value is encoded or decoded.  They are
+#   rebuilt if the class is given a different list of elements.
+#
+
+@bacpypes_debugging
+def _element_encoder(element):
+    """Return a function that encodes a (non-None) value of the element
+    into a tag list."""
+    if _debug: _element_encoder._debug("_element_encoder %r", element)
+
+    name, klass, context = element.name, element.klass, element.context
+
+    if (klass in _sequence_of_classes) or (klass in _list_of_classes):
+        def encode_element(value, taglist):
+            # might need to encode an opening tag
+            if context is not None:
+                taglist.append(OpeningTag(context))
+
+            # a helper encodes the list of values
+            helper = klass(value)
+            helper.encode(taglist)
+
+            # might need to encode a closing tag
+            if context is not None:
+                taglist.append(ClosingTag(context))
+
+    elif issubclass(klass, (Atomic, AnyAtomic)):
+        def encode_element(value, taglist):
+            # a helper cooperates between the atomic value and the tag
+            helper = klass(value)
+
+            # build a tag and encode the data into it
+            tag = Tag()
+            helper.encode(tag)
+
+            # convert it to context encoding iff necessary
+            if context is not None:
+                tag = tag.app_to_context(context)
+
+            # now append the tag
+            taglist.append(tag)
+
+    else:
+        def encode_element(value, taglist):
+            if not isinstance(value, klass):
+                raise TypeError("%s must be of type %s" % (name, klass.__name__))
+
+            # might need to encode an opening tag
+            if context is not None:
+                taglist.append(OpeningTag(context))
+
+            # encode the value
+            value.encode(taglist)
+
+            # might need to encode a closing tag
+            if context is not None:
+                taglist.append(ClosingTag(context))
+
+    return encode_element
+
+@bacpypes_debugging
+def _sequence_element_decoder(element):
+    """Return a function that decodes the value of the element of a sequence
+    given the tag list and the tag at the front of it."""
+    if _debug: _sequence_element_decoder._debug("_sequence_element_decoder %r", element)
+
+    name, klass, context, optional = element.name, element.klass, element.context, element.optional
+
+    # check for a sequence element
+    if klass in _sequence_of_classes:
+        def decode_element(taglist, tag):
+            # check for context encoding
+            if context is not None:
+                if tag.tagClass != Tag.openingTagClass or tag.tagNumber != context:
+                    if not optional:
+                        raise MissingRequiredParameter("%s expected opening tag %d" % (name, context))
+
+                    # omitted optional element
+                    return []
+                taglist.Pop()
+
+            # a helper cooperates between the atomic value and the tag
+            helper = klass()
+            helper.decode(taglist)
+
+            # check for context closing tag
+            if context is not None:
+                tag = taglist.Pop()
+                if tag.tagClass != Tag.closingTagClass or tag.tagNumber != context:
+                    raise InvalidTag("%s expected closing tag %d" % (name, context))
+
+            return helper.value
+
+    # check for an any atomic element
+    elif issubclass(klass, AnyAtomic):
+        def decode_element(taglist, tag):
+            if context is not None:
+                raise InvalidTag("%s any atomic with context tag %d" % (name, context))
+
+            if tag.tagClass != Tag.applicationTagClass:
+                if not optional:
+                    raise InvalidParameterDatatype("%s expected any atomic application tag" % (name,))
+                return None
+
+            # consume the tag
+            taglist.Pop()
+
+            # a helper cooperates between the atomic value and the tag
+            return klass(tag).value
+
+    # check for specific kind of atomic element, the context says what kind
+    elif issubclass(klass, Atomic) and (context is not None):
+        def decode_element(taglist, tag):
+            if tag.tagClass != Tag.contextTagClass or tag.tagNumber != context:
+                if not optional:
+                    raise InvalidTag("%s expected context tag %d" % (name, context))
+                return None
+
+            # consume the tag
+            taglist.Pop()
+
+            # convert it to application encoding and let a helper decode it
+            return klass(tag.context_to_app(klass._app_tag)).value
+
+    # check for specific kind of atomic element
+    elif issubclass(klass, Atomic):
+        def decode_element(taglist, tag):
+            if tag.tagClass != Tag.applicationTagClass or tag.tagNumber != klass._app_tag:
+                if not optional:
+                    raise InvalidParameterDatatype("%s expected application tag %s" % (name, Tag._app_tag_name[klass._app_tag]))
+                return None
+
+            # consume the tag
+            taglist.Pop()
+
+            # a helper cooperates between the atomic value and the tag
+            return klass(tag).value
+
+    # some kind of structure
+    else:
+        def decode_element(taglist, tag):
+            if context is not None:
+                if tag.tagClass != Tag.openingTagClass or tag.tagNumber != context:
+                    if not optional:
+                        raise InvalidTag("%s expected opening tag %d" % (name, context))
+                    return None
+                taglist.Pop()
+
+            # an optional structure without a context tag might manage to
+            # decode some content but not all of it, so make a backup of the
+            # tag list.  This is not supposed to happen if the ASN.1 has been
+            # formed correctly.
+            if (context is None) and optional:
+                backup = taglist.tagList[:]
+
+                try:
+                    # build a value and decode it
+                    value = klass()
+                    value.decode(taglist)
+                except (DecodingError, InvalidTag):
+                    # omitted optional element, restore the backup
+                    taglist.tagList = backup
+                    return None
+            else:
+                # build a value and decode it
+                value = klass()
+                value.decode(taglist)
+
+            if context is not None:
+                tag = taglist.Pop()
+                if (not tag) or tag.tagClass != Tag.closingTagClass or tag.tagNumber != context:
+                    raise InvalidTag("%s expected closing tag %d" % (name, context))
+
+            return value
+
+    return decode_element
+
+@bacpypes_debugging
+def _choice_element_decoder(element):
+    """Return the (tag class, tag number) that selects the element of a
+    choice and a function that decodes its value given the tag list and the
+    tag at the front of it."""
+    if _debug: _choice_element_decoder._debug("_choice_element_decoder %r", element)
+
+    name, klass, context = element.name, element.klass, element.context
+
+    # check for a sequence element
+    if (klass in _sequence_of_classes) or (klass in _list_of_classes):
+        # check for context encoding
+        if context is None:
+            raise NotImplementedError("choice of a SequenceOf must be context encoded")
+
+        def decode_element(taglist, tag):
+            taglist.Pop()
+
+            # a helper cooperates between the atomic value and the tag
+            helper = klass()
+            helper.decode(taglist)
+
+            # check for context closing tag
+            tag = taglist.Pop()
+            if tag.tagClass != Tag.closingTagClass or tag.tagNumber != context:
+                raise InvalidTag("%s expected closing tag %d" % (name, context))
+
+            return helper.value
+
+        return (Tag.openingTagClass, context), decode_element
+
+    # check for an atomic element
+    elif issubclass(klass, (Atomic, AnyAtomic)):
+        if context is not None:
+            def decode_element(taglist, tag):
+                # consume the tag
+                taglist.Pop()
+
+                # convert it to application encoding and let a helper decode it
+                return klass(tag.context_to_app(klass._app_tag)).value
+
+            return (Tag.contextTagClass, context), decode_element
+        else:
+            def decode_element(taglist, tag):
+                # consume the tag
+                taglist.Pop()
+
+                # a helper cooperates between the atomic value and the tag
+                return klass(tag).value
+
+            # any atomic matches any application tag
+            if issubclass(klass, AnyAtomic):
+                return None, decode_element
+            else:
+                return (Tag.applicationTagClass, klass._app_tag), decode_element
+
+    # some kind of structure
+    else:
+        # check for context encoding
+        if context is None:
+            raise NotImplementedError("choice of non-atomic data must be context encoded")
+
+        def decode_element(taglist, tag):
+            taglist.Pop()
+
+            # build a value and decode it
+            value = klass()
+            value.decode(taglist)
+
+            # check for the correct closing tag
+            tag = taglist.Pop()
+            if tag.tagClass != Tag.closingTagClass or tag.tagNumber != context:
+                raise InvalidTag("%s expected closing tag %d" % (name, context))
+
+            return value
+
+        return (Tag.openingTagClass, context), decode_element
+
+#
+#   _SequenceCodec
+#
+
+@bacpypes_debugging
+class _SequenceCodec:
+
+    def __init__(self, elements):
+        if _debug: _SequenceCodec._debug("__init__ %r", elements)
+        global _sequence_of_classes, _list_of_classes
+
+        self.elements = elements
+        self.names = set(element.name for element in elements)
+
+        # (name, optional, encoder) for each element
+        self.encoders = tuple(
+            (element.name, element.optional, _element_encoder(element))
+            for element in elements
+            )
+
+        # (name, optional, empty list, decoder) for each element
+        self.decoders = tuple(
+            (element.name, element.optional,
+                (element.klass in _sequence_of_classes) or (element.klass in _list_of_classes),
+                _sequence_element_decoder(element))
+            for element in elements
+            )
+
+_sequence_codec_map = {}
+
+def _sequence_codec(klass, elements):
+    """Return the codec for the sequence elements of a class."""
+    global _sequence_codec_map
+
+    codec = _sequence_codec_map.get(klass)
+    if (codec is None) or (codec.elements is not elements):
+        codec = _sequence_codec_map[klass] = _SequenceCodec(elements)
+
+    return codec
+
+#
+#   _ChoiceCodec
+#
+
+@bacpypes_debugging
+class _ChoiceCodec:
+
+    def __init__(self, elements):
+        if _debug: _ChoiceCodec._debug("__init__ %r", elements)
+
+        self.elements = elements
+        self.names = set(element.name for element in elements)
+
+        # (name, encoder) for each element
+        self.encoders = tuple(
+            (element.name, _element_encoder(element))
+            for element in elements
+            )
+
+        # map (tag class, tag number) to (name, decoder), the first element
+        # that matches a tag wins
+        self.dispatch = {}
+
+        # matches any application tag not claimed by an element before it
+        self.any_application = None
+
+        # the elements after one that cannot be decoded are unreachable
+        self.unsupported = None
+
+        for element in elements:
+            try:
+                key, decoder = _choice_element_decoder(element)
+            except NotImplementedError as err:
+                self.unsupported = str(err)
+                break
+            if _debug: _ChoiceCodec._debug("    - %r: %r", key, element.name)
+
+            if key is None:
+                if self.any_application is None:
+                    self.any_application = (element.name, decoder)
+            elif (key[0] == Tag.applicationTagClass) and self.any_application:
+                pass
+            elif key not in self.dispatch:
+                self.dispatch[key] = (element.name, decoder)
+
+_choice_codec_map = {}
+
+def _choice_codec(klass, elements):
+    """Return the codec for the choice elements of a class."""
+    global _choice_codec_map
+
+    codec = _choice_codec_map.get(klass)
+    if (codec is None) or (codec.elements is not elements):
+        codec = _choice_codec_map[klass] = _ChoiceCodec(elements)
+
+    return codec
+
 #
 #   Sequence
 #
@@ -56,13 +414,13 @@ class Sequence(object):
         if _debug: Sequence._debug("__init__ %r %r", args, kwargs)
 
         # split out the keyword arguments that belong to this class
+        codec = _sequence_codec(self.__class__, self.sequenceElements)
         my_kwargs = {}
         other_kwargs = {}
-        for element in self.sequenceElements:
-            if element.name in kwargs:
-                my_kwargs[element.name] = kwargs[element.name]
         for kw in kwargs:
-            if kw not in my_kwargs:
+            if kw in codec.names:
+                my_kwargs[kw] = kwargs[kw]
+            else:
                 other_kwargs[kw] = kwargs[kw]
         if _debug: Sequence._debug("    - my_kwargs: %r", my_kwargs)
         if _debug: Sequence._debug("    - other_kwargs: %r", other_kwargs)
@@ -78,237 +436,57 @@ class Sequence(object):
         """
         """
         if _debug: Sequence._debug("encode %r", taglist)
-        global _sequence_of_classes, _list_of_classes
 
         # make sure we're dealing with a tag list
         if not isinstance(taglist, TagList):
             raise TypeError("TagList expected")
 
-        for element in self.sequenceElements:
-            value = getattr(self, element.name, None)
-            if element.optional and value is None:
-                continue
-            if not element.optional and value is None:
-                raise MissingRequiredParameter("%s is a missing required element of %s" % (element.name, self.__class__.__name__))
-            if (element.klass in _sequence_of_classes) or (element.klass in _list_of_classes):
-                # might need to encode an opening tag
-                if element.context is not None:
-                    taglist.append(OpeningTag(element.context))
-
-                if _debug: Sequence._debug("    - build sequence helper: %r %r", element.klass, value)
-                helper = element.klass(value)
-
-                # encode the value
-                helper.encode(taglist)
-
-                # might need to encode a closing tag
-                if element.context is not None:
-                    taglist.append(ClosingTag(element.context))
-            elif issubclass(element.klass, (Atomic, AnyAtomic)):
-                # a helper cooperates between the atomic value and the tag
-                if _debug: Sequence._debug("    - build helper: %r %r", element.klass, value)
-                helper = element.klass(value)
-
-                # build a tag and encode the data into it
-                tag = Tag()
-                helper.encode(tag)
-
-                # convert it to context encoding iff necessary
-                if element.context is not None:
-                    tag = tag.app_to_context(element.context)
-
-                # now append the tag
-                taglist.append(tag)
-            elif isinstance(value, element.klass):
-                # might need to encode an opening tag
-                if element.context is not None:
-                    taglist.append(OpeningTag(element.context))
-
-                # encode the value
-                value.encode(taglist)
+        codec = _sequence_codec(self.__class__, self.sequenceElements)
+        for name, optional, encode_element in codec.encoders:
+            value = getattr(self, name, None)
+            if value is None:
+                if optional:
+                    continue
+                raise MissingRequiredParameter("%s is a missing required element of %s" % (name, self.__class__.__name__))
 
-                # might need to encode a closing tag
-                if element.context is not None:
-                    taglist.append(ClosingTag(element.context))
-            else:
-                raise TypeError("%s must be of type %s" % (element.name, element.klass.__name__))
+            encode_element(value, taglist)
 
     def decode(self, taglist):
         """
         """
         if _debug: Sequence._debug("decode %r", taglist)
-        global _sequence_of_classes, _list_of_classes
 
         # make sure we're dealing with a tag list
         if not isinstance(taglist, TagList):
             raise TypeError("TagList expected")
 
-        for element in self.sequenceElements:
+        codec = _sequence_codec(self.__class__, self.sequenceElements)
+        for name, optional, empty_list, decode_element in codec.decoders:
             tag = taglist.Peek()
-            if _debug: Sequence._debug("    - element, tag: %r, %r", element, tag)
+            if _debug: Sequence._debug("    - element, tag: %r, %r", name, tag)
 
             # no more elements
             if tag is None:
-                if element.optional:
+                if optional:
                     # omitted optional element
-                    setattr(self, element.name, None)
-                elif (element.klass in _sequence_of_classes) or (element.klass in _list_of_classes):
+                    setattr(self, name, None)
+                elif empty_list:
                     # empty list
-                    setattr(self, element.name, [])
+                    setattr(self, name, [])
                 else:
-                    raise MissingRequiredParameter("%s is a missing required element of %s" % (element.name, self.__class__.__name__))
+                    raise MissingRequiredParameter("%s is a missing required element of %s" % (name, self.__class__.__name__))
 
             # we have been enclosed in a context
             elif tag.tagClass == Tag.closingTagClass:
-                if not element.optional:
-                    raise MissingRequiredParameter("%s is a missing required element of %s" % (element.name, self.__class__.__name__))
+                if not optional:
+                    raise MissingRequiredParameter("%s is a missing required element of %s" % (name, self.__class__.__name__))
 
                 # omitted optional element
-                setattr(self, element.name, None)
-
-            # check for a sequence element
-            elif element.klass in _sequence_of_classes:
-                # check for context encoding
-                if element.context is not None:
-                    if tag.tagClass != Tag.openingTagClass or tag.tagNumber != element.context:
-                        if not element.optional:
-                            raise MissingRequiredParameter("%s expected opening tag %d" % (element.name, element.context))
-                        else:
-                            # omitted optional element
-                            setattr(self, element.name, [])
-                            continue
-                    taglist.Pop()
-
-                # a helper cooperates between the atomic value and the tag
-                helper = element.klass()
-                helper.decode(taglist)
-
-                # now save the value
-                setattr(self, element.name, helper.value)
-
-                # check for context closing tag
-                if element.context is not None:
-                    tag = taglist.Pop()
-                    if tag.tagClass != Tag.closingTagClass or tag.tagNumber != element.context:
-                        raise InvalidTag("%s expected closing tag %d" % (element.name, element.context))
-
-            # check for an any atomic element
-            elif issubclass(element.klass, AnyAtomic):
-                # convert it to application encoding
-                if element.context is not None:
-                    raise InvalidTag("%s any atomic with context tag %d" % (element.name, element.context))
-
-                if tag.tagClass != Tag.applicationTagClass:
-                    if not element.optional:
-                        raise InvalidParameterDatatype("%s expected any atomic application tag" % (element.name,))
-                    else:
-                        setattr(self, element.name, None)
-                        continue
-
-                # consume the tag
-                taglist.Pop()
-
-                # a helper cooperates between the atomic value and the tag
-                helper = element.klass(tag)
-
-                # now save the value
-                setattr(self, element.name, helper.value)
-
-            # check for specific kind of atomic element, or the context says what kind
-            elif issubclass(element.klass, Atomic):
-                # convert it to application encoding
-                if element.context is not None:
-                    if tag.tagClass != Tag.contextTagClass or tag.tagNumber != element.context:
-                        if not element.optional:
-                            raise InvalidTag("%s expected context tag %d" % (element.name, element.context))
-                        else:
-                            setattr(self, element.name, None)
-                            continue
-                    tag = tag.context_to_app(element.klass._app_tag)
-                else:
-                    if tag.tagClass != Tag.applicationTagClass or tag.tagNumber != element.klass._app_tag:
-                        if not element.optional:
-                            raise InvalidParameterDatatype("%s expected application tag %s" % (element.name, Tag._app_tag_name[element.klass._app_tag]))
-                        else:
-                            setattr(self, element.name, None)
-                            continue
-
-                # consume the tag
-                taglist.Pop()
-
-                # a helper cooperates between the atomic value and the tag
-                helper = element.klass(tag)
-
-                # now save the value
-                setattr(self, element.name, helper.value)
-
-            # check for an AnyAtomic element
-            elif issubclass(element.klass, AnyAtomic):
-                # convert it to application encoding
-                if element.context is not None:
-                    if tag.tagClass != Tag.contextTagClass or tag.tagNumber != element.context:
-                        if not element.optional:
-                            raise InvalidTag("%s expected context tag %d" % (element.name, element.context))
-                        else:
-                            setattr(self, element.name, None)
-                            continue
-                    tag = tag.context_to_app(element.klass._app_tag)
-                else:
-                    if tag.tagClass != Tag.applicationTagClass:
-                        if not element.optional:
-                            raise InvalidParameterDatatype("%s expected application tag" % (element.name,))
-                        else:
-                            setattr(self, element.name, None)
-                            continue
-
-                # consume the tag
-                taglist.Pop()
-
-                # a helper cooperates between the atomic value and the tag
-                helper = element.klass(tag)
-
-                # now save the value
-                setattr(self, element.name, helper.value)
+                setattr(self, name, None)
 
-            # some kind of structure
+            # the element decodes itself
             else:
-                if element.context is not None:
-                    if tag.tagClass != Tag.openingTagClass or tag.tagNumber != element.context:
-                        if not element.optional:
-                            raise InvalidTag("%s expected opening tag %d" % (element.name, element.context))
-                        else:
-                            setattr(self, element.name, None)
-                            continue
-                    taglist.Pop()
-
-                try:
-                    # make a backup of the tag list in case the structure manages to
-                    # decode some content but not all of it.  This is not supposed to
-                    # happen if the ASN.1 has been formed correctly.
-                    backup = taglist.tagList[:]
-
-                    # build a value and decode it
-                    value = element.klass()
-                    value.decode(taglist)
-
-                    # save the result
-                    setattr(self, element.name, value)
-                except (DecodingError, InvalidTag) as err:
-                    # if the context tag was matched, the substructure has to be decoded
-                    # correctly.
-                    if element.context is None and element.optional:
-                        # omitted optional element
-                        setattr(self, element.name, None)
-
-                        # restore the backup
-                        taglist.tagList = backup
-                    else:
-                        raise
-
-                if element.context is not None:
-                    tag = taglist.Pop()
-                    if (not tag) or tag.tagClass != Tag.closingTagClass or tag.tagNumber != element.context:
-                        raise InvalidTag("%s expected closing tag %d" % (element.name, element.context))
+                setattr(self, name, decode_element(taglist, tag))
 
     def debug_contents(self, indent=1, file=sys.stdout, _ids=None):
         global _sequence_of_classes, _list_of_classes
@@ -402,6 +580,9 @@ def SequenceOf(klass):
     if klass in _array_of_classes:
         raise TypeError("sequences of arrays disallowed")
 
+    # atomic values are encoded and decoded by a helper
+    atomic_subtype = issubclass(klass, (Atomic, AnyAtomic))
+
     # define a generic class for lists
     @bacpypes_debugging
     class _SequenceOf:
@@ -439,7 +620,7 @@ def SequenceOf(klass):
         def encode(self, taglist):
             if _debug: _SequenceOf._debug("(%r)encode %r", self.__class__.__name__, taglist)
             for value in self.value:
-                if issubclass(self.subtype, (Atomic, AnyAtomic)):
+                if atomic_subtype:
                     # a helper cooperates between the atomic value and the tag
                     helper = self.subtype(value)
 
@@ -463,7 +644,7 @@ def SequenceOf(klass):
                 if tag.tagClass == Tag.closingTagClass:
                     return
 
-                if issubclass(self.subtype, (Atomic, AnyAtomic)):
+                if atomic_subtype:
                     if _debug: _SequenceOf._debug("    - building helper: %r %r", self.subtype, tag)
                     taglist.Pop()
 
@@ -557,6 +738,9 @@ def ListOf(klass):
     if klass in _array_of_classes:
         raise TypeError("lists of arrays disallowed")
 
+    # atomic values are encoded and decoded by a helper
+    atomic_subtype = issubclass(klass, (Atomic, AnyAtomic))
+
     # define a generic class for lists
     @bacpypes_debugging
     class _ListOf(List):
@@ -591,7 +775,7 @@ def ListOf(klass):
         def encode(self, taglist):
             if _debug: _ListOf._debug("(%r)encode %r", self.__class__.__name__, taglist)
             for value in self.value:
-                if issubclass(self.subtype, (Atomic, AnyAtomic)):
+                if atomic_subtype:
                     # a helper cooperates between the atomic value and the tag
                     helper = self.subtype(value)
 
@@ -615,7 +799,7 @@ def ListOf(klass):
                 if tag.tagClass == Tag.closingTagClass:
                     return
 
-                if issubclass(self.subtype, (Atomic, AnyAtomic)):
+                if atomic_subtype:
                     if _debug: _ListOf._debug("    - building helper: %r %r", self.subtype, tag)
                     taglist.Pop()
 
@@ -708,6 +892,9 @@ def ArrayOf(klass):
     if klass in _sequence_of_classes:
         raise TypeError("arrays of SequenceOf disallowed")
 
+    # atomic values are encoded and decoded by a helper
+    atomic_subtype = issubclass(klass, (Atomic, AnyAtomic))
+
     # define a generic class for arrays
     @bacpypes_debugging
     class ArrayOf(Array):
@@ -796,7 +983,7 @@ def ArrayOf(klass):
             if _debug: ArrayOf._debug("(%r)encode %r", self.__class__.__name__, taglist)
 
             for value in self.value[1:]:
-                if issubclass(self.subtype, (Atomic, AnyAtomic)):
+                if atomic_subtype:
                     # a helper cooperates between the atomic value and the tag
                     helper = self.subtype(value)
 
@@ -823,7 +1010,7 @@ def ArrayOf(klass):
                 if tag.tagClass == Tag.closingTagClass:
                     break
 
-                if issubclass(self.subtype, (Atomic, AnyAtomic)):
+                if atomic_subtype:
                     if _debug: ArrayOf._debug("    - building helper: %r %r", self.subtype, tag)
                     taglist.Pop()
 
@@ -967,13 +1154,13 @@ class Choice(object):
         if _debug: Choice._debug("__init__ %r", kwargs)
 
         # split out the keyword arguments that belong to this class
+        codec = _choice_codec(self.__class__, self.choiceElements)
         my_kwargs = {}
         other_kwargs = {}
-        for element in self.choiceElements:
-            if element.name in kwargs:
-                my_kwargs[element.name] = kwargs[element.name]
         for kw in kwargs:
-            if kw not in my_kwargs:
+            if kw in codec.names:
+                my_kwargs[kw] = kwargs[kw]
+            else:
                 other_kwargs[kw] = kwargs[kw]
         if _debug: Choice._debug("    - my_kwargs: %r", my_kwargs)
         if _debug: Choice._debug("    - other_kwargs: %r", other_kwargs)
@@ -988,48 +1175,20 @@ class Choice(object):
     def encode(self, taglist):
         if _debug: Choice._debug("(%r)encode %r", self.__class__.__name__, taglist)
 
-        for element in self.choiceElements:
-            value = getattr(self, element.name, None)
+        # encode the first one that has a value
+        codec = _choice_codec(self.__class__, self.choiceElements)
+        for name, encode_element in codec.encoders:
+            value = getattr(self, name, None)
             if value is None:
                 continue
 
-            if issubclass(element.klass, (Atomic, AnyAtomic)):
-                # a helper cooperates between the atomic value and the tag
-                helper = element.klass(value)
-
-                # build a tag and encode the data into it
-                tag = Tag()
-                helper.encode(tag)
-
-                # convert it to context encoding
-                if element.context is not None:
-                    tag = tag.app_to_context(element.context)
-
-                # now encode the tag
-                taglist.append(tag)
-                break
-
-            elif isinstance(value, element.klass):
-                # encode an opening tag
-                if element.context is not None:
-                    taglist.append(OpeningTag(element.context))
-
-                # encode the value
-                value.encode(taglist)
-
-                # encode a closing tag
-                if element.context is not None:
-                    taglist.append(ClosingTag(element.context))
-                break
-
-            else:
-                raise TypeError("%s must be a %s" % (element.name, element.klass.__name__))
+            encode_element(value, taglist)
+            break
         else:
             raise AttributeError("missing choice of %s" % (self.__class__.__name__,))
 
     def decode(self, taglist):
         if _debug: Choice._debug("(%r)decode %r", self.__class__.__name__, taglist)
-        global _sequence_of_classes, _list_of_classes
 
         # peek at the element
         tag = taglist.Peek()
@@ -1038,93 +1197,26 @@ class Choice(object):
         if tag.tagClass == Tag.closingTagClass:
             raise AttributeError("missing choice of %s" % (self.__class__.__name__,))
 
-        # keep track of which one was found
-        foundElement = {}
-
         # figure out which choice it is
-        for element in self.choiceElements:
-            if _debug: Choice._debug("    - checking choice: %s", element.name)
-
-            # check for a sequence element
-            if (element.klass in _sequence_of_classes) or (element.klass in _list_of_classes):
-                # check for context encoding
-                if element.context is None:
-                    raise NotImplementedError("choice of a SequenceOf must be context encoded")
-                # match the context tag number
-                if tag.tagClass != Tag.contextTagClass or tag.tagNumber != element.context:
-                    continue
-                taglist.Pop()
-
-                # a helper cooperates between the atomic value and the tag
-                helper = element.klass()
-                helper.decode(taglist)
-
-                # now save the value
-                foundElement[element.name] = helper.value
-
-                # check for context closing tag
-                tag = taglist.Pop()
-                if tag.tagClass != Tag.closingTagClass or tag.tagNumber != element.context:
-                    raise InvalidTag("%s expected closing tag %d" % (element.name, element.context))
-
-                # done
-                if _debug: Choice._debug("    - found choice (sequence)")
-                break
-
-            # check for an atomic element
-            elif issubclass(element.klass, (Atomic, AnyAtomic)):
-                # convert it to application encoding
-                if element.context is not None:
-                    if tag.tagClass != Tag.contextTagClass or tag.tagNumber != element.context:
-                        continue
-                    tag = tag.context_to_app(element.klass._app_tag)
-                else:
-                    if tag.tagClass != Tag.applicationTagClass or tag.tagNumber != element.klass._app_tag:
-                        continue
-
-                # consume the tag
-                taglist.Pop()
-
-                # a helper cooperates between the atomic value and the tag
-                helper = element.klass(tag)
-
-                # now save the value
-                foundElement[element.name] = helper.value
-
-                # done
-                if _debug: Choice._debug("    - found choice (atomic)")
-                break
-
-            # some kind of structure
-            else:
-                # check for context encoding
-                if element.context is None:
-                    raise NotImplementedError("choice of non-atomic data must be context encoded")
-                if tag.tagClass != Tag.openingTagClass or tag.tagNumber != element.context:
-                    continue
-                taglist.Pop()
-
-                # build a value and decode it
-                value = element.klass()
-                value.decode(taglist)
-
-                # now save the value
-                foundElement[element.name] = value
+        codec = _choice_codec(self.__class__, self.choiceElements)
+        choice = codec.dispatch.get((tag.tagClass, tag.tagNumber))
+        if (not choice) and (tag.tagClass == Tag.applicationTagClass):
+            choice = codec.any_application
+        if not choice:
+            if codec.unsupported:
+                raise NotImplementedError(codec.unsupported)
+            raise AttributeError("missing choice of %s" % (self.__class__.__name__,))
 
-                # check for the correct closing tag
-                tag = taglist.Pop()
-                if tag.tagClass != Tag.closingTagClass or tag.tagNumber != element.context:
-                    raise InvalidTag("%s expected closing tag %d" % (element.name, element.context))
+        found_name, decode_element = choice
+        if _debug: Choice._debug("    - found choice: %s", found_name)
 
-                # done
-                if _debug: Choice._debug("    - found choice (structure)")
-                break
-        else:
-            raise AttributeError("missing choice of %s" % (self.__class__.__name__,))
+        # decode the value
+        value = decode_element(taglist, tag)
 
         # now save the value and None everywhere else
         for element in self.choiceElements:
-            setattr(self, element.name, foundElement.get(element.name, None))
+            setattr(self, element.name, None)
+        setattr(self, found_name, value)
 
     def debug_contents(self, indent=1, file=sys.stdout, _ids=None):
         for element in self.choiceElements:
@@ -90,6 +90,22 @@ _log = ModuleLogger(globals())
 
 class DebugContents(object):
 
+    __slots__ = ()
+
+    def __getstate__(self):
+        """Return the slot values along with the instance dictionary, if
+        there is one, so the older pickle protocols work."""
+        state = dict(getattr(self, '__dict__', ()))
+        for klass in self.__class__.__mro__:
+            for attr in klass.__dict__.get('__slots__', ()):
+                if hasattr(self, attr):
+                    state[attr] = getattr(self, attr)
+        return state
+
+    def __setstate__(self, state):
+        for attr, value in state.items():
+            setattr(self, attr, value)
+
     def debug_contents(self, indent=1, file=sys.stdout, _ids=None):
         """Debug the contents of an object."""
         if _debug: _log.debug("debug_contents indent=%r file=%r _ids=%r", indent, file, _ids)
@@ -18,7 +18,9 @@ _log = ModuleLogger(globals())
 #   WaitableEvent
 #
 #   An instance of this class can be used like a Threading.Event, but will
-#   break the asyncore.loop().
+#   break the asyncore.loop().  When the platform has an eventfd it is used
+#   rather than a pipe, setting it is a single write and reading it resets
+#   the counter no matter how many times it was set.
 #
 
 @bacpypes_debugging
@@ -27,8 +29,11 @@ class WaitableEvent(asyncore.file_dispatcher, Logging):
     def __init__(self):
         if _debug: WaitableEvent._debug("__init__")
 
-        # make a pipe
-        self._read_fd, self._write_fd = os.pipe()
+        # make an eventfd or a pipe
+        if hasattr(os, 'eventfd'):
+            self._read_fd = self._write_fd = os.eventfd(0)
+        else:
+            self._read_fd, self._write_fd = os.pipe()
 
         # continue with init
         asyncore.file_dispatcher.__init__(self, self._read_fd)
@@ -38,7 +43,8 @@ class WaitableEvent(asyncore.file_dispatcher, Logging):
 
         # close the file descriptors
         os.close(self._read_fd)
-        os.close(self._write_fd)
+        if self._write_fd != self._read_fd:
+            os.close(self._write_fd)
 
     #----- file methods
 
@@ -71,10 +77,12 @@ class WaitableEvent(asyncore.file_dispatcher, Logging):
 
     def set(self):
         if _debug: WaitableEvent._debug("set")
-        if not self.isSet():
+        if self._write_fd == self._read_fd:
+            os.eventfd_write(self._write_fd, 1)
+        elif not self.isSet():
             os.write(self._write_fd, b'1')
 
     def clear(self):
         if _debug: WaitableEvent._debug("clear")
         if self.isSet():
-            os.read(self._read_fd, 1)
+            os.read(self._read_fd, 8)
@@ -27,6 +27,10 @@ def register_npdu_type(klass):
 @bacpypes_debugging
 class NPCI(PCI, DebugContents):
 
+    __slots__ = ('npduVersion', 'npduControl', 'npduDADR', 'npduSADR'
+        , 'npduHopCount', 'npduNetMessage', 'npduVendorID'
+        )
+
     _debug_contents = ('npduVersion', 'npduControl', 'npduDADR', 'npduSADR'
         , 'npduHopCount', 'npduNetMessage', 'npduVendorID'
         )
@@ -73,15 +77,12 @@ class NPCI(PCI, DebugContents):
         self.npduNetMessage = npci.npduNetMessage
         self.npduVendorID = npci.npduVendorID
 
-    def encode(self, pdu):
-        """encode the contents of the NPCI into the PDU."""
+    def encode(self, pdu, data=b''):
+        """encode the contents of the NPCI into the PDU, followed by the data."""
         if _debug: NPCI._debug("encode %s", repr(pdu))
 
         PCI.update(pdu, self)
 
-        # only version 1 messages supported
-        pdu.put(self.npduVersion)
-
         # build the flags
         if self.npduNetMessage is not None:
             netLayerMessage = 0x80
@@ -104,41 +105,49 @@ class NPCI(PCI, DebugContents):
             control |= 0x04
         control |= (self.pduNetworkPriority & 0x03)
         self.npduControl = control
-        pdu.put(control)
 
         # make sure expecting reply and priority get passed down
         pdu.pduExpectingReply = self.pduExpectingReply
         pdu.pduNetworkPriority = self.pduNetworkPriority
 
+        # only version 1 messages supported, the 16-bit fields are masked
+        # the way put_short() does
+        fmt = '>BB'
+        values = [self.npduVersion, control]
+
         # encode the destination address
         if dnetPresent:
             if self.npduDADR.addrType == Address.remoteStationAddr:
-                pdu.put_short(self.npduDADR.addrNet)
-                pdu.put(self.npduDADR.addrLen)
-                pdu.put_data(self.npduDADR.addrAddr)
+                fmt += 'HB%ds' % (len(self.npduDADR.addrAddr),)
+                values.extend((self.npduDADR.addrNet & 0xFFFF, self.npduDADR.addrLen, self.npduDADR.addrAddr))
             elif self.npduDADR.addrType == Address.remoteBroadcastAddr:
-                pdu.put_short(self.npduDADR.addrNet)
-                pdu.put(0)
+                fmt += 'HB'
+                values.extend((self.npduDADR.addrNet & 0xFFFF, 0))
             elif self.npduDADR.addrType == Address.globalBroadcastAddr:
-                pdu.put_short(0xFFFF)
-                pdu.put(0)
+                fmt += 'HB'
+                values.extend((0xFFFF, 0))
 
         # encode the source address
         if snetPresent:
-            pdu.put_short(self.npduSADR.addrNet)
-            pdu.put(self.npduSADR.addrLen)
-            pdu.put_data(self.npduSADR.addrAddr)
+            fmt += 'HB%ds' % (len(self.npduSADR.addrAddr),)
+            values.extend((self.npduSADR.addrNet & 0xFFFF, self.npduSADR.addrLen, self.npduSADR.addrAddr))
 
         # put the hop count
         if dnetPresent:
-            pdu.put(self.npduHopCount)
+            fmt += 'B'
+            values.append(self.npduHopCount)
 
         # put the network layer message type (if present)
         if netLayerMessage:
-            pdu.put(self.npduNetMessage)
+            fmt += 'B'
+            values.append(self.npduNetMessage)
             # put the vendor ID
             if (self.npduNetMessage >= 0x80) and (self.npduNetMessage <= 0xFF):
-                pdu.put_short(self.npduVendorID)
+                fmt += 'H'
+                values.append(self.npduVendorID & 0xFFFF)
+
+        # the header and the data go together
+        pdu.put_header(fmt, values, data)
 
     def decode(self, pdu):
         """decode the contents of the PDU and put them into the NPDU."""
@@ -167,7 +176,7 @@ class NPCI(PCI, DebugContents):
         if dnetPresent:
             dnet = pdu.get_short()
             dlen = pdu.get()
-            dadr = pdu.get_data(dlen)
+            dadr = bytes(pdu.get_data(dlen))
 
             if dnet == 0xFFFF:
                 self.npduDADR = GlobalBroadcast()
@@ -180,7 +189,7 @@ class NPCI(PCI, DebugContents):
         if snetPresent:
             snet = pdu.get_short()
             slen = pdu.get()
-            sadr = pdu.get_data(slen)
+            sadr = bytes(pdu.get_data(slen))
 
             if snet == 0xFFFF:
                 raise DecodingError("SADR can't be a global broadcast")
@@ -261,8 +270,7 @@ class NPDU(NPCI, PDUData):
         super(NPDU, self).__init__(*args, **kwargs)
 
     def encode(self, pdu):
-        NPCI.encode(self, pdu)
-        pdu.put_data(self.pduData)
+        NPCI.encode(self, pdu, self.pduData)
 
     def decode(self, pdu):
         NPCI.decode(self, pdu)
@@ -372,7 +380,7 @@ class IAmRouterToNetwork(NPDU):
     def decode(self, npdu):
         NPCI.update(self, npdu)
         self.iartnNetworkList = []
-        while npdu.pduData:
+        while npdu.remaining():
             self.iartnNetworkList.append(npdu.get_short())
 
     def npdu_contents(self, use_dict=None, as_class=dict):
@@ -482,7 +490,7 @@ class RouterBusyToNetwork(NPDU):
     def decode(self, npdu):
         NPCI.update(self, npdu)
         self.rbtnNetworkList = []
-        while npdu.pduData:
+        while npdu.remaining():
             self.rbtnNetworkList.append(npdu.get_short())
 
     def npdu_contents(self, use_dict=None, as_class=dict):
@@ -518,7 +526,7 @@ class RouterAvailableToNetwork(NPDU):
     def decode(self, npdu):
         NPCI.update(self, npdu)
         self.ratnNetworkList = []
-        while npdu.pduData:
+        while npdu.remaining():
             self.ratnNetworkList.append(npdu.get_short())
 
     def npdu_contents(self, use_dict=None, as_class=dict):
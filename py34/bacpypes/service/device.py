@@ -1,19 +1,30 @@
 #!/usr/bin/env python
 
+import random
+
 from ..debugging import bacpypes_debugging, ModuleLogger
 from ..capability import Capability
 
-from ..pdu import GlobalBroadcast
+from ..pdu import Address, GlobalBroadcast
 
-from ..apdu import WhoIsRequest, IAmRequest, IHaveRequest, SimpleAckPDU
+from ..apdu import UnconfirmedRequestPDU, WhoIsRequest, IAmRequest, \
+    IHaveRequest, SimpleAckPDU
 from ..errors import ExecutionError, InconsistentParameters, \
     MissingRequiredParameter, ParameterOutOfRange
-from ..task import FunctionTask
+from ..task import FunctionTask, TaskManager
 
 # some debugging
 _debug = 0
 _log = ModuleLogger(globals())
 
+# device object properties that are in an I-Am
+_i_am_properties = (
+    'objectIdentifier',
+    'maxApduLengthAccepted',
+    'segmentationSupported',
+    'vendorIdentifier',
+    )
+
 #
 #   Who-Is I-Am Services
 #
@@ -25,6 +36,39 @@ class WhoIsIAmServices(Capability):
         if _debug: WhoIsIAmServices._debug("__init__")
         Capability.__init__(self)
 
+        # discoveries that are looking for devices
+        self.device_discoveries = []
+
+        # the encoded I-Am is kept until the device object changes
+        self._i_am_device = None
+        self._i_am_data = None
+
+        # seconds to wait at random before answering a broadcast Who-Is,
+        # seconds before answering the same requester again, I-Am requests
+        # per second and how many can go out at once, and the number of
+        # requesters waiting that are answered with one global broadcast
+        self.i_am_max_delay = 0.5
+        self.i_am_min_interval = 1.0
+        self.i_am_rate = 10.0
+        self.i_am_burst = 10
+        self.i_am_broadcast_threshold = 5
+
+        # requesters waiting to be answered and when, when they were last
+        # answered, and when the last global broadcast went out
+        self._i_am_pending = {}
+        self._i_am_answered = {}
+        self._i_am_broadcast_time = None
+
+        # requests that can be sent right now and when that was figured
+        self._i_am_tokens = float(self.i_am_burst)
+        self._i_am_token_time = None
+
+        self._i_am_task = FunctionTask(self._i_am_process)
+
+        # statistics
+        self.i_am_sent = 0
+        self.i_am_suppressed = 0
+
     def who_is(self, low_limit=None, high_limit=None, address=None):
         if _debug: WhoIsIAmServices._debug("who_is")
 
@@ -98,8 +142,83 @@ class WhoIsIAmServices(Capability):
             if (self.localDevice.objectIdentifier[1] > high_limit):
                 return
 
+        # answer broadcasts after a random delay so the devices that match
+        # do not all answer at once
+        delay = 0.0
+        if apdu.pduDestination and apdu.pduDestination.addrType in (
+                Address.localBroadcastAddr,
+                Address.remoteBroadcastAddr,
+                Address.globalBroadcastAddr,
+                ):
+            delay = random.uniform(0.0, self.i_am_max_delay)
+
         # generate an I-Am
-        self.i_am(address=apdu.pduSource)
+        self._i_am_schedule(apdu.pduSource, delay)
+
+    def _i_am_schedule(self, address, delay):
+        if _debug: WhoIsIAmServices._debug("_i_am_schedule %r %r", address, delay)
+
+        now = TaskManager().get_time()
+
+        # already waiting, or answered recently
+        if (address in self._i_am_pending):
+            if _debug: WhoIsIAmServices._debug("    - already pending")
+            self.i_am_suppressed += 1
+            return
+        last_times = [self._i_am_answered.get(address, None), self._i_am_broadcast_time]
+        last_times = [last_time for last_time in last_times if last_time is not None]
+        if last_times and (now - max(last_times) < self.i_am_min_interval):
+            if _debug: WhoIsIAmServices._debug("    - answered recently")
+            self.i_am_suppressed += 1
+            return
+
+        self._i_am_pending[address] = now + delay
+        self._i_am_process()
+
+    def _i_am_process(self):
+        if _debug: WhoIsIAmServices._debug("_i_am_process")
+
+        now = TaskManager().get_time()
+
+        # add the tokens for the time since the last look
+        if self._i_am_token_time is not None:
+            self._i_am_tokens = min(float(self.i_am_burst),
+                self._i_am_tokens + (now - self._i_am_token_time) * self.i_am_rate)
+        self._i_am_token_time = now
+
+        # forget the requesters answered long enough ago
+        for address, last_time in list(self._i_am_answered.items()):
+            if now - last_time >= self.i_am_min_interval:
+                del self._i_am_answered[address]
+
+        due = [address for address, when in self._i_am_pending.items() if when <= now]
+        if due and (self._i_am_tokens >= 1.0):
+            if (len(self._i_am_pending) >= self.i_am_broadcast_threshold) or (len(due) > self._i_am_tokens):
+                if _debug: WhoIsIAmServices._debug("    - broadcast for %d requesters", len(self._i_am_pending))
+
+                # one global broadcast answers everyone that is waiting
+                self.i_am_suppressed += len(self._i_am_pending) - 1
+                self._i_am_pending.clear()
+                self._i_am_broadcast_time = now
+                self._i_am_tokens -= 1.0
+                self.i_am()
+            else:
+                for address in due:
+                    del self._i_am_pending[address]
+                    self._i_am_answered[address] = now
+                    self._i_am_tokens -= 1.0
+                    self.i_am(address)
+
+        if not self._i_am_pending:
+            if self._i_am_task.isScheduled:
+                self._i_am_task.suspend_task()
+            return
+
+        # wake up when the next one is due and there is a token for it
+        when = min(self._i_am_pending.values())
+        if self._i_am_tokens < 1.0:
+            when = max(when, now + (1.0 - self._i_am_tokens) / self.i_am_rate)
+        self._i_am_task.install_task(when=when)
 
     def i_am(self, address=None):
         if _debug: WhoIsIAmServices._debug("i_am")
@@ -109,13 +228,10 @@ class WhoIsIAmServices(Capability):
             if _debug: WhoIsIAmServices._debug("    - no local device")
             return
 
-        # create a I-Am "response" back to the source
-        iAm = IAmRequest(
-            iAmDeviceIdentifier=self.localDevice.objectIdentifier,
-            maxAPDULengthAccepted=self.localDevice.maxApduLengthAccepted,
-            segmentationSupported=self.localDevice.segmentationSupported,
-            vendorID=self.localDevice.vendorIdentifier,
-            )
+        # create a I-Am "response" back to the source, it has already been
+        # encoded so the application service access point passes it along
+        iAm = UnconfirmedRequestPDU(IAmRequest.serviceChoice)
+        iAm.put_data(self._i_am_encode())
 
         # defaults to a global broadcast
         if not address:
@@ -124,8 +240,43 @@ class WhoIsIAmServices(Capability):
         if _debug: WhoIsIAmServices._debug("    - iAm: %r", iAm)
 
         # away it goes
+        self.i_am_sent += 1
         self.request(iAm)
 
+    def _i_am_encode(self):
+        """Return the encoded I-Am parameters for the local device."""
+        if self._i_am_data is not None and self._i_am_device is self.localDevice:
+            return self._i_am_data
+        if _debug: WhoIsIAmServices._debug("_i_am_encode")
+
+        # watch for changes
+        if self._i_am_device is not self.localDevice:
+            if self._i_am_device is not None:
+                for propid in _i_am_properties:
+                    self._i_am_device._property_monitors[propid].remove(self._i_am_changed)
+            for propid in _i_am_properties:
+                self.localDevice._property_monitors[propid].append(self._i_am_changed)
+            self._i_am_device = self.localDevice
+
+        iAm = IAmRequest(
+            iAmDeviceIdentifier=self.localDevice.objectIdentifier,
+            maxAPDULengthAccepted=self.localDevice.maxApduLengthAccepted,
+            segmentationSupported=self.localDevice.segmentationSupported,
+            vendorID=self.localDevice.vendorIdentifier,
+            )
+
+        xpdu = UnconfirmedRequestPDU()
+        iAm.encode(xpdu)
+        self._i_am_data = bytes(xpdu.pduData)
+
+        return self._i_am_data
+
+    def _i_am_changed(self, old_value, new_value):
+        if _debug: WhoIsIAmServices._debug("_i_am_changed %r %r", old_value, new_value)
+
+        # encode it again the next time
+        self._i_am_data = None
+
     def do_IAmRequest(self, apdu):
         """Respond to an I-Am request."""
         if _debug: WhoIsIAmServices._debug("do_IAmRequest %r", apdu)
@@ -148,8 +299,10 @@ class WhoIsIAmServices(Capability):
         device_address = apdu.pduSource
         if _debug: WhoIsIAmServices._debug("    - device_address: %r", device_address)
 
-        ### check to see if the application is looking for this device
-        ### and update the device info cache if it is
+        # pass it to the discoveries that are looking for devices, they
+        # update the device info cache
+        for discovery in list(self.device_discoveries):
+            discovery.i_am(apdu)
 
 #
 #   Who-Has I-Have Services
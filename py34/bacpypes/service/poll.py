@@ -0,0 +1,370 @@
+#!/usr/bin/env python
+
+"""
+Polling Services
+"""
+
+import random
+from heapq import heappush, heappop
+
+from ..debugging import bacpypes_debugging, ModuleLogger, DebugContents
+from ..task import OneShotTask, TaskManager
+
+# some debugging
+_debug = 0
+_log = ModuleLogger(globals())
+
+#
+#   _value_key
+#
+
+def _value_key(value):
+    """Return something that compares equal when the value has not
+    changed, constructed values are compared by their contents."""
+    if hasattr(value, 'dict_contents'):
+        return ('value', value.dict_contents())
+    return ('value', value)
+
+#
+#   _error_key
+#
+
+def _error_key(error):
+    """Return something that compares equal when the error has not
+    changed, a new abort for the same reason is the same error."""
+    if hasattr(error, 'errorCode'):
+        return ('error', error.errorClass, error.errorCode)
+    if hasattr(error, 'apduAbortRejectReason'):
+        return ('error', error.__class__.__name__, error.apduAbortRejectReason)
+    return ('error', error.__class__.__name__, str(error))
+
+#
+#   PolledPoint
+#
+
+@bacpypes_debugging
+class PolledPoint(DebugContents):
+
+    _debug_contents = (
+        'point',
+        'interval',
+        'nominal_time',
+        'due_time',
+        'pending',
+        'value',
+        'error',
+        'lag',
+        )
+
+    def __init__(self, point):
+        if _debug: PolledPoint._debug("__init__ %r", point)
+
+        self.point = point
+
+        # list of (interval, fn, args, kwargs), the point is read at the
+        # shortest interval in milliseconds
+        self.subscribers = []
+        self.interval = None
+
+        # when the point should be read and when it will be, in seconds
+        self.nominal_time = None
+        self.due_time = None
+        self._schedule_entry = None
+
+        # being read
+        self.pending = False
+
+        # what was last delivered
+        self.delivered = False
+        self.value = None
+        self.error = None
+        self._key = None
+
+        # milliseconds late the last time it was read
+        self.lag = 0.0
+
+#
+#   PointPoller
+#
+
+@bacpypes_debugging
+class PointPoller(OneShotTask):
+
+    """Read points at their own intervals with the ReadPointListServices of
+    an application and deliver the values that change."""
+
+    _debug_contents = (
+        'jitter',
+        'coalesce',
+        'request_rate',
+        'max_outstanding',
+        'lag_threshold',
+        'max_lag',
+        'late_count',
+        )
+
+    def __init__(self, app, jitter=0.1, coalesce=0.1, request_rate=None, max_outstanding=1, lag_threshold=0.5):
+        if _debug: PointPoller._debug("__init__ %r jitter=%r coalesce=%r request_rate=%r max_outstanding=%r lag_threshold=%r", app, jitter, coalesce, request_rate, max_outstanding, lag_threshold)
+        OneShotTask.__init__(self)
+
+        # the application reads the points
+        self.app = app
+
+        # fraction of the interval added at random to each poll, and how
+        # early a point can be read along with others from the same device
+        self.jitter = jitter
+        self.coalesce = coalesce
+
+        # requests per second and requests in flight to each device, unless
+        # the address has its own
+        self.request_rate = request_rate
+        self.request_rate_by_address = {}
+        self.max_outstanding = max_outstanding
+        self.max_outstanding_by_address = {}
+
+        # polled points and the points of each device
+        self.points = {}
+        self.points_by_address = {}
+
+        # heap of (due_time, sequence, polled point) entries, the entries
+        # of points that are read early or removed are left behind
+        self.schedule = []
+        self.sequence = 0
+
+        # points that are due but waiting for their device
+        self.due_by_address = {}
+
+        # requests in flight and when the next one can be sent
+        self.outstanding = {}
+        self.next_request_time = {}
+
+        # fraction of the interval a point can be late before it counts
+        self.lag_threshold = lag_threshold
+        self.max_lag = 0.0
+        self.late_count = 0
+
+    def add_point(self, point, interval, fn, *args, **kwargs):
+        """Read a point every interval milliseconds and call the function
+        with the point, value and error when either one changes."""
+        if _debug: PointPoller._debug("add_point %r %r %r %r %r", point, interval, fn, args, kwargs)
+
+        if interval <= 0:
+            raise RuntimeError("interval must be greater than zero")
+
+        point = self.app.normalize_point(point)
+        now = TaskManager().get_time()
+
+        polled = self.points.get(point, None)
+        if polled is None:
+            polled = self.points[point] = PolledPoint(point)
+            self.points_by_address.setdefault(point[0], []).append(polled)
+
+            polled.subscribers.append((interval, fn, args, kwargs))
+            polled.interval = interval
+
+            # start at a random time in the first interval
+            polled.nominal_time = now + random.uniform(0.0, interval / 1000.0)
+            self._schedule_point(polled)
+        else:
+            polled.subscribers.append((interval, fn, args, kwargs))
+
+            if interval < polled.interval:
+                polled.interval = interval
+
+                # do not wait longer than the new interval
+                if (not polled.pending) and (polled.nominal_time > now + interval / 1000.0):
+                    polled.nominal_time = now + random.uniform(0.0, interval / 1000.0)
+                    self._schedule_point(polled)
+
+            # give the new subscriber what is already known
+            if polled.delivered:
+                fn(point, polled.value, polled.error, *args, **kwargs)
+
+        return point
+
+    def remove_point(self, point, fn=None):
+        """Stop delivering changes of a point to a function, or to all of
+        them, and stop reading it when there are no more."""
+        if _debug: PointPoller._debug("remove_point %r %r", point, fn)
+
+        point = self.app.normalize_point(point)
+
+        polled = self.points.get(point, None)
+        if polled is None:
+            raise RuntimeError("point not polled")
+
+        polled.subscribers = [subscriber for subscriber in polled.subscribers
+            if (fn is not None) and (subscriber[1] != fn)]
+        if polled.subscribers:
+            polled.interval = min(subscriber[0] for subscriber in polled.subscribers)
+            return
+
+        # forget about it
+        del self.points[point]
+        self.points_by_address[point[0]].remove(polled)
+        if not self.points_by_address[point[0]]:
+            del self.points_by_address[point[0]]
+
+        polled._schedule_entry = None
+        due = self.due_by_address.get(point[0], None)
+        if due and (polled in due):
+            due.remove(polled)
+
+    def _schedule_point(self, polled):
+        if _debug: PointPoller._debug("_schedule_point %r", polled)
+
+        # spread the reads of points with the same interval
+        polled.due_time = polled.nominal_time
+        if self.jitter:
+            polled.due_time += random.uniform(0.0, self.jitter * polled.interval / 1000.0)
+
+        self.sequence += 1
+        polled._schedule_entry = entry = (polled.due_time, self.sequence, polled)
+        heappush(self.schedule, entry)
+
+        self._wake(polled.due_time)
+
+    def _wake(self, when):
+        """Make sure the poller runs by this time."""
+        if (not self.isScheduled) or (when < self.taskTime):
+            self.install_task(when=when)
+
+    def process_task(self):
+        if _debug: PointPoller._debug("process_task")
+
+        now = TaskManager().get_time()
+
+        # move the points that are due to their device
+        while self.schedule and (self.schedule[0][0] <= now):
+            entry = heappop(self.schedule)
+            polled = entry[2]
+            if polled._schedule_entry is not entry:
+                continue
+            polled._schedule_entry = None
+
+            self.due_by_address.setdefault(polled.point[0], []).append(polled)
+
+        # send what the devices can take
+        for address in list(self.due_by_address):
+            self._poll_device(address, now)
+
+        # wake up for the next point
+        while self.schedule and (self.schedule[0][2]._schedule_entry is not self.schedule[0]):
+            heappop(self.schedule)
+        if self.schedule:
+            self._wake(self.schedule[0][0])
+
+    def _poll_device(self, address, now):
+        if _debug: PointPoller._debug("_poll_device %r %r", address, now)
+
+        due = self.due_by_address[address]
+        request_rate = self.request_rate_by_address.get(address, self.request_rate)
+        max_outstanding = self.max_outstanding_by_address.get(address, self.max_outstanding)
+
+        while due:
+            if self.outstanding.get(address, 0) >= max_outstanding:
+                if _debug: PointPoller._debug("    - too many outstanding")
+                break
+
+            next_request_time = self.next_request_time.get(address, now)
+            if next_request_time > now:
+                if _debug: PointPoller._debug("    - rate limited")
+                self._wake(next_request_time)
+                break
+
+            # points that are almost due come along
+            points = [polled.point for polled in due]
+            if self.coalesce:
+                for polled in self.points_by_address[address]:
+                    if (polled._schedule_entry is not None) and \
+                            ((polled.due_time - now) * 1000.0 <= self.coalesce * polled.interval):
+                        points.append(polled.point)
+
+            # as much as fits in one request
+            batch = [self.points[point] for point in self.app.plan_read(points)[0][1]]
+            if _debug: PointPoller._debug("    - batch: %r", batch)
+
+            worst_lag = 0.0
+            for polled in batch:
+                polled.pending = True
+
+                if polled._schedule_entry is not None:
+                    polled._schedule_entry = None
+                else:
+                    polled.lag = lag = (now - polled.due_time) * 1000.0
+                    self.max_lag = max(self.max_lag, lag)
+                    if lag > self.lag_threshold * polled.interval:
+                        self.late_count += 1
+                        worst_lag = max(worst_lag, lag)
+            due[:] = [polled for polled in due if not polled.pending]
+
+            if worst_lag:
+                self.lagging(address, worst_lag)
+
+            # count the request against the device
+            self.outstanding[address] = self.outstanding.get(address, 0) + 1
+            if request_rate:
+                self.next_request_time[address] = max(next_request_time, now) + 1.0 / request_rate
+
+            self._read_batch(address, batch)
+
+        if not due:
+            del self.due_by_address[address]
+
+    def _read_batch(self, address, batch):
+        if _debug: PointPoller._debug("_read_batch %r %r", address, batch)
+
+        waiting = list(batch)
+        iocbs = self.app.read_points([polled.point for polled in batch])
+        for polled, iocb in zip(batch, iocbs):
+            iocb.add_callback(self._read_complete, address, polled, waiting)
+
+    def _read_complete(self, iocb, address, polled, waiting):
+        if _debug: PointPoller._debug("_read_complete %r %r %r", iocb, address, polled)
+
+        now = TaskManager().get_time()
+        polled.pending = False
+
+        # it might have been removed while it was being read
+        if self.points.get(polled.point, None) is polled:
+            if iocb.ioError:
+                self._deliver(polled, None, iocb.ioError, _error_key(iocb.ioError))
+            else:
+                self._deliver(polled, iocb.ioResponse, None, _value_key(iocb.ioResponse))
+
+            # next time, skipping the intervals that have been missed
+            interval = polled.interval / 1000.0
+            polled.nominal_time += interval
+            if polled.nominal_time <= now:
+                polled.nominal_time += interval * (int((now - polled.nominal_time) / interval) + 1)
+            self._schedule_point(polled)
+
+        # the device can take another request when they are all back
+        waiting.remove(polled)
+        if not waiting:
+            self.outstanding[address] -= 1
+            if not self.outstanding[address]:
+                del self.outstanding[address]
+
+            if address in self.due_by_address:
+                self._wake(now)
+
+    def _deliver(self, polled, value, error, key):
+        if _debug: PointPoller._debug("_deliver %r %r %r", polled, value, error)
+
+        # only changes
+        if polled.delivered and (key == polled._key):
+            return
+
+        polled.delivered = True
+        polled.value = value
+        polled.error = error
+        polled._key = key
+
+        for interval, fn, args, kwargs in list(polled.subscribers):
+            fn(polled.point, value, error, *args, **kwargs)
+
+    def lagging(self, address, lag):
+        """Called when points of a device are read later than the lag
+        threshold, the lag is in milliseconds."""
+        PointPoller._warning("polling %s is %.0fms behind", address, lag)
@@ -0,0 +1,419 @@
+#!/usr/bin/env python
+
+"""
+Read Services
+"""
+
+from ..debugging import bacpypes_debugging, ModuleLogger
+from ..capability import Capability
+
+from ..pdu import Address
+from ..primitivedata import Atomic, Unsigned, Double, OctetString, \
+    CharacterString, ObjectIdentifier
+from ..constructeddata import Array
+from ..basetypes import PropertyIdentifier, PropertyReference
+from ..apdu import ReadPropertyRequest, ReadPropertyACK, \
+    ReadPropertyMultipleRequest, ReadPropertyMultipleACK, \
+    ReadAccessSpecification, RejectPDU, AbortPDU, RejectReason, AbortReason
+from ..object import get_datatype
+from ..iocb import IOCB
+
+# some debugging
+_debug = 0
+_log = ModuleLogger(globals())
+
+# maximum APDU length assumed for devices that are not in the cache
+DEFAULT_MAX_APDU_LENGTH = 480
+
+# request and response overhead, in octets
+REQUEST_HEADER_LENGTH = 4
+RESPONSE_HEADER_LENGTH = 3
+OBJECT_LENGTH = 7
+
+# rejects and aborts that mean the request or response was too big
+_unrecognized_service = RejectReason('unrecognizedService').get_long()
+_too_big_rejects = set([RejectReason('bufferOverflow').get_long()])
+_too_big_aborts = set([AbortReason(reason).get_long() for reason in (
+    'bufferOverflow', 'segmentationNotSupported', 'apduTooLong',
+    )])
+
+#
+#   _tag_length
+#
+
+def _tag_length(value):
+    """Return the length of a context encoded unsigned value."""
+    if value < 0x100:
+        return 2
+    elif value < 0x10000:
+        return 3
+    elif value < 0x1000000:
+        return 4
+    else:
+        return 5
+
+#
+#   decode_property_value
+#
+
+@bacpypes_debugging
+def decode_property_value(property_value, object_type, property_identifier, property_array_index=None, vendor_id=0):
+    """Return the value of a property from the Any it was read as."""
+    if _debug: decode_property_value._debug("decode_property_value %r %r %r %r %r", property_value, object_type, property_identifier, property_array_index, vendor_id)
+
+    datatype = get_datatype(object_type, property_identifier, vendor_id)
+    if not datatype:
+        raise TypeError("unknown datatype")
+
+    # special case for array parts, others are managed by cast_out
+    if issubclass(datatype, Array) and (property_array_index is not None):
+        if property_array_index == 0:
+            value = property_value.cast_out(Unsigned)
+        else:
+            value = property_value.cast_out(datatype.subtype)
+    else:
+        value = property_value.cast_out(datatype)
+    if _debug: decode_property_value._debug("    - value: %r", value)
+
+    return value
+
+#
+#   Read Point List Services
+#
+
+@bacpypes_debugging
+class ReadPointListServices(Capability):
+
+    def __init__(self):
+        if _debug: ReadPointListServices._debug("__init__")
+        Capability.__init__(self)
+
+        # addresses of devices that reject ReadPropertyMultiple
+        self.read_multiple_unsupported = set()
+
+    def normalize_point(self, point):
+        """Return a point as a tuple of an address, an object identifier,
+        a property identifier and an array index or None."""
+        if _debug: ReadPointListServices._debug("normalize_point %r", point)
+
+        if len(point) == 3:
+            address, objid, propid = point
+            index = None
+        elif len(point) == 4:
+            address, objid, propid, index = point
+        else:
+            raise ValueError("point must be (address, object, property[, index])")
+
+        if not isinstance(address, Address):
+            address = Address(address)
+
+        return (address, ObjectIdentifier(objid).value, PropertyIdentifier(propid).value, index)
+
+    def get_read_limits(self, address):
+        """Return the largest request that can be sent to a device and the
+        largest response it can return, in octets."""
+        if _debug: ReadPointListServices._debug("get_read_limits %r", address)
+
+        # what the local device can accept
+        local_length = 1024
+        local_segmentation = 'noSegmentation'
+        local_segments = 1
+        if self.localDevice:
+            local_length = self.localDevice.maxApduLengthAccepted or local_length
+            local_segmentation = self.localDevice.segmentationSupported or local_segmentation
+            local_segments = self.localDevice.maxSegmentsAccepted or local_segments
+
+        device_info = self.deviceInfoCache.peek_device_info(address)
+        if _debug: ReadPointListServices._debug("    - device_info: %r", device_info)
+        if not device_info:
+            request_limit = DEFAULT_MAX_APDU_LENGTH
+            response_limit = min(DEFAULT_MAX_APDU_LENGTH, local_length)
+        else:
+            request_limit = min(device_info.maxApduLengthAccepted, device_info.maxNpduLength)
+            response_limit = min(device_info.maxApduLengthAccepted, local_length)
+
+            # large responses can come back in segments
+            if (device_info.segmentationSupported in ('segmentedTransmit', 'segmentedBoth')) \
+                    and (local_segmentation in ('segmentedReceive', 'segmentedBoth')):
+                response_limit *= local_segments
+        if _debug: ReadPointListServices._debug("    - limits: %r, %r", request_limit, response_limit)
+
+        return request_limit, response_limit
+
+    def estimate_value_size(self, object_type, property_identifier, property_array_index=None, vendor_id=0):
+        """Return the expected length of an encoded property value."""
+        if _debug: ReadPointListServices._debug("estimate_value_size %r %r %r vendor_id=%r", object_type, property_identifier, property_array_index, vendor_id)
+
+        datatype = get_datatype(object_type, property_identifier, vendor_id or 0)
+        if not datatype:
+            return 16
+
+        # array elements are the subtype, the length is unsigned
+        if issubclass(datatype, Array) and (property_array_index is not None):
+            if property_array_index == 0:
+                return 5
+            datatype = datatype.subtype
+
+        if getattr(datatype, 'subtype', None):
+            return 128
+        elif issubclass(datatype, (CharacterString, OctetString)):
+            return 64
+        elif issubclass(datatype, Double):
+            return 9
+        elif issubclass(datatype, Atomic):
+            return 5
+        else:
+            return 32
+
+    def estimate_point_size(self, point, vendor_id=0):
+        """Return the length of the property reference of a point in a
+        request and the expected length of its result in a response."""
+        if _debug: ReadPointListServices._debug("estimate_point_size %r vendor_id=%r", point, vendor_id)
+
+        address, objid, propid, index = point
+
+        # vendor properties are already numbers
+        if isinstance(propid, int):
+            request_length = _tag_length(propid)
+        else:
+            request_length = _tag_length(PropertyIdentifier(propid).get_long())
+        if index is not None:
+            request_length += _tag_length(index)
+
+        # opening and closing tags around the value
+        response_length = request_length + 2 \
+            + self.estimate_value_size(objid[0], propid, index, vendor_id)
+
+        return request_length, response_length
+
+    def plan_read(self, points):
+        """Group a list of points into batches that can each be read by one
+        request, returns a list of (address, [point, ...]) tuples."""
+        if _debug: ReadPointListServices._debug("plan_read %r", points)
+
+        # points by device by object, in the order they first appear
+        addresses = []
+        objects_by_address = {}
+        points_by_object = {}
+        for point in points:
+            point = self.normalize_point(point)
+            address, objid = point[:2]
+
+            objects = objects_by_address.get(address, None)
+            if objects is None:
+                objects = objects_by_address[address] = []
+                addresses.append(address)
+
+            object_points = points_by_object.get((address, objid), None)
+            if object_points is None:
+                object_points = points_by_object[(address, objid)] = []
+                objects.append(objid)
+
+            # duplicates are read once
+            if point not in object_points:
+                object_points.append(point)
+
+        batches = []
+        for address in addresses:
+            device_points = []
+            for objid in objects_by_address[address]:
+                device_points.extend(points_by_object[(address, objid)])
+
+            # one at a time for devices without ReadPropertyMultiple
+            if address in self.read_multiple_unsupported:
+                for point in device_points:
+                    batches.append((address, [point]))
+                continue
+
+            request_limit, response_limit = self.get_read_limits(address)
+
+            device_info = self.deviceInfoCache.peek_device_info(address)
+            vendor_id = device_info and device_info.vendorID or 0
+
+            batch = []
+            request_size = REQUEST_HEADER_LENGTH
+            response_size = RESPONSE_HEADER_LENGTH
+            for point in device_points:
+                request_length, response_length = self.estimate_point_size(point, vendor_id)
+
+                # the first property of an object starts a new specification
+                if (not batch) or (batch[-1][1] != point[1]):
+                    object_length = OBJECT_LENGTH
+                else:
+                    object_length = 0
+
+                # start a new batch if this one is full
+                if batch and ((request_size + object_length + request_length > request_limit)
+                        or (response_size + object_length + response_length > response_limit)):
+                    batches.append((address, batch))
+
+                    batch = []
+                    request_size = REQUEST_HEADER_LENGTH
+                    response_size = RESPONSE_HEADER_LENGTH
+                    object_length = OBJECT_LENGTH
+
+                batch.append(point)
+                request_size += object_length + request_length
+                response_size += object_length + response_length
+
+            if batch:
+                batches.append((address, batch))
+        if _debug: ReadPointListServices._debug("    - batches: %r", batches)
+
+        return batches
+
+    def read_points(self, points):
+        """Read a list of points, returns an IOCB for each one that completes
+        with the value or aborts with the error."""
+        if _debug: ReadPointListServices._debug("read_points %r", points)
+
+        # one IOCB for each different point
+        iocbs = []
+        iocb_by_point = {}
+        for point in points:
+            point = self.normalize_point(point)
+
+            iocb = iocb_by_point.get(point, None)
+            if iocb is None:
+                iocb = iocb_by_point[point] = IOCB(point)
+            iocbs.append(iocb)
+
+        # send the requests
+        for address, batch in self.plan_read([iocb.args[0] for iocb in iocbs]):
+            self._read_batch(address, [(point, iocb_by_point[point]) for point in batch])
+
+        return iocbs
+
+    def _read_batch(self, address, batch):
+        if _debug: ReadPointListServices._debug("_read_batch %r %r", address, batch)
+
+        # single points are read with ReadProperty
+        if (len(batch) == 1) or (address in self.read_multiple_unsupported):
+            for point, iocb in batch:
+                self._read_point(point, iocb)
+            return
+
+        # a specification for each run of properties of the same object
+        read_access_spec_list = []
+        for point, iocb in batch:
+            objid, propid, index = point[1:]
+
+            if (not read_access_spec_list) or (read_access_spec_list[-1].objectIdentifier != objid):
+                read_access_spec_list.append(ReadAccessSpecification(
+                    objectIdentifier=objid,
+                    listOfPropertyReferences=[],
+                    ))
+
+            read_access_spec_list[-1].listOfPropertyReferences.append(PropertyReference(
+                propertyIdentifier=propid,
+                propertyArrayIndex=index,
+                ))
+
+        request = ReadPropertyMultipleRequest(
+            listOfReadAccessSpecs=read_access_spec_list,
+            )
+        request.pduDestination = address
+        if _debug: ReadPointListServices._debug("    - request: %r", request)
+
+        request_iocb = IOCB(request)
+        request_iocb.add_callback(self._read_batch_complete, address, batch)
+
+        self.request_io(request_iocb)
+
+    def _read_batch_complete(self, request_iocb, address, batch):
+        if _debug: ReadPointListServices._debug("_read_batch_complete %r %r %r", request_iocb, address, batch)
+
+        if request_iocb.ioError:
+            error = request_iocb.ioError
+            if _debug: ReadPointListServices._debug("    - error: %r", error)
+
+            if isinstance(error, RejectPDU) and (error.apduAbortRejectReason == _unrecognized_service):
+                if _debug: ReadPointListServices._debug("    - ReadPropertyMultiple not supported")
+                self.read_multiple_unsupported.add(address)
+
+                for point, iocb in batch:
+                    self._read_point(point, iocb)
+
+            elif (isinstance(error, RejectPDU) and (error.apduAbortRejectReason in _too_big_rejects)) \
+                    or (isinstance(error, AbortPDU) and (error.apduAbortRejectReason in _too_big_aborts)):
+                if _debug: ReadPointListServices._debug("    - too big, split")
+                half = len(batch) // 2
+                self._read_batch(address, batch[:half])
+                self._read_batch(address, batch[half:])
+
+            else:
+                for point, iocb in batch:
+                    iocb.abort(error)
+            return
+
+        apdu = request_iocb.ioResponse
+        if not isinstance(apdu, ReadPropertyMultipleACK):
+            for point, iocb in batch:
+                iocb.abort(RuntimeError("unexpected response"))
+            return
+
+        # the results by point
+        results = {}
+        for result in apdu.listOfReadAccessResults:
+            for element in result.listOfResults:
+                results[(address, result.objectIdentifier, element.propertyIdentifier, element.propertyArrayIndex)] = element.readResult
+
+        for point, iocb in batch:
+            read_result = results.get(point, None)
+            if read_result is None:
+                iocb.abort(RuntimeError("no result"))
+            elif read_result.propertyAccessError is not None:
+                iocb.abort(read_result.propertyAccessError)
+            else:
+                self._complete_point(point, iocb, read_result.propertyValue)
+
+    def _read_point(self, point, iocb):
+        if _debug: ReadPointListServices._debug("_read_point %r %r", point, iocb)
+
+        address, objid, propid, index = point
+
+        request = ReadPropertyRequest(
+            objectIdentifier=objid,
+            propertyIdentifier=propid,
+            )
+        request.pduDestination = address
+        if index is not None:
+            request.propertyArrayIndex = index
+        if _debug: ReadPointListServices._debug("    - request: %r", request)
+
+        request_iocb = IOCB(request)
+        request_iocb.add_callback(self._read_point_complete, point, iocb)
+
+        self.request_io(request_iocb)
+
+    def _read_point_complete(self, request_iocb, point, iocb):
+        if _debug: ReadPointListServices._debug("_read_point_complete %r %r %r", request_iocb, point, iocb)
+
+        if request_iocb.ioError:
+            iocb.abort(request_iocb.ioError)
+        elif not isinstance(request_iocb.ioResponse, ReadPropertyACK):
+            iocb.abort(RuntimeError("unexpected response"))
+        else:
+            self._complete_point(point, iocb, request_iocb.ioResponse.propertyValue)
+
+    def decode_point_value(self, point, property_value):
+        """Return the value of a point from the Any it was read as."""
+        if _debug: ReadPointListServices._debug("decode_point_value %r %r", point, property_value)
+
+        address, objid, propid, index = point
+
+        device_info = self.deviceInfoCache.peek_device_info(address)
+        vendor_id = device_info and device_info.vendorID or 0
+
+        return decode_property_value(property_value, objid[0], propid, index, vendor_id)
+
+    def _complete_point(self, point, iocb, property_value):
+        if _debug: ReadPointListServices._debug("_complete_point %r %r %r", point, iocb, property_value)
+
+        try:
+            value = self.decode_point_value(point, property_value)
+        except Exception as err:
+            iocb.abort(err)
+            return
+
+        iocb.complete(value)
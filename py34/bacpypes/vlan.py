@@ -8,13 +8,14 @@ import random
 import socket
 import struct
 from copy import deepcopy
+from collections import deque
 
 from .errors import ConfigurationError
 from .debugging import ModuleLogger, bacpypes_debugging
 
 from .pdu import Address
 from .comm import Client, Server, bind
-from .task import OneShotFunction
+from .task import OneShotFunction, FunctionTask
 
 # some debugging
 _debug = 0
@@ -27,8 +28,8 @@ _log = ModuleLogger(globals())
 @bacpypes_debugging
 class Network:
 
-    def __init__(self, name='', broadcast_address=None, drop_percent=0.0):
-        if _debug: Network._debug("__init__ name=%r broadcast_address=%r drop_percent=%r", name, broadcast_address, drop_percent)
+    def __init__(self, name='', broadcast_address=None, drop_percent=0.0, rate=None):
+        if _debug: Network._debug("__init__ name=%r broadcast_address=%r drop_percent=%r rate=%r", name, broadcast_address, drop_percent, rate)
 
         self.name = name
         self.nodes = []
@@ -38,6 +39,12 @@ class Network:
         # point to a TrafficLog instance
         self.traffic_log = None
 
+        # a network with a rate delivers that many PDUs per second, the
+        # rest wait their turn by network priority
+        self.rate = rate
+        self.pending = [deque() for i in range(4)]
+        self.transmit_task = FunctionTask(self.transmit_pdu)
+
     def add_node(self, node):
         """ Add a node to this network, let the node know which network it's on. """
         if _debug: Network._debug("add_node %r", node)
@@ -58,10 +65,44 @@ class Network:
 
     def process_pdu(self, pdu):
         """ Process a PDU by sending a copy to each node as dictated by the
-            addressing and if a node is promiscuous.
+            addressing and if a node is promiscuous.  If the network has a
+            rate the PDU is queued by network priority.
         """
         if _debug: Network._debug("process_pdu(%s) %r", self.name, pdu)
 
+        if not self.rate:
+            self.deliver_pdu(pdu)
+            return
+
+        # queue it, start transmitting if the network is idle
+        self.pending[getattr(pdu, 'pduNetworkPriority', 0) & 0x03].append(pdu)
+        if not self.transmit_task.isScheduled:
+            self.transmit_pdu()
+
+    def transmit_pdu(self):
+        """ Deliver the highest priority pending PDU and hold the network
+            for as long as it takes.
+        """
+        if _debug: Network._debug("transmit_pdu(%s)", self.name)
+
+        for pending in reversed(self.pending):
+            if pending:
+                break
+        else:
+            if _debug: Network._debug("    - idle")
+            return
+
+        self.deliver_pdu(pending.popleft())
+
+        # wait for the next one
+        self.transmit_task.install_task(delta=1.0 / self.rate)
+
+    def deliver_pdu(self, pdu):
+        """ Send a copy of the PDU to each node as dictated by the addressing
+            and if a node is promiscuous.
+        """
+        if _debug: Network._debug("deliver_pdu(%s) %r", self.name, pdu)
+
         # if there is a traffic log, call it with the network name and pdu
         if self.traffic_log:
             self.traffic_log(self.name, pdu)
@@ -83,8 +83,8 @@ class ReadPointListThread(Thread):
             iocb = IOCB(request)
             if _debug: ReadPointListThread._debug("    - iocb: %r", iocb)
 
-            # give it to the application
-            this_application.request_io(iocb)
+            # give it to the application, from the thread running the loop
+            deferred(this_application.request_io, iocb)
 
             # wait for the response
             iocb.wait()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+
+"""
+PDU Decode Benchmark
+
+This application builds a ReadPropertyMultiple-ACK with a number of objects
+and properties, encodes it all the way down to a BACnet/IP datagram, then
+decodes it back up the stack the same way the BVLL, network and application
+layers do, reporting the time for each layer.  The --objects option sets the
+number of objects in the ACK, the default makes an APDU that fits in a
+single 1476 octet message, larger values build the kind of APDU that is
+reassembled from segments.
+"""
+
+from time import time as _time
+
+from bacpypes.debugging import bacpypes_debugging, ModuleLogger
+from bacpypes.consolelogging import ArgumentParser
+
+from bacpypes.pdu import Address, PDU
+from bacpypes.bvll import BVLPDU, OriginalUnicastNPDU
+from bacpypes.npdu import NPDU
+from bacpypes.apdu import APDU, ComplexAckPDU, ReadPropertyMultipleACK, \
+    ReadAccessResult, ReadAccessResultElement, ReadAccessResultElementChoice
+from bacpypes.primitivedata import Real, CharacterString, TagList
+from bacpypes.constructeddata import Any
+from bacpypes.basetypes import StatusFlags
+
+# some debugging
+_debug = 0
+_log = ModuleLogger(globals())
+
+# settings
+OBJECTS = 20
+COUNT = 1000
+
+#
+#   build_ack
+#
+
+@bacpypes_debugging
+def build_ack(objects):
+    if _debug: build_ack._debug("build_ack %r", objects)
+
+    results = []
+    for i in range(objects):
+        elements = []
+        for prop, value in (
+                ('presentValue', Real(i * 1.5)),
+                ('objectName', CharacterString("analog-value-%d" % (i,))),
+                ('description', CharacterString("a very ordinary analog value")),
+                ('statusFlags', StatusFlags([0, 0, 0, 0])),
+                ):
+            elements.append(ReadAccessResultElement(
+                propertyIdentifier=prop,
+                readResult=ReadAccessResultElementChoice(propertyValue=Any(value)),
+                ))
+        results.append(ReadAccessResult(
+            objectIdentifier=('analogValue', i),
+            listOfResults=elements,
+            ))
+
+    ack = ReadPropertyMultipleACK(listOfReadAccessResults=results)
+    ack.pduDestination = Address("192.168.0.1")
+    ack.apduInvokeID = 1
+
+    return ack
+
+#
+#   encode_ack
+#
+
+@bacpypes_debugging
+def encode_ack(ack):
+    if _debug: encode_ack._debug("encode_ack %r", ack)
+
+    # application layer
+    apdu = APDU()
+    ack.encode(apdu)
+    pdu = PDU()
+    apdu.encode(pdu)
+
+    # network layer
+    npdu = NPDU(pdu.pduData)
+    pdu = PDU()
+    npdu.encode(pdu)
+
+    # link layer
+    xpdu = OriginalUnicastNPDU(pdu)
+    bvlpdu = BVLPDU()
+    xpdu.encode(bvlpdu)
+    pdu = PDU()
+    bvlpdu.encode(pdu)
+
+    return pdu.pduData
+
+#
+#   decode_layers
+#
+
+def decode_bvll(data):
+    bvlpdu = BVLPDU()
+    bvlpdu.decode(PDU(data))
+    xpdu = OriginalUnicastNPDU()
+    xpdu.decode(bvlpdu)
+    return PDU(xpdu.pduData)
+
+def decode_npdu(pdu):
+    npdu = NPDU()
+    npdu.decode(pdu)
+    return npdu
+
+def decode_apdu(npdu):
+    apdu = APDU()
+    apdu.decode(npdu)
+    xpdu = ComplexAckPDU()
+    xpdu.decode(apdu)
+    return xpdu
+
+def decode_tags(apdu):
+    tag_list = TagList()
+    tag_list.decode(apdu)
+    return tag_list
+
+def decode_ack(apdu):
+    ack = ReadPropertyMultipleACK()
+    ack.decode(apdu)
+    return ack
+
+#
+#   timed
+#
+
+def timed(label, count, octets, fn, args):
+    start = _time()
+    results = [fn(arg) for arg in args]
+    elapsed = _time() - start
+    print("%-16s %10.3fs %10.2fus/msg %8.1fMB/s" % (label, elapsed, elapsed * 1000000.0 / count, octets * count / max(elapsed, 0.000001) / 1000000.0))
+    return results
+
+#
+#   pdu_decode_benchmark
+#
+
+@bacpypes_debugging
+def pdu_decode_benchmark(objects, count):
+    if _debug: pdu_decode_benchmark._debug("pdu_decode_benchmark %r %r", objects, count)
+
+    # build the datagram
+    data = encode_ack(build_ack(objects))
+    octets = len(data)
+    print("ReadPropertyMultiple-ACK, %d objects, %d octets, %d messages" % (objects, octets, count))
+
+    # decode up the stack one layer at a time
+    pdus = timed("bvll", count, octets, decode_bvll, [data] * count)
+    npdus = timed("npdu", count, octets, decode_npdu, pdus)
+    apdus = timed("apdu", count, octets, decode_apdu, npdus)
+
+    # the tags alone and the whole ACK
+    timed("tags", count, octets, decode_tags, [PDU(apdu.pduData) for apdu in apdus])
+    acks = timed("ack", count, octets, decode_ack, apdus)
+
+    # check the result
+    assert len(acks[0].listOfReadAccessResults) == objects
+
+#
+#   __main__
+#
+
+def main():
+    # parse the command line arguments
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--objects", type=int, default=OBJECTS,
+        help="number of objects in the ACK, default %d" % (OBJECTS,),
+        )
+    parser.add_argument("--count", type=int, default=COUNT,
+        help="number of messages to decode, default %d" % (COUNT,),
+        )
+    args = parser.parse_args()
+
+    if _debug: _log.debug("initialization")
+    if _debug: _log.debug("    - args: %r", args)
+
+    pdu_decode_benchmark(args.objects, args.count)
+
+if __name__ == "__main__":
+    main()
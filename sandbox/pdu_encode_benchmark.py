@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+
+"""
+PDU Encode Benchmark
+
+This application encodes ReadProperty-ACKs down the stack the same way the
+application, network and BVLL layers do and reports the time for each layer
+and the number of responses that could be built in a second.
+"""
+
+from time import time as _time
+
+from bacpypes.debugging import bacpypes_debugging, ModuleLogger
+from bacpypes.consolelogging import ArgumentParser
+
+from bacpypes.pdu import Address, PDU
+from bacpypes.bvll import BVLPDU, OriginalUnicastNPDU
+from bacpypes.npdu import NPDU
+from bacpypes.apdu import APDU, ReadPropertyACK
+from bacpypes.primitivedata import Real
+from bacpypes.constructeddata import Any
+
+# some debugging
+_debug = 0
+_log = ModuleLogger(globals())
+
+# settings
+COUNT = 10000
+
+#
+#   encode_layers
+#
+
+def encode_apdu(i):
+    ack = ReadPropertyACK(
+        objectIdentifier=('analogValue', i),
+        propertyIdentifier='presentValue',
+        propertyValue=Any(Real(i * 1.5)),
+        )
+    ack.pduDestination = Address("192.168.0.1")
+    ack.apduInvokeID = i & 0xFF
+
+    apdu = APDU()
+    ack.encode(apdu)
+    return apdu
+
+def encode_npdu(apdu):
+    npdu = NPDU(user_data=apdu.pduUserData)
+    apdu.encode(npdu)
+    npdu.npduHopCount = 255
+
+    pdu = PDU(user_data=npdu.pduUserData)
+    npdu.encode(pdu)
+    return pdu
+
+def encode_bvll(pdu):
+    xpdu = OriginalUnicastNPDU(pdu, destination=pdu.pduDestination, user_data=pdu.pduUserData)
+
+    bvlpdu = BVLPDU()
+    xpdu.encode(bvlpdu)
+    pdu = PDU()
+    bvlpdu.encode(pdu)
+    return pdu
+
+#
+#   timed
+#
+
+def timed(label, count, fn, args):
+    start = _time()
+    results = [fn(arg) for arg in args]
+    elapsed = _time() - start
+    print("%-16s %10.3fs %10.2fus/msg" % (label, elapsed, elapsed * 1000000.0 / count))
+    return results, elapsed
+
+#
+#   pdu_encode_benchmark
+#
+
+@bacpypes_debugging
+def pdu_encode_benchmark(count):
+    if _debug: pdu_encode_benchmark._debug("pdu_encode_benchmark %r", count)
+
+    print("ReadProperty-ACK, %d messages" % (count,))
+
+    # encode down the stack one layer at a time
+    apdus, apdu_elapsed = timed("apdu", count, encode_apdu, range(count))
+    npdus, npdu_elapsed = timed("npdu", count, encode_npdu, apdus)
+    pdus, bvll_elapsed = timed("bvll", count, encode_bvll, npdus)
+
+    elapsed = apdu_elapsed + npdu_elapsed + bvll_elapsed
+    print("%-16s %10.3fs %10.0f/s" % ("total", elapsed, count / max(elapsed, 0.000001)))
+
+#
+#   __main__
+#
+
+def main():
+    # parse the command line arguments
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=COUNT,
+        help="number of messages to encode, default %d" % (COUNT,),
+        )
+    args = parser.parse_args()
+
+    if _debug: _log.debug("initialization")
+    if _debug: _log.debug("    - args: %r", args)
+
+    pdu_encode_benchmark(args.count)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+
+"""
+PDU Memory Benchmark
+
+This application decodes BACnet/IP datagrams carrying ReadProperty-ACKs up
+the stack the same way the UDP, BVLL, network and application layers do,
+keeping every layer of every packet, then reports the size of the objects
+that make up a packet, the number of objects tracked by the garbage
+collector for each packet, and when the tracemalloc module is available,
+the memory allocated and the number of allocations for each packet.
+"""
+
+import sys
+import gc
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from bacpypes.debugging import bacpypes_debugging, ModuleLogger
+from bacpypes.consolelogging import ArgumentParser
+
+from bacpypes.pdu import Address, PDU
+from bacpypes.bvll import BVLPDU, OriginalUnicastNPDU
+from bacpypes.npdu import NPDU
+from bacpypes.apdu import APDU, ComplexAckPDU, ReadPropertyACK
+from bacpypes.primitivedata import Real
+from bacpypes.constructeddata import Any
+
+# some debugging
+_debug = 0
+_log = ModuleLogger(globals())
+
+# settings
+COUNT = 10000
+
+#
+#   build_datagram
+#
+
+def build_datagram():
+    ack = ReadPropertyACK(
+        objectIdentifier=('analogValue', 1),
+        propertyIdentifier='presentValue',
+        propertyValue=Any(Real(75.3)),
+        )
+    ack.pduDestination = Address("192.168.0.1")
+    ack.apduInvokeID = 1
+
+    # application layer
+    apdu = APDU()
+    ack.encode(apdu)
+    pdu = PDU()
+    apdu.encode(pdu)
+
+    # network layer
+    npdu = NPDU(pdu.pduData)
+    pdu = PDU()
+    npdu.encode(pdu)
+
+    # link layer
+    xpdu = OriginalUnicastNPDU(pdu)
+    bvlpdu = BVLPDU()
+    xpdu.encode(bvlpdu)
+    pdu = PDU()
+    bvlpdu.encode(pdu)
+
+    return pdu.pduData
+
+#
+#   decode_packet
+#
+
+def decode_packet(data, i):
+    """Decode a datagram up the stack and return all of the layers."""
+    # the UDP layer builds the source address
+    pdu = PDU(data, source=Address(('10.0.%d.%d' % (i // 250 % 250, i % 250 + 1), 47808)))
+
+    bvlpdu = BVLPDU()
+    bvlpdu.decode(pdu)
+    xpdu = OriginalUnicastNPDU()
+    xpdu.decode(bvlpdu)
+
+    npdu = NPDU()
+    npdu.decode(PDU(xpdu.pduData, source=xpdu.pduSource))
+
+    apdu = APDU()
+    apdu.decode(npdu)
+    xpdu = ComplexAckPDU()
+    xpdu.decode(apdu)
+
+    ack = ReadPropertyACK()
+    ack.decode(xpdu)
+
+    return (pdu, bvlpdu, xpdu, npdu, apdu, ack)
+
+#
+#   object_size
+#
+
+def object_size(obj):
+    """Return the size of an object and its instance dictionary if it has one."""
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+#
+#   pdu_memory_benchmark
+#
+
+@bacpypes_debugging
+def pdu_memory_benchmark(count):
+    if _debug: pdu_memory_benchmark._debug("pdu_memory_benchmark %r", count)
+
+    data = build_datagram()
+    print("ReadProperty-ACK, %d octets, %d packets" % (len(data), count))
+
+    # the pieces of one packet
+    pdu, bvlpdu, xpdu, npdu, apdu, ack = decode_packet(data, 0)
+    tag_list = ack.propertyValue.tagList
+
+    print("")
+    for label, obj in (
+            ("Address", pdu.pduSource),
+            ("Tag", tag_list[0]),
+            ("TagList", tag_list),
+            ("PDU", pdu),
+            ("BVLPDU", bvlpdu),
+            ("NPDU", npdu),
+            ("APDU", apdu),
+            ("ReadPropertyACK", ack),
+            ):
+        print("%-16s %6d bytes %s" % (label, object_size(obj), "(dict)" if hasattr(obj, '__dict__') else ""))
+    print("")
+
+    # objects tracked by the garbage collector
+    gc.collect()
+    gc_objects = len(gc.get_objects())
+
+    if tracemalloc:
+        tracemalloc.start()
+        snapshot = tracemalloc.take_snapshot()
+
+    # decode everything and keep it
+    packets = [decode_packet(data, i) for i in range(count)]
+
+    if tracemalloc:
+        stats = tracemalloc.take_snapshot().compare_to(snapshot, 'filename')
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        size = sum(stat.size_diff for stat in stats)
+        allocations = sum(stat.count_diff for stat in stats)
+        print("%-24s %10.1f bytes" % ("memory/packet", size / float(count)))
+        print("%-24s %10.1f" % ("allocations/packet", allocations / float(count)))
+        print("%-24s %10.1f bytes" % ("peak/packet", peak / float(count)))
+    else:
+        print("tracemalloc not available")
+
+    gc.collect()
+    print("%-24s %10.1f" % ("gc objects/packet", (len(gc.get_objects()) - gc_objects) / float(count)))
+
+    # check the result
+    assert len(packets) == count
+
+#
+#   __main__
+#
+
+def main():
+    # parse the command line arguments
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=COUNT,
+        help="number of packets to decode, default %d" % (COUNT,),
+        )
+    args = parser.parse_args()
+
+    if _debug: _log.debug("initialization")
+    if _debug: _log.debug("    - args: %r", args)
+
+    pdu_memory_benchmark(args.count)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+
+"""
+Router Forwarding Benchmark
+
+This application builds the network layer of a router between two BACnet/IP
+networks like the IP2IPRouter sample, along with a path to a third network
+through another router, then passes application layer messages from the
+first network up through the adapter as if they were received, reporting
+the packets per second.  The "decode" rows are the messages decoded and
+given to process_npdu(), the "forward" rows are the messages given to the
+adapter which changes the header of the encoded message when it can.
+"""
+
+from time import time as _time
+
+from bacpypes.debugging import bacpypes_debugging, ModuleLogger, xtob
+from bacpypes.consolelogging import ArgumentParser
+
+from bacpypes.comm import Server
+from bacpypes.pdu import Address, PDU
+from bacpypes.npdu import NPDU
+from bacpypes.netservice import NetworkServiceAccessPoint, NetworkServiceElement
+from bacpypes.comm import bind
+
+# some debugging
+_debug = 0
+_log = ModuleLogger(globals())
+
+# settings
+COUNT = 20000
+
+# a confirmed ReadProperty request for the present value of an analog value
+READ_PROPERTY = '02 05 01 0c 0c 00 80 00 01 19 55'
+
+#
+#   Sink
+#
+
+@bacpypes_debugging
+class Sink(Server):
+
+    """Count the messages sent to a network."""
+
+    def __init__(self):
+        if _debug: Sink._debug("__init__")
+        Server.__init__(self)
+
+        self.count = 0
+
+    def indication(self, pdu):
+        self.count += 1
+
+#
+#   build_router
+#
+
+@bacpypes_debugging
+def build_router():
+    if _debug: build_router._debug("build_router")
+
+    nsap = NetworkServiceAccessPoint()
+    nse = NetworkServiceElement()
+    bind(nse, nsap)
+
+    sinks = {}
+    for net, address in ((1, Address("192.168.1.2:47808")), (2, None)):
+        sinks[net] = Sink()
+        nsap.bind(sinks[net], net, address)
+
+    # network 3 is on the other side of a router on network 2
+    nsap.add_router_references(2, Address("192.168.2.3:47808"), [3])
+
+    return nsap, sinks
+
+#
+#   timed
+#
+
+def timed(label, count, fn, pdus):
+    start = _time()
+    for pdu in pdus:
+        fn(pdu)
+    elapsed = _time() - start
+    print("%-20s %10.3fs %10.2fus/msg %10.0f pps" % (label, elapsed, elapsed * 1000000.0 / count, count / max(elapsed, 0.000001)))
+
+#
+#   router_forwarding_benchmark
+#
+
+@bacpypes_debugging
+def router_forwarding_benchmark(count):
+    if _debug: router_forwarding_benchmark._debug("router_forwarding_benchmark %r", count)
+
+    nsap, sinks = build_router()
+    adapter = nsap.adapters[1]
+
+    def decode(pdu):
+        npdu = NPDU(user_data=pdu.pduUserData)
+        npdu.decode(pdu)
+        nsap.process_npdu(adapter, npdu)
+
+    print("ReadProperty request, %d messages" % (count,))
+
+    for label, dnet_dlen_dadr in (
+            ("last leg", '0002 06 c0a80214bac0'),
+            ("next router", '0003 06 c0a80314bac0'),
+            ):
+        data = xtob('01.24' + dnet_dlen_dadr + 'ff' + READ_PROPERTY)
+        source = Address("192.168.1.10:47808")
+
+        for fn_label, fn in (("decode", decode), ("forward", adapter.confirmation)):
+            pdus = [PDU(data, source=source) for i in range(count)]
+            timed("%s %s" % (fn_label, label), count, fn, pdus)
+
+    # check the result
+    assert sinks[2].count == 4 * count
+
+#
+#   __main__
+#
+
+def main():
+    # parse the command line arguments
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=COUNT,
+        help="number of messages to forward, default %d" % (COUNT,),
+        )
+    args = parser.parse_args()
+
+    if _debug: _log.debug("initialization")
+    if _debug: _log.debug("    - args: %r", args)
+
+    router_forwarding_benchmark(args.count)
+
+if __name__ == "__main__":
+    main()
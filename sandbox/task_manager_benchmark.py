@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+
+"""
+Task Manager Benchmark
+
+This application installs a large number of one-shot tasks in the task
+manager, then reschedules, suspends, and drains them, reporting the time
+for each step.  The same reschedule and suspend operations are run for a
+sample of the tasks using the old "scan the list and heapify" algorithm and
+the results are scaled up for comparison.  With --tick the task manager
+holds the tasks in a timing wheel with that tick.
+"""
+
+import random
+from time import time as _time
+from heapq import heapify, heappush
+
+from bacpypes.debugging import bacpypes_debugging, ModuleLogger
+from bacpypes.consolelogging import ArgumentParser
+
+from bacpypes.task import OneShotTask, TaskManager, TimingWheel
+
+# some debugging
+_debug = 0
+_log = ModuleLogger(globals())
+
+# settings
+COUNT = 100000
+SAMPLE = 200
+
+#
+#   NullTask
+#
+
+class NullTask(OneShotTask):
+
+    def process_task(self):
+        pass
+
+#
+#   linear_suspend
+#
+
+def linear_suspend(tasks, task):
+    """This is how the task manager used to suspend a task."""
+    for i, (when, curtask) in enumerate(tasks):
+        if task is curtask:
+            del tasks[i]
+            heapify(tasks)
+            break
+
+#
+#   timed
+#
+
+def timed(label, count, fn, *args):
+    start = _time()
+    fn(*args)
+    elapsed = _time() - start
+    print("%-28s %8d ops %10.3fs %10.2fus/op" % (label, count, elapsed, elapsed * 1000000.0 / count))
+    return elapsed
+
+#
+#   task_manager_benchmark
+#
+
+@bacpypes_debugging
+def task_manager_benchmark(count, sample, tick):
+    if _debug: task_manager_benchmark._debug("task_manager_benchmark %r %r %r", count, sample, tick)
+
+    # there is only one task manager
+    if tick:
+        task_manager = TaskManager(wheel=TimingWheel(tick))
+    else:
+        task_manager = TaskManager()
+
+    # build the tasks and some times, well into the future
+    now = _time() + 3600.0
+    tasks = [NullTask() for i in range(count)]
+    times = [now + random.random() * 3600.0 for i in range(count)]
+    new_times = [now + random.random() * 3600.0 for i in range(count)]
+
+    def install():
+        for task, when in zip(tasks, times):
+            task.taskTime = when
+            task_manager.install_task(task)
+
+    def reschedule():
+        for task, when in zip(tasks, new_times):
+            task.taskTime = when
+            task_manager.install_task(task)
+
+    def suspend():
+        for task in tasks:
+            task_manager.suspend_task(task)
+
+    def drain():
+        for task in tasks:
+            task.taskTime = 0.0
+            task_manager.install_task(task)
+        while task_manager.peek_task():
+            task_manager.pop_task()
+
+    if tick:
+        print("task manager, %d tasks, %rs timing wheel" % (count, tick))
+    else:
+        print("task manager, %d tasks" % (count,))
+    timed("install", count, install)
+    new_reschedule = timed("reschedule", count, reschedule)
+    new_suspend = timed("suspend", count, suspend)
+    timed("install and drain", count, drain)
+    print("")
+
+    # now the old way, with a heap of the same size
+    legacy = [(when, task) for when, task in zip(times, tasks)]
+    heapify(legacy)
+    sampled = random.sample(tasks, sample)
+
+    def legacy_reschedule():
+        for task in sampled:
+            linear_suspend(legacy, task)
+            heappush(legacy, (task.taskTime, task))
+
+    def legacy_suspend():
+        for task in sampled:
+            linear_suspend(legacy, task)
+
+    print("linear scan, %d tasks, %d sampled" % (count, sample))
+    old_reschedule = timed("reschedule", sample, legacy_reschedule) * count / sample
+    old_suspend = timed("suspend", sample, legacy_suspend) * count / sample
+    print("")
+
+    print("estimated for %d tasks" % (count,))
+    print("%-28s %10.3fs vs %10.3fs (%.0fx)" % ("reschedule", old_reschedule, new_reschedule, old_reschedule / max(new_reschedule, 0.000001)))
+    print("%-28s %10.3fs vs %10.3fs (%.0fx)" % ("suspend", old_suspend, new_suspend, old_suspend / max(new_suspend, 0.000001)))
+
+#
+#   __main__
+#
+
+def main():
+    # parse the command line arguments
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=COUNT,
+        help="number of tasks, default %d" % (COUNT,),
+        )
+    parser.add_argument("--sample", type=int, default=SAMPLE,
+        help="number of operations for the linear scan, default %d" % (SAMPLE,),
+        )
+    parser.add_argument("--tick", type=float, default=None,
+        help="use a timing wheel with this tick",
+        )
+    args = parser.parse_args()
+
+    if _debug: _log.debug("initialization")
+    if _debug: _log.debug("    - args: %r", args)
+
+    task_manager_benchmark(args.count, args.sample, args.tick)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+
+"""
+Transaction Table Benchmark
+
+This application starts a large number of outstanding client transactions
+in a state machine access point, spread across a number of devices, then
+acks them all in a random order, reporting the time for each step.  The
+lookups are also run for a sample of the acks using the old "scan the list
+of transactions" algorithm and the results are scaled up for comparison.
+"""
+
+import random
+from time import time as _time
+
+from bacpypes.debugging import bacpypes_debugging, ModuleLogger
+from bacpypes.consolelogging import ArgumentParser
+
+from bacpypes.comm import Server, ApplicationServiceElement, bind
+from bacpypes.task import TaskManager
+from bacpypes.pdu import Address
+from bacpypes.apdu import APDU, ConfirmedRequestPDU, SimpleAckPDU
+
+from bacpypes.app import DeviceInfoCache
+from bacpypes.appservice import StateMachineAccessPoint
+
+# some debugging
+_debug = 0
+_log = ModuleLogger(globals())
+
+# settings
+COUNT = 5000
+DEVICES = 100
+SAMPLE = 500
+
+#
+#   Sink
+#
+
+class Sink(Server):
+
+    def __init__(self):
+        Server.__init__(self)
+        self.count = 0
+
+    def indication(self, pdu):
+        self.count += 1
+
+#
+#   Application
+#
+
+class Application(ApplicationServiceElement):
+
+    def __init__(self):
+        ApplicationServiceElement.__init__(self)
+        self.count = 0
+
+    def confirmation(self, apdu):
+        self.count += 1
+
+#
+#   linear_find
+#
+
+def linear_find(transactions, invokeID, addr):
+    """This is how the state machine access point used to find a
+    transaction."""
+    for tr in transactions:
+        if (invokeID == tr.invokeID) and (addr == tr.remoteDevice.address):
+            return tr
+    return None
+
+#
+#   timed
+#
+
+def timed(label, count, fn, *args):
+    start = _time()
+    fn(*args)
+    elapsed = _time() - start
+    print("%-28s %8d ops %10.3fs %10.2fus/op" % (label, count, elapsed, elapsed * 1000000.0 / count))
+    return elapsed
+
+#
+#   transaction_table_benchmark
+#
+
+@bacpypes_debugging
+def transaction_table_benchmark(count, devices, sample):
+    if _debug: transaction_table_benchmark._debug("transaction_table_benchmark %r %r %r", count, devices, sample)
+
+    # the transactions have timers
+    TaskManager()
+
+    smap = StateMachineAccessPoint(deviceInfoCache=DeviceInfoCache())
+    sink = Sink()
+    app = Application()
+    bind(smap, sink)
+    bind(app, smap)
+
+    addresses = [Address(i + 1) for i in range(devices)]
+
+    # the requests, spread across the devices
+    requests = []
+    for i in range(count):
+        apdu = ConfirmedRequestPDU(12, destination=addresses[i % devices])
+        apdu.pduData = b'\x0c\x00\x00\x00\x01\x19\x55'
+        requests.append(apdu)
+
+    def start():
+        for apdu in requests:
+            smap.sap_indication(apdu)
+
+    print("%d client transactions, %d devices" % (count, devices))
+    timed("start", count, start)
+    assert len(smap.clientTransactions) == count
+
+    # the acks as they would come up the stack, in a random order
+    acks = []
+    for apdu in requests:
+        xpdu = APDU()
+        SimpleAckPDU(12, apdu.apduInvokeID, source=apdu.pduDestination).encode(xpdu)
+        acks.append(xpdu)
+    random.shuffle(acks)
+
+    # the old way, with a list of the same transactions
+    transactions = list(smap.clientTransactions.values())
+    sampled = random.sample(acks, min(sample, count))
+
+    def legacy_find():
+        for xpdu in sampled:
+            assert linear_find(transactions, xpdu.apduInvokeID, xpdu.pduSource)
+
+    def find():
+        for xpdu in sampled:
+            assert smap.clientTransactions.get((xpdu.pduSource, xpdu.apduInvokeID))
+
+    def ack():
+        for xpdu in acks:
+            smap.confirmation(xpdu)
+
+    old_find = timed("linear find", len(sampled), legacy_find)
+    new_find = timed("keyed find", len(sampled), find)
+    timed("ack", count, ack)
+    assert app.count == count
+    assert not smap.clientTransactions
+    print("")
+
+    print("lookup %.0fx faster with %d outstanding" % (old_find / max(new_find, 0.000001), count))
+
+#
+#   __main__
+#
+
+def main():
+    # parse the command line arguments
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=COUNT,
+        help="number of transactions, default %d" % (COUNT,),
+        )
+    parser.add_argument("--devices", type=int, default=DEVICES,
+        help="number of devices, default %d" % (DEVICES,),
+        )
+    parser.add_argument("--sample", type=int, default=SAMPLE,
+        help="number of lookups to compare, default %d" % (SAMPLE,),
+        )
+    args = parser.parse_args()
+
+    if _debug: _log.debug("initialization")
+    if _debug: _log.debug("    - args: %r", args)
+
+    transaction_table_benchmark(args.count, args.devices, args.sample)
+
+if __name__ == "__main__":
+    main()
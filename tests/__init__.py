@@ -25,6 +25,7 @@ from . import test_bvll
 from . import test_npdu
 
 from . import test_network
+from . import test_appservice
 from . import test_service
 from . import test_local
 
@@ -0,0 +1,7 @@
+#!/usr/bin/python
+
+"""
+Test BACpypes Asyncio Module
+"""
+
+from . import test_aio
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test Asyncio
+------------
+"""
+
+import unittest
+
+from bacpypes.debugging import bacpypes_debugging, ModuleLogger
+
+from bacpypes.pdu import Address
+from bacpypes.primitivedata import Real
+from bacpypes.constructeddata import Any
+from bacpypes.basetypes import ErrorType
+from bacpypes.apdu import ReadPropertyACK, Error
+from bacpypes.iocb import IOCB, ABORTED
+
+from bacpypes.app import ApplicationIOController
+
+try:
+    import asyncio
+    from bacpypes.aio import FutureBridge, RequestError, iocb_future
+except ImportError:
+    asyncio = None
+
+from ..time_machine import reset_time_machine, run_time_machine
+
+# some debugging
+_debug = 0
+_log = ModuleLogger(globals())
+
+
+@bacpypes_debugging
+class ReadApplication(ApplicationIOController):
+
+    """Answer the requests from a dictionary of values."""
+
+    def __init__(self):
+        if _debug: ReadApplication._debug("__init__")
+        ApplicationIOController.__init__(self)
+
+        self.values = {}
+
+    def request_io(self, iocb):
+        if _debug: ReadApplication._debug("request_io %r", iocb)
+
+        request = iocb.args[0]
+        value = self.values.get((request.pduDestination, request.objectIdentifier), None)
+        if value is None:
+            iocb.abort(Error(errorClass='object', errorCode='unknownObject'))
+            return
+
+        response = ReadPropertyACK(
+            objectIdentifier=request.objectIdentifier,
+            propertyIdentifier=request.propertyIdentifier,
+            propertyValue=Any(value),
+            )
+        response.pduSource = request.pduDestination
+        iocb.complete(response)
+
+
+@unittest.skipIf(asyncio is None, "asyncio not available")
+@bacpypes_debugging
+class TestFutures(unittest.TestCase):
+
+    def setUp(self):
+        reset_time_machine()
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_batch(self):
+        if _debug: TestFutures._debug("test_batch")
+
+        bridge = FutureBridge(self.loop)
+        iocbs = [IOCB() for i in range(1000)]
+        futures = [bridge.add_iocb(iocb) for iocb in iocbs]
+
+        for i, iocb in enumerate(iocbs):
+            iocb.complete(i)
+
+        # the loop is woken up once for all of them
+        assert bridge.scheduled
+        assert len(bridge.ready) == 1000
+
+        results = self.loop.run_until_complete(asyncio.gather(*futures))
+        assert results == list(range(1000))
+        assert not bridge.scheduled
+
+    def test_errors(self):
+        if _debug: TestFutures._debug("test_errors")
+
+        iocbs = [IOCB() for i in range(3)]
+        futures = [iocb_future(iocb, self.loop) for iocb in iocbs]
+
+        iocbs[0].complete(1)
+        iocbs[1].abort(ValueError("fail"))
+        iocbs[2].abort(ErrorType(errorClass='object', errorCode='unknownObject'))
+
+        results = self.loop.run_until_complete(asyncio.gather(*futures, return_exceptions=True))
+        assert results[0] == 1
+        assert isinstance(results[1], ValueError)
+        assert isinstance(results[2], RequestError)
+        assert results[2].error.errorCode == 'unknownObject'
+
+    def test_function(self):
+        if _debug: TestFutures._debug("test_function")
+
+        iocbs = [IOCB() for i in range(2)]
+        futures = [iocb_future(iocb, self.loop, lambda response: 10 // response) for iocb in iocbs]
+
+        iocbs[0].complete(2)
+        iocbs[1].complete(0)
+
+        results = self.loop.run_until_complete(asyncio.gather(*futures, return_exceptions=True))
+        assert results[0] == 5
+        assert isinstance(results[1], ZeroDivisionError)
+
+    def test_cancel(self):
+        if _debug: TestFutures._debug("test_cancel")
+
+        iocb = IOCB()
+        future = iocb_future(iocb, self.loop)
+
+        # the request is aborted when the future is cancelled
+        future.cancel()
+        self.loop.run_until_complete(asyncio.gather(future, return_exceptions=True))
+        run_time_machine(1.0)
+        assert iocb.ioState == ABORTED
+
+
+@unittest.skipIf(asyncio is None, "asyncio not available")
+@bacpypes_debugging
+class TestApplication(unittest.TestCase):
+
+    def setUp(self):
+        reset_time_machine()
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_read_property(self):
+        if _debug: TestApplication._debug("test_read_property")
+
+        app = ReadApplication()
+        futures = []
+        for i in range(100):
+            app.values[(Address("1"), ('analogValue', i))] = Real(i)
+            futures.append(app.read_property_async("1", ('analogValue', i), 'presentValue', loop=self.loop))
+
+        # nothing is sent until the core.run() thread does it
+        assert not any(future.done() for future in futures)
+        run_time_machine(1.0)
+
+        results = self.loop.run_until_complete(asyncio.gather(*futures))
+        assert results == [float(i) for i in range(100)]
+
+    def test_error(self):
+        if _debug: TestApplication._debug("test_error")
+
+        app = ReadApplication()
+        future = app.read_property_async("1", ('analogValue', 1), 'presentValue', loop=self.loop)
+        run_time_machine(1.0)
+
+        with self.assertRaises(RequestError) as context:
+            self.loop.run_until_complete(future)
+        assert context.exception.error.errorCode == 'unknownObject'
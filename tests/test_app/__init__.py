@@ -0,0 +1,7 @@
+#!/usr/bin/python
+
+"""
+Test BACpypes Application Module
+"""
+
+from . import test_device_info
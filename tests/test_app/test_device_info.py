@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test Device Information Cache
+-----------------------------
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from bacpypes.debugging import bacpypes_debugging, ModuleLogger
+
+from bacpypes.pdu import Address
+from bacpypes.apdu import IAmRequest
+
+from bacpypes.app import DeviceInfoCache, PersistentDeviceInfoCache
+
+from ..time_machine import reset_time_machine, run_time_machine
+
+# some debugging
+_debug = 0
+_log = ModuleLogger(globals())
+
+
+def i_am(instance, address, max_apdu=1476, segmentation='segmentedBoth'):
+    """Build an I-Am from a device."""
+    apdu = IAmRequest(
+        iAmDeviceIdentifier=('device', instance),
+        maxAPDULengthAccepted=max_apdu,
+        segmentationSupported=segmentation,
+        vendorID=15,
+        )
+    apdu.pduSource = Address(address)
+    return apdu
+
+
+@bacpypes_debugging
+class TestDeviceInfoCache(unittest.TestCase):
+
+    def setUp(self):
+        reset_time_machine()
+
+    def test_counters(self):
+        if _debug: TestDeviceInfoCache._debug("test_counters")
+
+        cache = DeviceInfoCache()
+        info = cache.get_device_info(Address("1"))
+        assert cache.peek_device_info(Address("1")) is info
+        assert cache.peek_device_info(Address("2")) is None
+
+        assert (cache.hits, cache.misses, cache.evictions) == (1, 2, 0)
+        assert cache.size == 1
+
+        # gone when the transaction is finished with it
+        cache.release_device_info(info)
+        assert cache.size == 0
+
+    def test_max_size(self):
+        if _debug: TestDeviceInfoCache._debug("test_max_size")
+
+        cache = DeviceInfoCache(max_size=10)
+        for i in range(5):
+            cache.add_device_info(i_am(i + 1, str(i + 1)))
+            run_time_machine(1.0)
+
+        # the first one is still used, the second one is not
+        for i in range(1, 21):
+            cache.peek_device_info(Address("1"))
+            cache.add_device_info(i_am(i + 10, str(i + 10)))
+            run_time_machine(1.0)
+
+        assert cache.size <= 10
+        assert cache.evictions >= 15
+        assert cache.has_device_info(Address("1"))
+        assert cache.has_device_info(1)
+        assert not cache.has_device_info(Address("2"))
+        assert not cache.has_device_info(2)
+        assert cache.has_device_info(Address("30"))
+
+    def test_in_use(self):
+        if _debug: TestDeviceInfoCache._debug("test_in_use")
+
+        cache = DeviceInfoCache(max_size=10)
+
+        # a transaction is using it
+        info = cache.get_device_info(Address("1"))
+        run_time_machine(1.0)
+        for i in range(20):
+            cache.add_device_info(i_am(i + 10, str(i + 10)))
+            run_time_machine(1.0)
+
+        assert cache.peek_device_info(Address("1")) is info
+        cache.release_device_info(info)
+        assert not cache.has_device_info(Address("1"))
+
+    def test_ttl(self):
+        if _debug: TestDeviceInfoCache._debug("test_ttl")
+
+        cache = DeviceInfoCache(ttl=60.0)
+        cache.add_device_info(i_am(1, "1"))
+        cache.add_device_info(i_am(2, "2"))
+        info = cache.get_device_info(Address("3"))
+
+        # still used
+        run_time_machine(50.0)
+        assert cache.peek_device_info(1)
+        run_time_machine(50.0)
+        assert cache.peek_device_info(Address("1"))
+
+        # not used long enough
+        assert cache.peek_device_info(Address("2")) is None
+        assert not cache.has_device_info(2)
+
+        # the others are expired when records are added
+        run_time_machine(100.0)
+        cache.get_device_info(Address("4"))
+        assert not cache.has_device_info(Address("1"))
+        assert cache.peek_device_info(Address("3")) is info
+        assert cache.evictions == 2
+
+
+@bacpypes_debugging
+class TestPersistentDeviceInfoCache(unittest.TestCase):
+
+    def setUp(self):
+        reset_time_machine()
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "devices.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def saved_addresses(self):
+        connection = sqlite3.connect(self.filename)
+        try:
+            return sorted(row[0] for row in connection.execute("select address from device_info"))
+        finally:
+            connection.close()
+
+    def test_warm_start(self):
+        if _debug: TestPersistentDeviceInfoCache._debug("test_warm_start")
+
+        cache = PersistentDeviceInfoCache(self.filename)
+        cache.add_device_info(i_am(100, "192.168.0.10"))
+        cache.add_device_info(i_am(101, "2:7", max_apdu=480, segmentation='noSegmentation'))
+
+        # written later
+        run_time_machine(1.0)
+        assert self.saved_addresses() == []
+        run_time_machine(5.0)
+        assert self.saved_addresses() == ["192.168.0.10", "2:7"]
+        cache.close()
+
+        # a new cache knows about them
+        cache = PersistentDeviceInfoCache(self.filename)
+        info = cache.peek_device_info(Address("192.168.0.10"))
+        assert info is cache.peek_device_info(100)
+        assert info.deviceIdentifier == 100
+        assert info.maxApduLengthAccepted == 1476
+        assert info.segmentationSupported == 'segmentedBoth'
+        assert info.vendorID == 15
+
+        info = cache.peek_device_info(Address("2:7"))
+        assert info.maxApduLengthAccepted == 480
+        assert info.segmentationSupported == 'noSegmentation'
+
+        # they stay when the transactions are done with them
+        info = cache.get_device_info(Address("2:7"))
+        cache.release_device_info(info)
+        assert cache.has_device_info(Address("2:7"))
+        cache.close()
+
+    def test_batch(self):
+        if _debug: TestPersistentDeviceInfoCache._debug("test_batch")
+
+        cache = PersistentDeviceInfoCache(self.filename, flush_interval=1.0)
+        for i in range(100):
+            cache.add_device_info(i_am(i + 1, str(i + 1)))
+
+        # written together
+        assert len(cache.dirty) == 100
+        run_time_machine(2.0)
+        assert not cache.dirty
+        assert len(self.saved_addresses()) == 100
+        cache.close()
+
+    def test_moved(self):
+        if _debug: TestPersistentDeviceInfoCache._debug("test_moved")
+
+        cache = PersistentDeviceInfoCache(self.filename)
+        cache.add_device_info(i_am(100, "192.168.0.10"))
+        cache.flush()
+
+        # the device has a new address
+        cache.add_device_info(i_am(100, "192.168.0.11"))
+        cache.close()
+        assert self.saved_addresses() == ["192.168.0.11"]
+
+        cache = PersistentDeviceInfoCache(self.filename)
+        assert not cache.has_device_info(Address("192.168.0.10"))
+        assert cache.peek_device_info(100).address == Address("192.168.0.11")
+        cache.close()
+
+    def test_request_source(self):
+        if _debug: TestPersistentDeviceInfoCache._debug("test_request_source")
+
+        # a record made for the source of a request is not saved
+        cache = PersistentDeviceInfoCache(self.filename)
+        info = cache.get_device_info(Address("10.0.0.99"))
+        info.maxApduLengthAccepted = 480
+        cache.update_device_info(info)
+        cache.release_device_info(info)
+        assert not cache.dirty
+        cache.close()
+        assert self.saved_addresses() == []
+
+        # and it does not come back
+        cache = PersistentDeviceInfoCache(self.filename)
+        assert not cache.has_device_info(Address("10.0.0.99"))
+        cache.close()
+
+    def test_evicted(self):
+        if _debug: TestPersistentDeviceInfoCache._debug("test_evicted")
+
+        cache = PersistentDeviceInfoCache(self.filename)
+        for i in range(20):
+            cache.add_device_info(i_am(i + 1, str(i + 1), max_apdu=480))
+        cache.close()
+
+        # records trimmed after loading are read back when they are needed
+        cache = PersistentDeviceInfoCache(self.filename, max_size=10)
+        evicted = [i + 1 for i in range(20) if not cache.has_device_info(i + 1)]
+        assert len(evicted) >= 10
+
+        info = cache.get_device_info(Address(str(evicted[0])))
+        assert info.deviceIdentifier == evicted[0]
+        assert info.maxApduLengthAccepted == 480
+        assert cache.peek_device_info(evicted[0]) is info
+
+        # stays when the transaction is done with it
+        cache.release_device_info(info)
+        assert cache.has_device_info(Address(str(evicted[0])))
+
+        # and by device identifier
+        info = cache.get_device_info(evicted[1])
+        assert info.address == Address(str(evicted[1]))
+        assert cache.size <= 10
+        cache.close()
+
+    def test_evicted_dirty(self):
+        if _debug: TestPersistentDeviceInfoCache._debug("test_evicted_dirty")
+
+        # records evicted before they are written are still found
+        cache = PersistentDeviceInfoCache(self.filename, max_size=10)
+        for i in range(20):
+            cache.add_device_info(i_am(i + 1, str(i + 1)))
+        evicted = [i + 1 for i in range(20) if not cache.has_device_info(i + 1)]
+        assert evicted
+
+        info = cache.get_device_info(evicted[0])
+        assert info.address == Address(str(evicted[0]))
+        assert cache.peek_device_info(Address(str(evicted[0]))) is info
+        cache.close()
+
+    def test_max_size(self):
+        if _debug: TestPersistentDeviceInfoCache._debug("test_max_size")
+
+        cache = PersistentDeviceInfoCache(self.filename)
+        for i in range(20):
+            cache.add_device_info(i_am(i + 1, str(i + 1)))
+        cache.close()
+
+        # the rest are still saved
+        cache = PersistentDeviceInfoCache(self.filename, max_size=10)
+        assert cache.size <= 10
+        cache.close()
+        assert len(self.saved_addresses()) == 20
@@ -0,0 +1,8 @@
+#!/usr/bin/python
+
+"""
+Test BACpypes Application Service Module
+"""
+
+from . import test_transactions
+from . import test_retry_timeout
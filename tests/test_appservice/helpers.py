@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+"""
+Application Service Helper Classes
+"""
+
+from bacpypes.debugging import bacpypes_debugging, ModuleLogger, xtob
+
+from bacpypes.comm import Server, ApplicationServiceElement, bind
+from bacpypes.apdu import APDU, ConfirmedRequestPDU
+
+from bacpypes.app import DeviceInfoCache
+from bacpypes.appservice import StateMachineAccessPoint
+
+from ..time_machine import reset_time_machine
+
+# some debugging
+_debug = 0
+_log = ModuleLogger(globals())
+
+
+@bacpypes_debugging
+class Downstream(Server):
+
+    """Collect the PDUs the state machine access point sends down."""
+
+    def __init__(self):
+        Server.__init__(self)
+        self.pdus = []
+
+    def indication(self, pdu):
+        if _debug: Downstream._debug("indication %r", pdu)
+        self.pdus.append(pdu)
+
+
+@bacpypes_debugging
+class Upstream(ApplicationServiceElement):
+
+    """Collect the PDUs the state machine access point sends up."""
+
+    def __init__(self):
+        ApplicationServiceElement.__init__(self)
+        self.pdus = []
+
+    def indication(self, apdu):
+        if _debug: Upstream._debug("indication %r", apdu)
+        self.pdus.append(apdu)
+
+    def confirmation(self, apdu):
+        if _debug: Upstream._debug("confirmation %r", apdu)
+        self.pdus.append(apdu)
+
+
+def build_stack():
+    """Return a state machine access point with collectors bound above and
+    below it."""
+    reset_time_machine()
+
+    smap = StateMachineAccessPoint(deviceInfoCache=DeviceInfoCache())
+    downstream = Downstream()
+    upstream = Upstream()
+    bind(smap, downstream)
+    bind(upstream, smap)
+
+    return smap, downstream, upstream
+
+def confirmed_request(invokeID=None, **kwargs):
+    """Return a confirmed ReadProperty request."""
+    apdu = ConfirmedRequestPDU(12, **kwargs)
+    apdu.apduInvokeID = invokeID
+    apdu.pduData = xtob('0c0000000119')
+    return apdu
+
+def received(apdu):
+    """Return an APDU as it would come up the stack."""
+    xpdu = APDU()
+    apdu.encode(xpdu)
+    return xpdu
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test Retry Timeout
+------------------
+"""
+
+import unittest
+
+from bacpypes.debugging import bacpypes_debugging, ModuleLogger
+
+from bacpypes.pdu import Address
+from bacpypes.apdu import SimpleAckPDU, AbortPDU
+
+from .helpers import build_stack, confirmed_request, received
+from ..time_machine import run_time_machine
+
+# some debugging
+_debug = 0
+_log = ModuleLogger(globals())
+
+
+def build_device(smap, addr):
+    """Return the device information for an address, the reference keeps it
+    in the cache between transactions."""
+    return smap.deviceInfoCache.get_device_info(addr)
+
+def round_trip(smap, addr, seconds):
+    """Send a request and ack it after some time."""
+    smap.sap_indication(confirmed_request(destination=addr))
+    invokeID = list(smap.clientTransactions)[-1][1]
+
+    run_time_machine(seconds)
+    smap.confirmation(received(SimpleAckPDU(12, invokeID, source=addr)))
+
+
+@bacpypes_debugging
+class TestRetryTimeout(unittest.TestCase):
+
+    def test_estimate(self):
+        if _debug: TestRetryTimeout._debug("test_estimate")
+
+        smap, downstream, upstream = build_stack()
+        device_info = build_device(smap, Address(2))
+
+        # nothing known yet
+        assert device_info.retryTimeout is None
+        assert smap.get_retry_timeout(device_info) == 3000
+
+        # first sample
+        round_trip(smap, Address(2), 0.2)
+        self.assertAlmostEqual(device_info.smoothedRoundTripTime, 200.0)
+        self.assertAlmostEqual(device_info.roundTripTimeVariance, 100.0)
+        self.assertAlmostEqual(device_info.retryTimeout, 600.0)
+
+        # second sample
+        round_trip(smap, Address(2), 0.6)
+        self.assertAlmostEqual(device_info.smoothedRoundTripTime, 250.0)
+        self.assertAlmostEqual(device_info.roundTripTimeVariance, 175.0)
+        self.assertAlmostEqual(device_info.retryTimeout, 950.0)
+
+        # fast devices are bounded
+        device_info = build_device(smap, Address(3))
+        round_trip(smap, Address(3), 0.01)
+        assert device_info.retryTimeout == smap.minRetryTimeout
+
+        # so are slow ones
+        smap.maxRetryTimeout = 5000
+        device_info = build_device(smap, Address(4))
+        round_trip(smap, Address(4), 2.0)
+        assert device_info.retryTimeout == smap.maxRetryTimeout
+
+    def test_slow_device(self):
+        if _debug: TestRetryTimeout._debug("test_slow_device")
+
+        smap, downstream, upstream = build_stack()
+        device_info = build_device(smap, Address(2))
+        round_trip(smap, Address(2), 2.0)
+        self.assertAlmostEqual(device_info.retryTimeout, 6000.0)
+
+        # a slow response doesn't cause a retry
+        round_trip(smap, Address(2), 4.0)
+        assert len(downstream.pdus) == 2
+        assert len(upstream.pdus) == 2
+
+    def test_backoff(self):
+        if _debug: TestRetryTimeout._debug("test_backoff")
+
+        smap, downstream, upstream = build_stack()
+        device_info = build_device(smap, Address(2))
+
+        # the request is sent again, each time waiting twice as long
+        smap.sap_indication(confirmed_request(destination=Address(2)))
+        run_time_machine(3.5)
+        assert len(downstream.pdus) == 2
+        assert device_info.retryTimeout == 6000
+
+        # a response to a request that was sent again isn't a sample
+        invokeID = downstream.pdus[0].apduInvokeID
+        smap.confirmation(received(SimpleAckPDU(12, invokeID, source=Address(2))))
+        assert device_info.smoothedRoundTripTime is None
+        assert device_info.retryTimeout == 6000
+
+    def test_no_response(self):
+        if _debug: TestRetryTimeout._debug("test_no_response")
+
+        smap, downstream, upstream = build_stack()
+        device_info = build_device(smap, Address(2))
+        round_trip(smap, Address(2), 0.2)
+        del downstream.pdus[:], upstream.pdus[:]
+
+        # tries three times, 0.6 + 1.2 + 2.4 seconds
+        smap.sap_indication(confirmed_request(destination=Address(2)))
+        run_time_machine(4.3)
+        assert len(downstream.pdus) == 3
+        assert len(upstream.pdus) == 1
+        assert isinstance(upstream.pdus[0], AbortPDU)
+
+        # back to the estimate
+        assert device_info.noResponseCount == 1
+        self.assertAlmostEqual(device_info.retryTimeout, 600.0)
+
+        # then fails fast, one try
+        smap.sap_indication(confirmed_request(destination=Address(2)))
+        run_time_machine(0.7)
+        assert len(downstream.pdus) == 4
+        assert len(upstream.pdus) == 2
+
+        # until it responds again
+        round_trip(smap, Address(2), 0.2)
+        assert device_info.noResponseCount == 0
+
+    def test_fixed(self):
+        if _debug: TestRetryTimeout._debug("test_fixed")
+
+        smap, downstream, upstream = build_stack()
+        smap.adaptiveRetryTimeout = False
+        device_info = build_device(smap, Address(2))
+        round_trip(smap, Address(2), 0.2)
+        del downstream.pdus[:], upstream.pdus[:]
+
+        # tries three times, three seconds each
+        smap.sap_indication(confirmed_request(destination=Address(2)))
+        run_time_machine(8.9)
+        assert len(downstream.pdus) == 3
+        assert not upstream.pdus
+        run_time_machine(0.2)
+        assert len(upstream.pdus) == 1
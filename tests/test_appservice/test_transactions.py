@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test Transaction Tables
+-----------------------
+"""
+
+import unittest
+
+from bacpypes.debugging import bacpypes_debugging, ModuleLogger
+
+from bacpypes.pdu import Address
+from bacpypes.apdu import SimpleAckPDU
+
+from .helpers import build_stack, confirmed_request, received
+
+# some debugging
+_debug = 0
+_log = ModuleLogger(globals())
+
+
+@bacpypes_debugging
+class TestClientTransactions(unittest.TestCase):
+
+    def test_ack(self):
+        if _debug: TestClientTransactions._debug("test_ack")
+
+        smap, downstream, upstream = build_stack()
+
+        # start a transaction
+        smap.sap_indication(confirmed_request(destination=Address(2)))
+        assert len(downstream.pdus) == 1
+        invokeID = downstream.pdus[0].apduInvokeID
+        assert list(smap.clientTransactions) == [(Address(2), invokeID)]
+
+        # an ack from some other device is ignored
+        smap.confirmation(received(SimpleAckPDU(12, invokeID, source=Address(3))))
+        assert not upstream.pdus
+        assert len(smap.clientTransactions) == 1
+
+        # the ack completes the transaction
+        smap.confirmation(received(SimpleAckPDU(12, invokeID, source=Address(2))))
+        assert len(upstream.pdus) == 1
+        assert isinstance(upstream.pdus[0], SimpleAckPDU)
+        assert not smap.clientTransactions
+
+    def test_invoke_id(self):
+        if _debug: TestClientTransactions._debug("test_invoke_id")
+
+        smap, downstream, upstream = build_stack()
+
+        # invoke ID explicitly set
+        smap.sap_indication(confirmed_request(5, destination=Address(2)))
+        assert (Address(2), 5) in smap.clientTransactions
+
+        # the same one to the same device is in use
+        with self.assertRaises(RuntimeError):
+            smap.sap_indication(confirmed_request(5, destination=Address(2)))
+
+        # fine for a different device
+        smap.sap_indication(confirmed_request(5, destination=Address(3)))
+        assert (Address(3), 5) in smap.clientTransactions
+
+        # generated ones skip it
+        smap.nextInvokeID[Address(2)] = 5
+        assert smap.get_next_invoke_id(Address(2)) == 6
+        assert smap.get_next_invoke_id(Address(2)) == 7
+
+    def test_invoke_id_per_device(self):
+        if _debug: TestClientTransactions._debug("test_invoke_id_per_device")
+
+        smap, downstream, upstream = build_stack()
+
+        # each device has its own sequence
+        for addr in (Address(2), Address(3), Address(2), Address(3)):
+            smap.sap_indication(confirmed_request(destination=addr))
+        assert set(smap.clientTransactions) == set([
+            (Address(2), 1), (Address(2), 2), (Address(3), 1), (Address(3), 2),
+            ])
+
+        # the sequence wraps around
+        smap.nextInvokeID[Address(4)] = 255
+        assert smap.get_next_invoke_id(Address(4)) == 255
+        assert smap.get_next_invoke_id(Address(4)) == 0
+
+    def test_many(self):
+        if _debug: TestClientTransactions._debug("test_many")
+
+        smap, downstream, upstream = build_stack()
+
+        # use all of the invoke ID's for a few devices
+        for addr in range(2, 5):
+            for i in range(256):
+                smap.sap_indication(confirmed_request(destination=Address(addr)))
+        assert len(smap.clientTransactions) == 256 * 3
+
+        # none left for them, but fine for another device
+        for addr in range(2, 5):
+            with self.assertRaises(RuntimeError):
+                smap.get_next_invoke_id(Address(addr))
+        assert smap.get_next_invoke_id(Address(5)) == 1
+
+        # ack them in reverse order
+        for apdu in reversed(downstream.pdus):
+            smap.confirmation(received(SimpleAckPDU(12, apdu.apduInvokeID, source=apdu.pduDestination)))
+        assert len(upstream.pdus) == 256 * 3
+        assert not smap.clientTransactions
+
+    def test_invoke_id_sequence(self):
+        if _debug: TestClientTransactions._debug("test_invoke_id_sequence")
+
+        smap, downstream, upstream = build_stack()
+
+        # back-to-back requests to a device get different invoke IDs
+        for i in range(4):
+            smap.sap_indication(confirmed_request(destination=Address(2)))
+            apdu = downstream.pdus[-1]
+            smap.confirmation(received(SimpleAckPDU(12, apdu.apduInvokeID, source=Address(2))))
+            assert not smap.clientTransactions
+        assert [apdu.apduInvokeID for apdu in downstream.pdus] == [1, 2, 3, 4]
+        assert not smap.clientTransactionCount
+
+    def test_max_devices(self):
+        if _debug: TestClientTransactions._debug("test_max_devices")
+
+        smap, downstream, upstream = build_stack()
+        smap.maxInvokeIDDevices = 10
+
+        # a device with a transaction
+        smap.sap_indication(confirmed_request(destination=Address(2)))
+
+        # requests to other devices that are finished
+        for addr in range(3, 30):
+            smap.sap_indication(confirmed_request(destination=Address(addr)))
+            smap.confirmation(received(SimpleAckPDU(12, 1, source=Address(addr))))
+
+        # the oldest idle devices are forgotten, the busy one is not
+        assert len(smap.nextInvokeID) <= 10
+        assert Address(2) in smap.nextInvokeID
+        assert Address(29) in smap.nextInvokeID
+        assert Address(3) not in smap.nextInvokeID
+
+
+@bacpypes_debugging
+class TestServerTransactions(unittest.TestCase):
+
+    def test_response(self):
+        if _debug: TestServerTransactions._debug("test_response")
+
+        smap, downstream, upstream = build_stack()
+
+        # a request comes in
+        smap.confirmation(received(confirmed_request(7, source=Address(2))))
+        assert len(upstream.pdus) == 1
+        assert list(smap.serverTransactions) == [(Address(2), 7)]
+
+        # the same invoke ID from another device is another transaction
+        smap.confirmation(received(confirmed_request(7, source=Address(3))))
+        assert len(upstream.pdus) == 2
+        assert len(smap.serverTransactions) == 2
+
+        # a duplicate goes to the existing transaction
+        smap.confirmation(received(confirmed_request(7, source=Address(2))))
+        assert len(smap.serverTransactions) == 2
+
+        # a response for an unknown transaction is dropped
+        smap.sap_confirmation(SimpleAckPDU(12, 8, destination=Address(2)))
+        assert not downstream.pdus
+
+        # the response completes it
+        smap.sap_confirmation(SimpleAckPDU(12, 7, destination=Address(2)))
+        assert len(downstream.pdus) == 1
+        assert list(smap.serverTransactions) == [(Address(3), 7)]
@@ -1 +1,99 @@
-# placeholder
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+BACpypes PDUData Testing
+------------------------
+"""
+
+import unittest
+
+from bacpypes.debugging import bacpypes_debugging, ModuleLogger, xtob
+
+from bacpypes.errors import DecodingError
+from bacpypes.comm import PDUData
+
+# some debugging
+_debug = 0
+_log = ModuleLogger(globals())
+
+
+@bacpypes_debugging
+class TestPDUData(unittest.TestCase):
+
+    def test_get(self):
+        if _debug: TestPDUData._debug("test_get")
+
+        pdu = PDUData(xtob('0102'))
+        assert pdu.remaining() == 2
+
+        assert pdu.get() == 1
+        assert pdu.remaining() == 1
+        assert pdu.pduData == xtob('02')
+
+        assert pdu.get() == 2
+        assert pdu.remaining() == 0
+        with self.assertRaises(DecodingError):
+            pdu.get()
+
+    def test_get_data(self):
+        if _debug: TestPDUData._debug("test_get_data")
+
+        pdu = PDUData(xtob('01020304050607'))
+        assert pdu.get_data(2) == xtob('0102')
+        assert pdu.get_short() == 0x0304
+        assert pdu.remaining() == 3
+
+        # not enough left
+        with self.assertRaises(DecodingError):
+            pdu.get_data(4)
+
+        # the rest
+        assert pdu.get_data(pdu.remaining()) == xtob('050607')
+        assert pdu.remaining() == 0
+        assert pdu.pduData == xtob('')
+
+    def test_put_after_get(self):
+        if _debug: TestPDUData._debug("test_put_after_get")
+
+        pdu = PDUData(xtob('0102'))
+        assert pdu.get() == 1
+
+        # new data goes on the end of what is left
+        pdu.put(3)
+        pdu.put_data(xtob('04'))
+        assert pdu.pduData == xtob('020304')
+
+    def test_copy_after_get(self):
+        if _debug: TestPDUData._debug("test_copy_after_get")
+
+        pdu = PDUData(xtob('010203'))
+        assert pdu.get() == 1
+
+        # the copy has what is left
+        pdu_copy = PDUData(pdu)
+        assert pdu_copy.pduData == xtob('0203')
+        assert pdu_copy.get() == 2
+        assert pdu.remaining() == 2
+
+    def test_put_header(self):
+        if _debug: TestPDUData._debug("test_put_header")
+
+        # header and data together
+        pdu = PDUData()
+        pdu.put_header('>BBH', (0x81, 0x0A, 6), xtob('0102'))
+        assert pdu.pduData == xtob('810a00060102')
+
+        # appended to what is already there
+        pdu = PDUData(xtob('01'))
+        pdu.put_header('>BB', (2, 3), xtob('04'))
+        assert pdu.pduData == xtob('01020304')
+
+    def test_large(self):
+        if _debug: TestPDUData._debug("test_large")
+
+        pdu = PDUData(xtob('0102' * 50000))
+        while pdu.remaining():
+            assert pdu.get() == 1
+            assert pdu.get_data(1) == xtob('02')
+        assert pdu.pduData == xtob('')
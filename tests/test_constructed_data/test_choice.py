@@ -1,4 +1,224 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-# placeholder
+"""
+Test Constructed Data Choice
+----------------------------
+"""
+
+import unittest
+
+from bacpypes.debugging import bacpypes_debugging, ModuleLogger, xtob
+
+from bacpypes.errors import InvalidTag
+from bacpypes.primitivedata import Boolean, Integer, Unsigned, \
+    Tag, TagList, ApplicationTag, ContextTag, OpeningTag, ClosingTag
+from bacpypes.constructeddata import Element, Sequence, SequenceOf, Choice
+
+from .helpers import CompoundSequence1
+
+# some debugging
+_debug = 0
+_log = ModuleLogger(globals())
+
+
+@bacpypes_debugging
+class ApplicationChoice(Choice):
+
+    choiceElements = [
+        Element('hydrogen', Boolean),
+        Element('helium', Integer),
+        Element('lithium', Unsigned),
+        ]
+
+
+@bacpypes_debugging
+class ContextChoice(Choice):
+
+    choiceElements = [
+        Element('hydrogen', Boolean, 0),
+        Element('helium', Integer, 1),
+        Element('lithium', CompoundSequence1, 2),
+        Element('beryllium', SequenceOf(Unsigned), 3),
+        ]
+
+
+@bacpypes_debugging
+class AmbiguousChoice(Choice):
+
+    choiceElements = [
+        Element('hydrogen', Integer, 0),
+        Element('helium', Unsigned, 0),
+        Element('lithium', Integer),
+        ]
+
+
+@bacpypes_debugging
+class UnsupportedChoice(Choice):
+
+    choiceElements = [
+        Element('hydrogen', Boolean, 0),
+        Element('helium', CompoundSequence1),
+        Element('lithium', Integer, 1),
+        ]
+
+
+def choice_encode(choice):
+    """Encode a choice and return the tag list."""
+    tag_list = TagList()
+    choice.encode(tag_list)
+    return tag_list
+
+def choice_decode(klass, tags):
+    """Decode a choice from a list of tags, and check that they were all
+    consumed."""
+    tag_list = TagList(list(tags))
+    choice = klass()
+    choice.decode(tag_list)
+    assert len(tag_list) == 0
+
+    return choice
+
+
+@bacpypes_debugging
+class TestApplicationChoice(unittest.TestCase):
+
+    def test_missing_choice(self):
+        if _debug: TestApplicationChoice._debug("test_missing_choice")
+
+        # nothing to encode
+        with self.assertRaises(AttributeError):
+            choice_encode(ApplicationChoice())
+
+        # nothing to decode
+        with self.assertRaises(AttributeError):
+            choice_decode(ApplicationChoice, [])
+
+        # no choice for a real
+        with self.assertRaises(AttributeError):
+            choice_decode(ApplicationChoice, [ApplicationTag(Tag.realAppTag, xtob('00000000'))])
+
+    def test_codec(self):
+        if _debug: TestApplicationChoice._debug("test_codec")
+
+        tag_list = choice_encode(ApplicationChoice(lithium=5))
+        assert tag_list.tagList == [ApplicationTag(Tag.unsignedAppTag, xtob('05'))]
+
+        choice = choice_decode(ApplicationChoice, tag_list.tagList)
+        assert choice.hydrogen is None
+        assert choice.helium is None
+        assert choice.lithium == 5
+
+        choice = choice_decode(ApplicationChoice, [ApplicationTag(Tag.integerAppTag, xtob('ff'))])
+        assert choice.helium == -1
+        assert choice.lithium is None
+
+
+@bacpypes_debugging
+class TestContextChoice(unittest.TestCase):
+
+    def test_atomic(self):
+        if _debug: TestContextChoice._debug("test_atomic")
+
+        tag_list = choice_encode(ContextChoice(helium=2))
+        assert tag_list.tagList == [ContextTag(1, xtob('02'))]
+
+        choice = choice_decode(ContextChoice, tag_list.tagList)
+        assert choice.helium == 2
+
+        # the context tag number picks the element
+        choice = choice_decode(ContextChoice, [ContextTag(0, xtob('01'))])
+        assert choice.hydrogen == True
+        assert choice.helium is None
+
+    def test_structure(self):
+        if _debug: TestContextChoice._debug("test_structure")
+
+        tag_list = choice_encode(ContextChoice(lithium=CompoundSequence1(hydrogen=True, helium=3)))
+        assert tag_list.tagList == [
+            OpeningTag(2),
+            Tag(Tag.applicationTagClass, Tag.booleanAppTag, 1, xtob('')),
+            ApplicationTag(Tag.integerAppTag, xtob('03')),
+            ClosingTag(2),
+            ]
+
+        choice = choice_decode(ContextChoice, tag_list.tagList)
+        assert choice.lithium.hydrogen == True
+        assert choice.lithium.helium == 3
+
+        # wrong closing tag
+        with self.assertRaises(InvalidTag):
+            choice_decode(ContextChoice, tag_list.tagList[:-1] + [ClosingTag(1)])
+
+    def test_sequence_of(self):
+        if _debug: TestContextChoice._debug("test_sequence_of")
+
+        tag_list = choice_encode(ContextChoice(beryllium=[1, 2]))
+        assert tag_list.tagList == [
+            OpeningTag(3),
+            ApplicationTag(Tag.unsignedAppTag, xtob('01')),
+            ApplicationTag(Tag.unsignedAppTag, xtob('02')),
+            ClosingTag(3),
+            ]
+
+        choice = choice_decode(ContextChoice, tag_list.tagList)
+        assert choice.beryllium == [1, 2]
+
+        # empty list
+        choice = choice_decode(ContextChoice, [
+            OpeningTag(3),
+            ClosingTag(3),
+            ])
+        assert choice.beryllium == []
+
+    def test_no_match(self):
+        if _debug: TestContextChoice._debug("test_no_match")
+
+        # context tag not in the choice
+        with self.assertRaises(AttributeError):
+            choice_decode(ContextChoice, [ContextTag(4, xtob('01'))])
+
+        # opening tag for an atomic element
+        with self.assertRaises(AttributeError):
+            choice_decode(ContextChoice, [OpeningTag(1), ClosingTag(1)])
+
+
+@bacpypes_debugging
+class TestAmbiguousChoice(unittest.TestCase):
+
+    def test_first_match(self):
+        if _debug: TestAmbiguousChoice._debug("test_first_match")
+
+        # the first element that matches the tag wins
+        choice = choice_decode(AmbiguousChoice, [ContextTag(0, xtob('ff'))])
+        assert choice.hydrogen == -1
+        assert choice.helium is None
+
+    def test_redefined(self):
+        if _debug: TestAmbiguousChoice._debug("test_redefined")
+
+        # a subclass with different elements
+        class ReorderedChoice(AmbiguousChoice):
+            choiceElements = AmbiguousChoice.choiceElements[1:]
+
+        choice = choice_decode(ReorderedChoice, [ContextTag(0, xtob('ff'))])
+        assert choice.helium == 255
+
+        # the original is unchanged
+        choice = choice_decode(AmbiguousChoice, [ContextTag(0, xtob('ff'))])
+        assert choice.hydrogen == -1
+
+
+@bacpypes_debugging
+class TestUnsupportedChoice(unittest.TestCase):
+
+    def test_unsupported(self):
+        if _debug: TestUnsupportedChoice._debug("test_unsupported")
+
+        # elements before the unsupported one are fine
+        choice = choice_decode(UnsupportedChoice, [ContextTag(0, xtob('00'))])
+        assert choice.hydrogen == False
+
+        # elements after it cannot be reached
+        with self.assertRaises(NotImplementedError):
+            choice_decode(UnsupportedChoice, [ContextTag(1, xtob('01'))])
@@ -202,3 +202,74 @@ class TestCompoundSequence2(unittest.TestCase):
         if _debug: TestCompoundSequence2._debug("    - seq: %r", seq)
 
 
+
+
+@bacpypes_debugging
+class ContextSequence(Sequence):
+
+    sequenceElements = [
+        Element('hydrogen', Boolean),
+        Element('helium', Integer, 1),
+        ]
+
+
+@bacpypes_debugging
+class OptionalStructureSequence(Sequence):
+
+    sequenceElements = [
+        Element('carbon', ContextSequence, optional=True),
+        Element('nitrogen', Boolean),
+        Element('oxygen', Boolean),
+        ]
+
+
+@bacpypes_debugging
+class TestSequenceCodec(unittest.TestCase):
+
+    def test_optional_structure(self):
+        if _debug: TestSequenceCodec._debug("test_optional_structure")
+
+        # the structure is there
+        seq = OptionalStructureSequence(
+            carbon=ContextSequence(hydrogen=True, helium=2),
+            nitrogen=False,
+            oxygen=True,
+            )
+        tag_list = TagList()
+        seq.encode(tag_list)
+        assert len(tag_list) == 4
+
+        seq = OptionalStructureSequence()
+        seq.decode(tag_list)
+        assert seq.carbon.helium == 2
+        assert seq.nitrogen == False
+        assert seq.oxygen == True
+        assert len(tag_list) == 0
+
+        # the structure decodes the boolean then fails, the tags it consumed
+        # are put back for the next element
+        tag_list = TagList()
+        OptionalStructureSequence(nitrogen=True, oxygen=False).encode(tag_list)
+
+        seq = OptionalStructureSequence()
+        seq.decode(tag_list)
+        assert seq.carbon is None
+        assert seq.nitrogen == True
+        assert seq.oxygen == False
+        assert len(tag_list) == 0
+
+    def test_redefined(self):
+        if _debug: TestSequenceCodec._debug("test_redefined")
+
+        # a subclass with different elements
+        class ReversedSequence(CompoundSequence1):
+            sequenceElements = CompoundSequence1.sequenceElements[::-1]
+
+        tag_list = TagList()
+        ReversedSequence(hydrogen=True, helium=2).encode(tag_list)
+        assert tag_list[0].tagNumber == Tag.integerAppTag
+
+        # the original is unchanged
+        tag_list = TagList()
+        CompoundSequence1(hydrogen=True, helium=2).encode(tag_list)
+        assert tag_list[0].tagNumber == Tag.booleanAppTag
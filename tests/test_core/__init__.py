@@ -0,0 +1,8 @@
+#!/usr/bin/python
+
+"""
+Test BACpypes Core Module
+"""
+
+from . import test_loop_backend
+from . import test_deferred
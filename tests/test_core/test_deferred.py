@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test Deferred Functions
+-----------------------
+"""
+
+import threading
+import unittest
+
+from bacpypes.debugging import bacpypes_debugging, ModuleLogger
+
+from bacpypes.core import deferred
+
+from ..time_machine import reset_time_machine, run_time_machine
+
+# some debugging
+_debug = 0
+_log = ModuleLogger(globals())
+
+# settings
+THREAD_COUNT = 8
+CALL_COUNT = 1000
+
+
+@bacpypes_debugging
+class TestDeferred(unittest.TestCase):
+
+    def test_deferred_order(self):
+        if _debug: TestDeferred._debug("test_deferred_order")
+
+        called = []
+
+        # reset the time machine, defer some calls, one of which defers more
+        reset_time_machine()
+        deferred(called.append, 1)
+        deferred(deferred, called.append, 3)
+        deferred(called.append, 2)
+        run_time_machine(60.0)
+
+        # all called in order
+        assert called == [1, 2, 3]
+
+    def test_deferred_threads(self):
+        if _debug: TestDeferred._debug("test_deferred_threads")
+
+        called = []
+
+        def worker(n):
+            for i in range(CALL_COUNT):
+                deferred(called.append, (n, i))
+
+        # reset the time machine, defer calls from a bunch of threads
+        reset_time_machine()
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(THREAD_COUNT)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        run_time_machine(60.0)
+
+        # nothing lost, each thread in order
+        assert len(called) == THREAD_COUNT * CALL_COUNT
+        for n in range(THREAD_COUNT):
+            assert [i for m, i in called if m == n] == list(range(CALL_COUNT))
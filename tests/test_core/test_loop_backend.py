@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test Loop Backends
+------------------
+"""
+
+import socket
+import asyncore
+import unittest
+
+from bacpypes.debugging import bacpypes_debugging, ModuleLogger
+
+from bacpypes.core import AsyncoreLoopBackend, SelectorLoopBackend, selectors
+
+# some debugging
+_debug = 0
+_log = ModuleLogger(globals())
+
+
+@bacpypes_debugging
+class DatagramCatcher(asyncore.dispatcher):
+
+    def __init__(self, socket_map):
+        if _debug: DatagramCatcher._debug("__init__")
+        asyncore.dispatcher.__init__(self, map=socket_map)
+
+        self.create_socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.bind(('127.0.0.1', 0))
+
+        # received messages and messages to send
+        self.received = []
+        self.outbound = []
+
+    def readable(self):
+        return True
+
+    def handle_read(self):
+        if _debug: DatagramCatcher._debug("handle_read")
+        msg, addr = self.socket.recvfrom(65536)
+        self.received.append(msg)
+
+    def writable(self):
+        return bool(self.outbound)
+
+    def handle_write(self):
+        if _debug: DatagramCatcher._debug("handle_write")
+        msg, addr = self.outbound.pop(0)
+        self.socket.sendto(msg, addr)
+
+
+@bacpypes_debugging
+class LoopBackendTests:
+
+    backend_class = None
+
+    def setup_method(self, method):
+        if _debug: LoopBackendTests._debug("setup_method %r", method)
+
+        # private map so the tests do not see other sockets
+        self.socket_map = {}
+        self.backend = self.backend_class(self.socket_map)
+
+    def teardown_method(self, method):
+        if _debug: LoopBackendTests._debug("teardown_method %r", method)
+
+        for obj in list(self.socket_map.values()):
+            obj.close()
+        self.backend.close()
+
+    def test_timeout(self):
+        if _debug: LoopBackendTests._debug("test_timeout")
+
+        catcher = DatagramCatcher(self.socket_map)
+
+        # nothing to do
+        self.backend.poll(0.0)
+        assert catcher.received == []
+
+    def test_send_receive(self):
+        if _debug: LoopBackendTests._debug("test_send_receive")
+
+        catcher1 = DatagramCatcher(self.socket_map)
+        catcher2 = DatagramCatcher(self.socket_map)
+
+        # queue something to send
+        catcher1.outbound.append((b'hello', catcher2.socket.getsockname()))
+
+        # first pass sends it, then wait for it to arrive
+        self.backend.poll(0.0)
+        assert catcher1.outbound == []
+        self.backend.poll(1.0)
+        assert catcher2.received == [b'hello']
+
+    def test_closed_dispatcher(self):
+        if _debug: LoopBackendTests._debug("test_closed_dispatcher")
+
+        catcher1 = DatagramCatcher(self.socket_map)
+        catcher2 = DatagramCatcher(self.socket_map)
+        self.backend.poll(0.0)
+
+        # close one of them, the other still works
+        catcher1.close()
+        catcher2.outbound.append((b'hello', catcher2.socket.getsockname()))
+        self.backend.poll(0.0)
+        self.backend.poll(1.0)
+        assert catcher2.received == [b'hello']
+
+
+@bacpypes_debugging
+class TestAsyncoreLoopBackend(LoopBackendTests, unittest.TestCase):
+
+    backend_class = AsyncoreLoopBackend
+
+
+@unittest.skipIf(not selectors, "selectors not available")
+@bacpypes_debugging
+class TestSelectorLoopBackend(LoopBackendTests, unittest.TestCase):
+
+    backend_class = SelectorLoopBackend
+
+    def test_registrations(self):
+        if _debug: TestSelectorLoopBackend._debug("test_registrations")
+
+        catcher = DatagramCatcher(self.socket_map)
+
+        # registered for reading only
+        self.backend.poll(0.0)
+        assert self.backend.registered[catcher._fileno] == (catcher, selectors.EVENT_READ)
+
+        # closing it forgets about it
+        catcher.close()
+        self.backend.poll(0.0)
+        assert self.backend.registered == {}
@@ -1 +1,120 @@
-# placeholder
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test IOCB
+---------
+"""
+
+import threading
+import unittest
+
+from bacpypes.debugging import bacpypes_debugging, ModuleLogger
+
+from bacpypes.core import run_once
+from bacpypes.iocb import IOCB, call_soon_threadsafe, COMPLETED, ABORTED
+
+from ..time_machine import reset_time_machine, run_time_machine
+
+# some debugging
+_debug = 0
+_log = ModuleLogger(globals())
+
+
+@bacpypes_debugging
+class TestCallSoonThreadsafe(unittest.TestCase):
+
+    def test_complete(self):
+        if _debug: TestCallSoonThreadsafe._debug("test_complete")
+
+        # reset the time machine, submit from another thread
+        reset_time_machine()
+        iocbs = []
+        thread = threading.Thread(target=lambda: iocbs.append(call_soon_threadsafe(pow, 2, 10)))
+        thread.start()
+        thread.join()
+
+        # not called yet
+        iocb = iocbs[0]
+        assert not iocb.ioComplete.isSet()
+        run_time_machine(60.0)
+
+        # completed with the return value
+        assert iocb.ioState == COMPLETED
+        assert iocb.ioResponse == 1024
+
+    def test_abort(self):
+        if _debug: TestCallSoonThreadsafe._debug("test_abort")
+
+        def fail():
+            raise ValueError("fail")
+
+        # reset the time machine, submit something that fails
+        reset_time_machine()
+        iocb = call_soon_threadsafe(fail)
+        run_time_machine(60.0)
+
+        # aborted with the exception
+        assert iocb.ioState == ABORTED
+        assert isinstance(iocb.ioError, ValueError)
+
+    def test_wait(self):
+        if _debug: TestCallSoonThreadsafe._debug("test_wait")
+
+        results = []
+
+        def worker():
+            iocb = call_soon_threadsafe(threading.current_thread)
+            iocb.wait(5.0)
+            results.append(iocb.ioResponse)
+
+        # reset the time machine, the worker waits for the loop
+        reset_time_machine()
+        thread = threading.Thread(target=worker)
+        thread.start()
+        while thread.is_alive():
+            run_once()
+            thread.join(0.001)
+
+        # called in this thread, not the worker
+        assert results == [threading.current_thread()]
+
+
+@bacpypes_debugging
+class TestCompletionEvent(unittest.TestCase):
+
+    def test_callback_only(self):
+        if _debug: TestCompletionEvent._debug("test_callback_only")
+
+        calls = []
+        iocb = IOCB()
+        iocb.add_callback(calls.append)
+        iocb.complete(1)
+
+        # no event was needed
+        assert calls == [iocb]
+        assert iocb._ioComplete is None
+
+    def test_after_complete(self):
+        if _debug: TestCompletionEvent._debug("test_after_complete")
+
+        iocb = IOCB()
+        iocb.abort(ValueError("fail"))
+
+        # built already set
+        assert iocb.ioComplete.isSet()
+        iocb.wait()
+
+        # callbacks still go right away
+        calls = []
+        iocb.add_callback(calls.append)
+        assert calls == [iocb]
+
+    def test_before_complete(self):
+        if _debug: TestCompletionEvent._debug("test_before_complete")
+
+        iocb = IOCB()
+        assert not iocb.ioComplete.isSet()
+
+        iocb.complete(1)
+        assert iocb.ioComplete.isSet()
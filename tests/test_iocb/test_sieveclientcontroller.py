@@ -1 +1,131 @@
-# placeholder
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test Sieve Client Controller
+----------------------------
+"""
+
+import unittest
+
+from bacpypes.debugging import bacpypes_debugging, ModuleLogger
+
+from bacpypes.comm import Server, bind
+from bacpypes.pdu import Address
+from bacpypes.apdu import ConfirmedRequestPDU, SimpleAckPDU
+from bacpypes.iocb import IOCB, SieveClientController, \
+    ACTIVE, PENDING, COMPLETED
+
+from ..time_machine import reset_time_machine, run_time_machine
+
+# some debugging
+_debug = 0
+_log = ModuleLogger(globals())
+
+
+@bacpypes_debugging
+class Downstream(Server):
+
+    """Collect the requests sent by the controller."""
+
+    def __init__(self):
+        Server.__init__(self)
+        self.pdus = []
+
+    def indication(self, pdu):
+        if _debug: Downstream._debug("indication %r", pdu)
+        self.pdus.append(pdu)
+
+
+def build_controller(window=1):
+    """Return a controller bound to a downstream collector."""
+    reset_time_machine()
+
+    controller = SieveClientController(window=window)
+    downstream = Downstream()
+    bind(controller, downstream)
+
+    return controller, downstream
+
+def submit(controller, addr, invokeID):
+    """Submit a request and return the IOCB."""
+    apdu = ConfirmedRequestPDU(12, destination=addr)
+    apdu.apduInvokeID = invokeID
+
+    iocb = IOCB(apdu)
+    controller.request_io(iocb)
+    return iocb
+
+def ack(controller, addr, invokeID):
+    """Send an ack up to the controller."""
+    controller.confirmation(SimpleAckPDU(12, invokeID, source=addr))
+    run_time_machine(1.0)
+
+
+@bacpypes_debugging
+class TestSieveClientController(unittest.TestCase):
+
+    def test_one_at_a_time(self):
+        if _debug: TestSieveClientController._debug("test_one_at_a_time")
+
+        controller, downstream = build_controller()
+
+        # one request at a time to the same address
+        iocbs = [submit(controller, Address(2), i) for i in range(2)]
+        assert len(downstream.pdus) == 1
+        assert [iocb.ioState for iocb in iocbs] == [ACTIVE, PENDING]
+
+        # but not to other addresses
+        submit(controller, Address(3), 0)
+        assert len(downstream.pdus) == 2
+
+        # ack the first, the second is sent
+        ack(controller, Address(2), 0)
+        assert iocbs[0].ioState == COMPLETED
+        assert iocbs[1].ioState == ACTIVE
+        assert len(downstream.pdus) == 3
+
+        # ack the second, the queue is gone
+        ack(controller, Address(2), 1)
+        assert iocbs[1].ioState == COMPLETED
+        assert Address(2) not in controller.queues
+
+    def test_window(self):
+        if _debug: TestSieveClientController._debug("test_window")
+
+        controller, downstream = build_controller(window=3)
+
+        # up to three requests are in flight
+        iocbs = [submit(controller, Address(2), i) for i in range(5)]
+        assert len(downstream.pdus) == 3
+        assert [iocb.ioState for iocb in iocbs] == [ACTIVE] * 3 + [PENDING] * 2
+
+        # acks are matched by invoke ID
+        ack(controller, Address(2), 1)
+        assert [iocb.ioState for iocb in iocbs] == [ACTIVE, COMPLETED, ACTIVE, ACTIVE, PENDING]
+        assert len(downstream.pdus) == 4
+
+        # unknown invoke ID's are ignored
+        ack(controller, Address(2), 9)
+        assert [iocb.ioState for iocb in iocbs] == [ACTIVE, COMPLETED, ACTIVE, ACTIVE, PENDING]
+
+        # ack the rest out of order
+        for invokeID in (3, 0, 4, 2):
+            ack(controller, Address(2), invokeID)
+        assert [iocb.ioState for iocb in iocbs] == [COMPLETED] * 5
+        assert len(downstream.pdus) == 5
+        assert not controller.queues
+
+    def test_window_by_address(self):
+        if _debug: TestSieveClientController._debug("test_window_by_address")
+
+        controller, downstream = build_controller(window=4)
+        controller.window_by_address[Address(3)] = 1
+
+        for i in range(5):
+            submit(controller, Address(2), i)
+            submit(controller, Address(3), i)
+
+        destinations = [pdu.pduDestination for pdu in downstream.pdus]
+        assert destinations.count(Address(2)) == 4
+        assert destinations.count(Address(3)) == 1
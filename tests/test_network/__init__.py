@@ -7,3 +7,4 @@ Test Network Discovery
 from . import test_net_1
 from . import test_net_2
 from . import test_net_3
+from . import test_router_info
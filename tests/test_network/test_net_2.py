@@ -17,6 +17,7 @@ from bacpypes.debugging import bacpypes_debugging, ModuleLogger, btox, xtob
 from bacpypes.comm import Client, Server, bind
 from bacpypes.pdu import PDU, Address, LocalBroadcast
 from bacpypes.vlan import Network
+from bacpypes.task import TaskManager
 
 from bacpypes.npdu import (
     npdu_types, NPDU,
@@ -26,6 +27,7 @@ from bacpypes.npdu import (
     EstablishConnectionToNetwork, DisconnectConnectionToNetwork,
     WhatIsNetworkNumber, NetworkNumberIs,
     )
+from bacpypes.netservice import ROUTER_AVAILABLE, ROUTER_BUSY
 
 from ..state_machine import match_pdu, StateMachineGroup, TrafficLog
 from ..time_machine import reset_time_machine, run_time_machine
@@ -269,3 +271,361 @@ class TestWhoIsRouterToNetwork(unittest.TestCase):
         # run the group
         tnet.run()
 
+
+
+def routed_pdu(dnet_dlen_dadr, hop_count='ff'):
+    """Return an application layer Who-Is for a remote network sent to the
+    first router."""
+    return PDU(xtob('01.20' + dnet_dlen_dadr + hop_count + '10 08'),
+        destination=Address("3"),
+        )
+
+
+@bacpypes_debugging
+class TestForwarding(unittest.TestCase):
+
+    def test_remote_station(self):
+        """Test an application layer message for a station two hops away."""
+        if _debug: TestForwarding._debug("test_remote_station")
+
+        # create a network, the first router knows the path to network 3
+        tnet = TNetwork()
+        tnet.iut1.nsap.add_router_references(2, Address("6"), [3])
+
+        # sniffer on network 1 sends the request
+        tnet.sniffer1.start_state.doc("4-1-0") \
+            .send(routed_pdu('0003 01 07')).doc("4-1-1") \
+            .success()
+
+        tnet.td.start_state.success()
+
+        # sniffer on network 2 sees it going to the second router
+        tnet.sniffer2.start_state.doc("4-2-0") \
+            .receive(PDU,
+                pduDestination=Address("6"),
+                pduData=xtob('01.28'        # version, routed
+                    '0003 01 07'            # dnet/dlen/dadr
+                    '0001 01 02'            # snet/slen/sadr
+                    'fe'                    # hop count
+                    '10 08'                 # Who-Is
+                    ),
+                ).doc("4-2-1") \
+            .success()
+
+        # sniffer on network 3 sees the last leg
+        tnet.sniffer3.start_state.doc("4-3-0") \
+            .receive(PDU,
+                pduDestination=Address("7"),
+                pduData=xtob('01.08'        # version, routed
+                    '0001 01 02'            # snet/slen/sadr
+                    '10 08'                 # Who-Is
+                    ),
+                ).doc("4-3-1") \
+            .success()
+
+        # run the group
+        tnet.run()
+
+    def test_remote_broadcast(self):
+        """Test an application layer remote broadcast."""
+        if _debug: TestForwarding._debug("test_remote_broadcast")
+
+        # create a network, the first router knows the path to network 3
+        tnet = TNetwork()
+        tnet.iut1.nsap.add_router_references(2, Address("6"), [3])
+
+        # sniffer on network 1 sends the request
+        tnet.sniffer1.start_state.doc("5-1-0") \
+            .send(routed_pdu('0003 00')).doc("5-1-1") \
+            .success()
+
+        tnet.td.start_state.success()
+
+        tnet.sniffer2.start_state.doc("5-2-0") \
+            .receive(PDU,
+                pduData=xtob('01.28'        # version, routed
+                    '0003 00'               # dnet/dlen
+                    '0001 01 02'            # snet/slen/sadr
+                    'fe'                    # hop count
+                    '10 08'                 # Who-Is
+                    ),
+                ).doc("5-2-1") \
+            .success()
+
+        # a local broadcast on network 3
+        tnet.sniffer3.start_state.doc("5-3-0") \
+            .receive(PDU,
+                pduDestination=LocalBroadcast(),
+                pduData=xtob('01.08'        # version, routed
+                    '0001 01 02'            # snet/slen/sadr
+                    '10 08'                 # Who-Is
+                    ),
+                ).doc("5-3-1") \
+            .success()
+
+        # run the group
+        tnet.run()
+
+    def test_hop_count(self):
+        """Test an application layer message that has run out of hops."""
+        if _debug: TestForwarding._debug("test_hop_count")
+
+        # create a network, the first router knows the path to network 3
+        tnet = TNetwork()
+        tnet.iut1.nsap.add_router_references(2, Address("6"), [3])
+
+        # sniffer on network 1 sends the request
+        tnet.sniffer1.start_state.doc("6-1-0") \
+            .send(routed_pdu('0003 01 07', '01')).doc("6-1-1") \
+            .success()
+
+        tnet.td.start_state.success()
+
+        # the first router passes it along with no hops left
+        tnet.sniffer2.start_state.doc("6-2-0") \
+            .receive(PDU,
+                pduData=xtob('01.28 0003 01 07 0001 01 02 00 10 08'),
+                ).doc("6-2-1") \
+            .success()
+
+        # the second router drops it
+        tnet.sniffer3.start_state.doc("6-3-0") \
+            .timeout(3).doc("6-3-1") \
+            .success()
+
+        # run the group
+        tnet.run()
+
+    def test_no_path(self):
+        """Test an application layer message for an unknown network."""
+        if _debug: TestForwarding._debug("test_no_path")
+
+        # create a network
+        tnet = TNetwork()
+
+        # sniffer on network 1 sends the request
+        tnet.sniffer1.start_state.doc("7-1-0") \
+            .send(routed_pdu('0004 01 07')).doc("7-1-1") \
+            .success()
+
+        tnet.td.start_state.success()
+
+        # the first router looks for a path
+        tnet.sniffer2.start_state.doc("7-2-0") \
+            .receive(PDU,
+                pduData=xtob('01.80'        # version, network layer
+                    '00 0004'               # message type and network
+                    ),
+                ).doc("7-2-1") \
+            .success()
+
+        tnet.sniffer3.start_state.success()
+
+        # run the group
+        tnet.run()
+
+
+@bacpypes_debugging
+class TestPendingNetworks(unittest.TestCase):
+
+    def test_not_found(self):
+        """Test looking for a network that is not there."""
+        if _debug: TestPendingNetworks._debug("test_not_found")
+
+        # create a network
+        tnet = TNetwork()
+
+        # sniffer on network 1 sends a request and sees it go by, then
+        # sends another one later
+        tnet.sniffer1.start_state.doc("8-1-0") \
+            .send(routed_pdu('0004 01 07')).doc("8-1-1") \
+            .receive(PDU, pduSource=Address("2")).doc("8-1-2") \
+            .timeout(16).doc("8-1-3") \
+            .send(routed_pdu('0004 01 07')).doc("8-1-4") \
+            .success()
+
+        tnet.td.start_state.success()
+
+        # the first router asks three times, then not again for a while
+        who_is_router = xtob('01.80 00 0004')
+        tnet.sniffer2.start_state.doc("8-2-0") \
+            .receive(PDU, pduData=who_is_router).doc("8-2-1") \
+            .receive(PDU, pduData=who_is_router).doc("8-2-2") \
+            .receive(PDU, pduData=who_is_router).doc("8-2-3") \
+            .timeout(20).doc("8-2-4") \
+            .success()
+
+        tnet.sniffer3.start_state.success()
+
+        # run the group
+        tnet.run()
+
+        # nothing is waiting
+        assert not tnet.iut1.nsap.pending_nets
+
+    def test_found(self):
+        """Test the messages waiting for a network that is found."""
+        if _debug: TestPendingNetworks._debug("test_found")
+
+        # create a network, only two messages are kept
+        tnet = TNetwork()
+        tnet.iut1.nsap.pending_net_size = 2
+
+        # sniffer on network 1 sends three requests
+        tnet.sniffer1.start_state.doc("9-1-0") \
+            .send(routed_pdu('0004 01 07', 'ff')).doc("9-1-1") \
+            .send(routed_pdu('0004 01 07', 'fe')).doc("9-1-2") \
+            .send(routed_pdu('0004 01 07', 'fd')).doc("9-1-3") \
+            .success()
+
+        tnet.td.start_state.success()
+
+        # sniffer on network 2 answers for the network, the newest two are
+        # sent along
+        tnet.sniffer2.start_state.doc("9-2-0") \
+            .receive(PDU, pduData=xtob('01.80 00 0004')).doc("9-2-1") \
+            .timeout(1).doc("9-2-2") \
+            .send(PDU(xtob('01.80 01 0004'), destination=LocalBroadcast())).doc("9-2-3") \
+            .receive(PDU,
+                pduDestination=Address("4"),
+                pduData=xtob('01.28 0004 01 07 0001 01 02 fd 10 08'),
+                ).doc("9-2-4") \
+            .receive(PDU,
+                pduDestination=Address("4"),
+                pduData=xtob('01.28 0004 01 07 0001 01 02 fc 10 08'),
+                ).doc("9-2-5") \
+            .timeout(3).doc("9-2-6") \
+            .success()
+
+        tnet.sniffer3.start_state.success()
+
+        # run the group
+        tnet.run()
+
+        assert not tnet.iut1.nsap.pending_nets
+
+    def test_many_networks(self):
+        """Test looking for more than one network at once."""
+        if _debug: TestPendingNetworks._debug("test_many_networks")
+
+        # create a network
+        tnet = TNetwork()
+
+        # sniffer on network 1 sends requests for three networks
+        tnet.sniffer1.start_state.doc("10-1-0") \
+            .send(routed_pdu('0004 01 07')).doc("10-1-1") \
+            .send(routed_pdu('0005 01 07')).doc("10-1-2") \
+            .send(routed_pdu('0006 01 07')).doc("10-1-3") \
+            .success()
+
+        tnet.td.start_state.success()
+
+        # the first one is asked about, then the rest of them together,
+        # which the second router answers
+        tnet.sniffer2.start_state.doc("10-2-0") \
+            .receive(PDU, pduData=xtob('01.80 00 0004')).doc("10-2-1") \
+            .receive(PDU, pduData=xtob('01.80 00')).doc("10-2-2") \
+            .receive(PDU, pduData=xtob('01.80 01 0003')).doc("10-2-3") \
+            .timeout(3).doc("10-2-4") \
+            .success()
+
+        tnet.sniffer3.start_state.success()
+
+        # run the group
+        tnet.run(4.0)
+
+
+@bacpypes_debugging
+class TestBusyNetworks(unittest.TestCase):
+
+    def test_available(self):
+        """Test the messages held for a busy network that becomes available."""
+        if _debug: TestBusyNetworks._debug("test_available")
+
+        # create a network, the sniffer on network 2 is a router to network 4
+        tnet = TNetwork()
+        tnet.iut1.nsap.add_router_references(2, Address("4"), [4])
+
+        # sniffer on network 1 sends a request after the router is busy
+        tnet.sniffer1.start_state.doc("11-1-0") \
+            .timeout(1).doc("11-1-1") \
+            .send(routed_pdu('0004 01 07')).doc("11-1-2") \
+            .success()
+
+        tnet.td.start_state.success()
+
+        # sniffer on network 2 is busy for a while, then gets the request
+        # when it is available
+        tnet.sniffer2.start_state.doc("11-2-0") \
+            .send(PDU(xtob('01.80 04 0004'), destination=LocalBroadcast())).doc("11-2-1") \
+            .timeout(3).doc("11-2-2") \
+            .send(PDU(xtob('01.80 05 0004'), destination=LocalBroadcast())).doc("11-2-3") \
+            .receive(PDU,
+                pduDestination=Address("4"),
+                pduData=xtob('01.28 0004 01 07 0001 01 02 fe 10 08'),
+                ).doc("11-2-4") \
+            .timeout(3).doc("11-2-5") \
+            .success()
+
+        tnet.sniffer3.start_state.success()
+
+        # run the group, well before the busy timeout
+        tnet.run(10.0)
+
+        assert not tnet.iut1.nsap.busy_nets
+
+    def test_timeout(self):
+        """Test the messages held for a busy network that does not say it
+        is available."""
+        if _debug: TestBusyNetworks._debug("test_timeout")
+
+        # create a network, the sniffer on network 2 is a router to network 4
+        tnet = TNetwork()
+        tnet.iut1.nsap.add_router_references(2, Address("4"), [4])
+
+        # sniffer on network 1 sends a request after the router is busy
+        tnet.sniffer1.start_state.doc("12-1-0") \
+            .timeout(1).doc("12-1-1") \
+            .send(routed_pdu('0004 01 07')).doc("12-1-2") \
+            .success()
+
+        tnet.td.start_state.success()
+
+        # sniffer on network 2 is busy for all of its networks, the request
+        # is sent anyway after the busy timeout
+        tnet.sniffer2.start_state.doc("12-2-0") \
+            .send(PDU(xtob('01.80 04'), destination=LocalBroadcast())).doc("12-2-1") \
+            .timeout(25).doc("12-2-2") \
+            .receive(PDU,
+                pduDestination=Address("4"),
+                pduData=xtob('01.28 0004 01 07 0001 01 02 fe 10 08'),
+                ).doc("12-2-3") \
+            .success()
+
+        tnet.sniffer3.start_state.success()
+
+        # run the group
+        tnet.run()
+
+        assert not tnet.iut1.nsap.busy_nets
+        assert tnet.iut1.nsap.router_info_cache.get_router_info(4)[2] == ROUTER_AVAILABLE
+
+    def test_backoff(self):
+        """Test waiting longer for a network that is busy again soon after."""
+        if _debug: TestBusyNetworks._debug("test_backoff")
+
+        # create a network, the sniffer on network 2 is a router to network 4
+        tnet = TNetwork()
+        nsap = tnet.iut1.nsap
+        nsap.add_router_references(2, Address("4"), [4])
+        now = TaskManager().get_time()
+
+        nsap.update_router_status(2, Address("4"), ROUTER_BUSY)
+        assert nsap.busy_nets[4].next_time == now + 30.0
+
+        nsap.update_router_status(2, Address("4"), ROUTER_AVAILABLE)
+        assert not nsap.busy_nets
+
+        nsap.update_router_status(2, Address("4"), ROUTER_BUSY, [4])
+        assert nsap.busy_nets[4].next_time == now + 60.0
+        assert nsap.router_info_cache.get_router_info(4)[2] == ROUTER_BUSY
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test Router Information Cache
+-----------------------------
+"""
+
+import unittest
+
+from bacpypes.debugging import bacpypes_debugging, ModuleLogger
+
+from bacpypes.pdu import Address
+from bacpypes.netservice import RouterInfoCache, ROUTER_AVAILABLE, ROUTER_BUSY
+
+# some debugging
+_debug = 0
+_log = ModuleLogger(globals())
+
+
+@bacpypes_debugging
+class TestRouterInfoCache(unittest.TestCase):
+
+    def test_update(self):
+        if _debug: TestRouterInfoCache._debug("test_update")
+
+        cache = RouterInfoCache()
+        cache.update_router_info(1, Address("10"), [3, 4])
+        cache.update_router_info(2, Address("20"), range(100, 1100))
+
+        assert cache.get_router_info(3) == (1, Address("10"), ROUTER_AVAILABLE)
+        assert cache.get_router_info(1099) == (2, Address("20"), ROUTER_AVAILABLE)
+        assert cache.get_router_info(5) is None
+
+        # the status is in the paths through the router
+        cache.update_router_status(1, Address("10"), ROUTER_BUSY)
+        assert cache.get_router_info(4) == (1, Address("10"), ROUTER_BUSY)
+        assert cache.get_router_info(100)[2] == ROUTER_AVAILABLE
+
+    def test_move(self):
+        if _debug: TestRouterInfoCache._debug("test_move")
+
+        cache = RouterInfoCache()
+        cache.update_router_info(1, Address("10"), [3, 4])
+        cache.update_router_info(1, Address("11"), [4])
+        assert cache.get_router_info(4) == (1, Address("11"), ROUTER_AVAILABLE)
+        assert cache.routers[(1, Address("10"))].dnets == set([3])
+
+        # the last network moves to a router on another network
+        cache.update_router_info(2, Address("20"), [3])
+        assert cache.get_router_info(3) == (2, Address("20"), ROUTER_AVAILABLE)
+        assert (1, Address("10")) not in cache.routers
+        assert cache.snet_routers == {1: set([Address("11")]), 2: set([Address("20")])}
+
+    def test_delete(self):
+        if _debug: TestRouterInfoCache._debug("test_delete")
+
+        cache = RouterInfoCache()
+        cache.update_router_info(1, Address("10"), [3, 4])
+        cache.update_router_info(1, Address("11"), [5])
+        cache.update_router_info(2, Address("20"), [6])
+
+        # one network
+        cache.delete_router_info(1, Address("10"), [3])
+        assert cache.get_router_info(3) is None
+        assert cache.get_router_info(4) is not None
+
+        # all of the routers on a network
+        cache.delete_router_info(1)
+        assert cache.get_router_info(4) is None
+        assert cache.get_router_info(5) is None
+        assert cache.get_router_info(6) is not None
+        assert list(cache.routers) == [(2, Address("20"))]
+        assert list(cache.snet_routers) == [2]
@@ -12,7 +12,7 @@ import unittest
 from bacpypes.debugging import bacpypes_debugging, ModuleLogger, btox, xtob
 
 from bacpypes.comm import Client, Server, bind
-from bacpypes.pdu import PDU, Address, LocalBroadcast
+from bacpypes.pdu import PDU, Address, LocalBroadcast, RemoteStation
 
 from bacpypes.npdu import (
     npdu_types, NPDU,
@@ -359,3 +359,23 @@ class TestNPDUCodec(unittest.TestCase):
         self.response(PDU(pdu_bytes))
         self.confirmation(NetworkNumberIs, nniNet=8, nniFlag=1)
 
+
+    def test_short_fields_masked(self):
+        """Test the 16-bit header fields are truncated like put_short()."""
+        if _debug: TestNPDUCodec._debug("test_short_fields_masked")
+
+        # proprietary message to a remote station, vendor out of range
+        npdu = NPDU(xtob('ab'))
+        npdu.npduDADR = RemoteStation(2, 1)
+        npdu.npduHopCount = 255
+        npdu.npduNetMessage = 0x80
+        npdu.npduVendorID = 0x10003
+
+        pdu = PDU()
+        npdu.encode(pdu)
+
+        assert pdu.pduData == xtob('01.a0'      # version, control
+            '0002 01 01'                        # dnet, dlen, dadr
+            'ff 80 0003'                        # hop count, message type, vendor
+            'ab'                                # data
+            )
@@ -9,8 +9,10 @@ Nose Test PDU Address
 import unittest
 
 from bacpypes.debugging import bacpypes_debugging, ModuleLogger, xtob
+from bacpypes import pdu
 from bacpypes.pdu import Address, LocalStation, RemoteStation, \
     LocalBroadcast, RemoteBroadcast, GlobalBroadcast
+from bacpypes.bvll import BVLPDU, ReadBroadcastDistributionTableAck
 
 # some debugging
 _debug = 0
@@ -520,3 +522,77 @@ class TestAddressEquality(unittest.TestCase, MatchAddressMixin):
         assert Address(u"5:*") == RemoteBroadcast(5)
         assert Address(u"*:*") == GlobalBroadcast()
 
+
+
+@bacpypes_debugging
+class TestAddressInterning(unittest.TestCase):
+
+    def test_same_arguments(self):
+        if _debug: TestAddressInterning._debug("test_same_arguments")
+
+        # the same arguments give the same address
+        assert Address("192.168.0.1") is Address("192.168.0.1")
+        assert Address(("192.168.0.1", 47808)) is Address(("192.168.0.1", 47808))
+        assert RemoteStation(3, 4) is RemoteStation(3, 4)
+
+        # a bytearray is the same as bytes
+        assert LocalStation(xtob('01')) is LocalStation(bytearray(xtob('01')))
+
+        # different arguments or classes are equal but not the same
+        assert Address("192.168.0.1") is not Address(("192.168.0.1", 47808))
+        assert Address("192.168.0.1") == Address(("192.168.0.1", 47808))
+        assert Address(1) is not LocalStation(1)
+        assert Address(1) == LocalStation(1)
+        assert hash(Address(1)) == hash(LocalStation(1))
+
+    def test_cache_size(self):
+        if _debug: TestAddressInterning._debug("test_cache_size")
+
+        cache_size = pdu._address_cache_size
+        try:
+            pdu._address_cache_size = 10
+            pdu._address_cache.clear()
+
+            # the cache is cleared when it is full
+            addr = Address(1)
+            for i in range(2, 20):
+                Address(i)
+            assert len(pdu._address_cache) <= 10
+            assert Address(1) is not addr
+            assert Address(1) == addr
+        finally:
+            pdu._address_cache_size = cache_size
+
+    def test_bdt_mask(self):
+        if _debug: TestAddressInterning._debug("test_bdt_mask")
+
+        # decode a table entry with a mask
+        bvlpdu = BVLPDU(xtob('c0a800febac0' 'ffffff00'))
+        bdt = ReadBroadcastDistributionTableAck()
+        bdt.decode(bvlpdu)
+
+        # the entry has its own mask, the shared address is unchanged
+        assert bdt.bvlciBDT[0].addrMask == 0xFFFFFF00
+        assert Address(("192.168.0.254", 47808)).addrMask == 0xFFFFFFFF
+
+    def test_immutable(self):
+        if _debug: TestAddressInterning._debug("test_immutable")
+
+        # shared addresses cannot be changed
+        addr = Address("192.168.0.1")
+        with self.assertRaises(AttributeError):
+            addr.addrMask = 0xFFFFFF00
+        with self.assertRaises(AttributeError):
+            RemoteStation(3, 4).addrNet = 5
+        assert Address("192.168.0.1").addrMask == 0xFFFFFFFF
+
+        # a modified copy is a different address
+        xaddr = addr.replace(addrMask=0xFFFFFF00)
+        assert xaddr is not addr
+        assert xaddr.__class__ is Address
+        assert xaddr.addrMask == 0xFFFFFF00
+        assert xaddr == addr
+        with self.assertRaises(AttributeError):
+            xaddr.addrMask = 0
+        with self.assertRaises(AttributeError):
+            addr.replace(addrSomething=1)
@@ -1 +1,141 @@
-# placeholder
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test PDU PCI
+------------
+"""
+
+import pickle
+import unittest
+
+from bacpypes.debugging import bacpypes_debugging, ModuleLogger, xtob
+
+from bacpypes.pdu import Address, LocalStation, RemoteStation, GlobalBroadcast, PCI, PDU
+from bacpypes.apdu import APCI, APDU
+from bacpypes.npdu import NPCI
+from bacpypes.bvll import BVLCI
+from bacpypes.primitivedata import Tag, ApplicationTag, TagList
+
+# some debugging
+_debug = 0
+_log = ModuleLogger(globals())
+
+
+class WriteCollector:
+
+    """Collect what is written by debug_contents()."""
+
+    def __init__(self):
+        self.lines = []
+
+    def write(self, data):
+        self.lines.append(data)
+
+    def getvalue(self):
+        return ''.join(self.lines)
+
+
+@bacpypes_debugging
+class TestPCI(unittest.TestCase):
+
+    def test_pci_slots(self):
+        if _debug: TestPCI._debug("test_pci_slots")
+
+        # no instance dictionary
+        for obj in (PCI(), APCI(), NPCI(), BVLCI(), Address(1), Tag(), TagList()):
+            assert not hasattr(obj, '__dict__'), obj
+
+        # only the fields are settable
+        pci = PCI()
+        with self.assertRaises(AttributeError):
+            pci.pduSomething = 1
+
+    def test_pdu_attributes(self):
+        if _debug: TestPCI._debug("test_pdu_attributes")
+
+        # PDUs carry data and can still be given other attributes
+        pdu = PDU(xtob('01'), source=Address(1))
+        pdu.pduSomething = 1
+        assert pdu.pduSomething == 1
+
+        apdu = APDU()
+        apdu.apduSomething = 2
+        assert apdu.apduSomething == 2
+
+    def test_pci_update(self):
+        if _debug: TestPCI._debug("test_pci_update")
+
+        pci = PCI(source=Address(1), destination=Address(2), expectingReply=1, networkPriority=3)
+
+        # copy the fields into an APCI
+        apci = APCI()
+        PCI.update(apci, pci)
+        assert apci.pduSource == Address(1)
+        assert apci.pduDestination == Address(2)
+        assert apci.pduExpectingReply == 1
+        assert apci.pduNetworkPriority == 3
+
+    def test_pci_contents(self):
+        if _debug: TestPCI._debug("test_pci_contents")
+
+        pci = PCI(source=Address(1), destination=Address("2:3"), networkPriority=2)
+        assert pci.dict_contents() == {
+            'source': '1',
+            'destination': '2:3',
+            'expectingReply': 0,
+            'networkPriority': 2,
+            }
+
+        output = WriteCollector()
+        pci.debug_contents(file=output)
+        output = output.getvalue()
+        assert "pduSource = <Address 1>" in output
+        assert "pduNetworkPriority = 2" in output
+
+    def test_tag_contents(self):
+        if _debug: TestPCI._debug("test_tag_contents")
+
+        tag = ApplicationTag(Tag.unsignedAppTag, xtob('05'))
+
+        output = WriteCollector()
+        TagList([tag]).debug_contents(file=output)
+        output = output.getvalue()
+        assert "tagNumber = 2 unsigned" in output
+        assert "tagData = '05'" in output
+
+    def test_pickle(self):
+        if _debug: TestPCI._debug("test_pickle")
+
+        addresses = [Address("192.168.0.1/24"), LocalStation(xtob('01')),
+            RemoteStation(2, 3), GlobalBroadcast()]
+        pdu = PDU(xtob('01.02'), source=Address(1), destination=Address("2:3"),
+            expectingReply=1, networkPriority=2)
+        pdu.pduSomething = addresses
+        apci = APCI(source=Address(4))
+        apci.apduInvokeID = 5
+        tag = ApplicationTag(Tag.unsignedAppTag, xtob('05'))
+
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            for addr in addresses:
+                xaddr = pickle.loads(pickle.dumps(addr, protocol))
+                assert xaddr.__class__ is addr.__class__
+                assert xaddr == addr
+                assert hash(xaddr) == hash(addr)
+                assert str(xaddr) == str(addr)
+            assert pickle.loads(pickle.dumps(addresses[0], protocol)).addrMask == addresses[0].addrMask
+
+            xpdu = pickle.loads(pickle.dumps(pdu, protocol))
+            assert xpdu.pduData == pdu.pduData
+            assert xpdu.pduSource == Address(1)
+            assert xpdu.pduDestination == Address("2:3")
+            assert (xpdu.pduExpectingReply, xpdu.pduNetworkPriority) == (1, 2)
+            assert xpdu.pduSomething == addresses
+
+            xapci = pickle.loads(pickle.dumps(apci, protocol))
+            assert xapci.pduSource == Address(4)
+            assert xapci.apduInvokeID == 5
+
+            xtag_list = pickle.loads(pickle.dumps(TagList([tag]), protocol))
+            assert xtag_list.tagList == [tag]
+            assert pickle.loads(pickle.dumps(TagList(), protocol)).tagList == []
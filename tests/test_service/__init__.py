@@ -8,4 +8,7 @@ from . import test_cov
 from . import test_device
 from . import test_file
 from . import test_object
+from . import test_read
+from . import test_poll
 
+from . import test_discover
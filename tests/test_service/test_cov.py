@@ -1 +1,254 @@
-# placeholder
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test Change of Value Services
+-----------------------------
+"""
+
+import unittest
+
+from bacpypes.debugging import bacpypes_debugging, ModuleLogger
+
+from bacpypes.capability import Collector
+from bacpypes.pdu import Address
+from bacpypes.primitivedata import Real
+from bacpypes.constructeddata import Any
+from bacpypes.basetypes import PropertyValue, StatusFlags
+from bacpypes.apdu import SubscribeCOVRequest, SubscribeCOVPropertyRequest, \
+    ConfirmedCOVNotificationRequest, UnconfirmedCOVNotificationRequest, \
+    ReadPropertyRequest, ReadPropertyMultipleRequest, SimpleAckPDU, Error, RejectPDU
+from bacpypes.errors import ExecutionError
+
+from bacpypes.app import DeviceInfoCache
+from bacpypes.service.read import ReadPointListServices
+from bacpypes.service.cov import ChangeOfValueClientServices
+
+from ..time_machine import reset_time_machine, run_time_machine
+
+# some debugging
+_debug = 0
+_log = ModuleLogger(globals())
+
+
+@bacpypes_debugging
+class COVClient(Collector, ReadPointListServices, ChangeOfValueClientServices):
+
+    """Keep the requests and responses instead of sending them."""
+
+    def __init__(self):
+        if _debug: COVClient._debug("__init__")
+
+        self.localDevice = None
+        self.deviceInfoCache = DeviceInfoCache()
+        self.requests = []
+        self.responses = []
+
+        Collector.__init__(self)
+
+    def request_io(self, iocb):
+        if _debug: COVClient._debug("request_io %r", iocb)
+        self.requests.append(iocb)
+
+    def response(self, apdu):
+        if _debug: COVClient._debug("response %r", apdu)
+        self.responses.append(apdu)
+
+    def ack_all(self):
+        """Ack the subscription requests."""
+        requests, self.requests = self.requests, []
+        for iocb in requests:
+            iocb.complete(SimpleAckPDU())
+        return [iocb.args[0] for iocb in requests]
+
+
+@bacpypes_debugging
+class Consumer:
+
+    def __init__(self):
+        self.changes = []
+
+    def __call__(self, point, value, error):
+        if _debug: Consumer._debug("__call__ %r %r %r", point, value, error)
+        self.changes.append((point[1][1], point[2], value, error))
+
+
+def notification(instance, address="1", confirmed=False, proc_id=1, **values):
+    """Build a notification for an analog value."""
+    if confirmed:
+        apdu = ConfirmedCOVNotificationRequest()
+    else:
+        apdu = UnconfirmedCOVNotificationRequest()
+    apdu.pduSource = Address(address)
+    apdu.subscriberProcessIdentifier = proc_id
+    apdu.initiatingDeviceIdentifier = ('device', 100)
+    apdu.monitoredObjectIdentifier = ('analogValue', instance)
+    apdu.timeRemaining = 300
+    apdu.listOfValues = [
+        PropertyValue(propertyIdentifier=propid, value=Any(value))
+        for propid, value in values.items()
+        ]
+    return apdu
+
+
+@bacpypes_debugging
+class TestChangeOfValueClient(unittest.TestCase):
+
+    def setUp(self):
+        reset_time_machine()
+
+    def test_subscribe(self):
+        if _debug: TestChangeOfValueClient._debug("test_subscribe")
+
+        client = COVClient()
+        consumer = Consumer()
+        client.watch_point(("1", ('analogValue', 1), 'presentValue'), 10000, consumer)
+        client.watch_point(("1", ('analogValue', 1), 'statusFlags'), 10000, consumer)
+        client.watch_point(("1", ('analogValue', 2), 'presentValue'), 10000, consumer)
+        client.watch_point(("1", ('analogValue', 1), 'description'), 10000, consumer)
+
+        # one object subscription each, a property subscription for the rest
+        requests = client.ack_all()
+        assert [request.__class__ for request in requests] == \
+            [SubscribeCOVRequest, SubscribeCOVRequest, SubscribeCOVPropertyRequest]
+        assert requests[0].monitoredObjectIdentifier == ('analogValue', 1)
+        assert requests[0].lifetime == 300
+        assert requests[2].monitoredPropertyIdentifier.propertyIdentifier == 'description'
+
+        # values come in the notifications
+        client.do_UnconfirmedCOVNotificationRequest(notification(1,
+            presentValue=Real(5.0),
+            statusFlags=StatusFlags([0, 0, 0, 0]),
+            ))
+        assert sorted(change[1:3] for change in consumer.changes) == \
+            [('presentValue', 5.0), ('statusFlags', [0, 0, 0, 0])]
+
+        # only changes are delivered
+        del consumer.changes[:]
+        client.do_UnconfirmedCOVNotificationRequest(notification(1,
+            presentValue=Real(6.0),
+            statusFlags=StatusFlags([0, 0, 0, 0]),
+            ))
+        assert consumer.changes == [(1, 'presentValue', 6.0, None)]
+
+        # no polling
+        run_time_machine(60.0)
+        assert not client.requests
+
+    def test_confirmed(self):
+        if _debug: TestChangeOfValueClient._debug("test_confirmed")
+
+        client = COVClient()
+        consumer = Consumer()
+        client.watch_point(("1", ('analogValue', 1), 'presentValue'), 10000, consumer)
+        client.ack_all()
+
+        client.do_ConfirmedCOVNotificationRequest(notification(1, confirmed=True, presentValue=Real(1.0)))
+        assert isinstance(client.responses[0], SimpleAckPDU)
+        assert consumer.changes == [(1, 'presentValue', 1.0, None)]
+
+        # not ours
+        with self.assertRaises(ExecutionError):
+            client.do_ConfirmedCOVNotificationRequest(notification(2, confirmed=True, presentValue=Real(1.0)))
+        with self.assertRaises(ExecutionError):
+            client.do_ConfirmedCOVNotificationRequest(notification(1, confirmed=True, proc_id=2, presentValue=Real(1.0)))
+
+    def test_renew(self):
+        if _debug: TestChangeOfValueClient._debug("test_renew")
+
+        client = COVClient()
+        client.cov_client_lifetime = 100
+        consumer = Consumer()
+
+        client.watch_point(("1", ('analogValue', 1), 'presentValue'), 10000, consumer)
+        client.ack_all()
+
+        # a little later
+        run_time_machine(20.0)
+        client.watch_point(("1", ('analogValue', 2), 'presentValue'), 10000, consumer)
+        client.ack_all()
+
+        # both are renewed together before the first one expires
+        run_time_machine(54.0)
+        assert not client.requests
+        run_time_machine(2.0)
+        assert [request.monitoredObjectIdentifier for request in client.ack_all()] == \
+            [('analogValue', 1), ('analogValue', 2)]
+
+        # and again
+        run_time_machine(76.0)
+        assert len(client.ack_all()) == 2
+
+    def test_not_supported(self):
+        if _debug: TestChangeOfValueClient._debug("test_not_supported")
+
+        client = COVClient()
+        consumer = Consumer()
+        client.watch_point(("1", ('analogValue', 1), 'presentValue'), 1000, consumer)
+        client.watch_point(("1", ('analogValue', 2), 'presentValue'), 1000, consumer)
+
+        # the device rejects the service
+        for iocb in client.requests:
+            iocb.abort(RejectPDU(reason='unrecognizedService'))
+        del client.requests[:]
+        assert Address("1") in client.cov_client_unsupported
+
+        # the points are polled
+        run_time_machine(1.5)
+        assert client.requests
+        assert isinstance(client.requests[0].args[0], (ReadPropertyRequest, ReadPropertyMultipleRequest))
+
+        # and new ones too
+        del client.requests[:]
+        client.watch_point(("1", ('analogValue', 3), 'presentValue'), 1000, consumer)
+        assert not client.requests
+        assert len(client.cov_client_poller.points) == 3
+
+    def test_error(self):
+        if _debug: TestChangeOfValueClient._debug("test_error")
+
+        client = COVClient()
+        consumer = Consumer()
+        client.watch_point(("1", ('analogValue', 1), 'presentValue'), 1000, consumer)
+        client.watch_point(("1", ('analogValue', 2), 'presentValue'), 1000, consumer)
+
+        # one object can not be subscribed to
+        client.requests[0].abort(Error(errorClass='services', errorCode='covSubscriptionFailed'))
+        client.requests[1].complete(SimpleAckPDU())
+        del client.requests[:]
+
+        assert not client.cov_client_unsupported
+        assert list(client.cov_client_poller.points) == \
+            [(Address("1"), ('analogValue', 1), 'presentValue', None)]
+
+        # notifications for a polled point are ignored
+        client.do_UnconfirmedCOVNotificationRequest(notification(1, presentValue=Real(1.0)))
+        assert not consumer.changes
+
+    def test_unwatch(self):
+        if _debug: TestChangeOfValueClient._debug("test_unwatch")
+
+        client = COVClient()
+        consumer = Consumer()
+        other = Consumer()
+        client.watch_point(("1", ('analogValue', 1), 'presentValue'), 10000, consumer)
+        client.watch_point(("1", ('analogValue', 1), 'statusFlags'), 10000, other)
+        client.ack_all()
+
+        # the subscription is still needed
+        client.unwatch_point(("1", ('analogValue', 1), 'presentValue'))
+        assert not client.requests
+
+        client.do_UnconfirmedCOVNotificationRequest(notification(1, presentValue=Real(1.0)))
+        assert not consumer.changes
+
+        # cancelled when nothing is left
+        client.unwatch_point(("1", ('analogValue', 1), 'statusFlags'), other)
+        request = client.requests[0].args[0]
+        assert isinstance(request, SubscribeCOVRequest)
+        assert request.lifetime is None
+        assert request.issueConfirmedNotifications is None
+        assert not client.cov_client_subscriptions
+
+        with self.assertRaises(RuntimeError):
+            client.unwatch_point(("1", ('analogValue', 1), 'statusFlags'))
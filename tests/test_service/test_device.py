@@ -10,7 +10,8 @@ import unittest
 
 from bacpypes.debugging import bacpypes_debugging, ModuleLogger, xtob
 
-from bacpypes.pdu import Address, LocalBroadcast, PDU
+from bacpypes.capability import Collector
+from bacpypes.pdu import Address, LocalBroadcast, GlobalBroadcast, PDU
 from bacpypes.apdu import (
     WhoIsRequest, IAmRequest,
     WhoHasRequest, WhoHasLimits, WhoHasObject, IHaveRequest,
@@ -18,12 +19,14 @@ from bacpypes.apdu import (
     SimpleAckPDU, Error,
     )
 
+from bacpypes.local.device import LocalDeviceObject
 from bacpypes.service.device import (
     WhoIsIAmServices, WhoHasIHaveServices,
     DeviceCommunicationControlServices,
     )
 
 from .helpers import ApplicationNetwork, ApplicationNode
+from ..time_machine import reset_time_machine, run_time_machine
 
 # some debugging
 _debug = 0
@@ -150,6 +153,142 @@ class TestWhoIsIAm(unittest.TestCase):
         anet.run()
 
 
+@bacpypes_debugging
+class IAmApplication(Collector, WhoIsIAmServices):
+
+    """Keep the I-Am requests instead of sending them."""
+
+    def __init__(self):
+        if _debug: IAmApplication._debug("__init__")
+
+        self.localDevice = LocalDeviceObject(
+            objectName="iut",
+            objectIdentifier=("device", 20),
+            maxApduLengthAccepted=1024,
+            segmentationSupported='noSegmentation',
+            vendorIdentifier=999,
+            )
+        self.requests = []
+
+        Collector.__init__(self)
+
+    def request(self, apdu):
+        if _debug: IAmApplication._debug("request %r", apdu)
+        self.requests.append(apdu)
+
+    def who_is_from(self, source, destination=None):
+        """Pretend a Who-Is came in."""
+        apdu = WhoIsRequest()
+        apdu.pduSource = Address(source)
+        apdu.pduDestination = destination or LocalBroadcast()
+        self.do_WhoIsRequest(apdu)
+
+    def destinations(self):
+        """Return the destinations of the I-Am requests sent so far."""
+        requests, self.requests = self.requests, []
+        return [str(apdu.pduDestination) for apdu in requests]
+
+
+@bacpypes_debugging
+class TestIAmSuppression(unittest.TestCase):
+
+    def setUp(self):
+        reset_time_machine()
+
+    def test_encoded(self):
+        if _debug: TestIAmSuppression._debug("test_encoded")
+
+        app = IAmApplication()
+        app.i_am()
+        app.i_am()
+        data = app._i_am_data
+
+        # the same contents each time, encoded once
+        iams = []
+        for apdu in app.requests:
+            iam = IAmRequest()
+            iam.decode(apdu)
+            iams.append(iam)
+        assert iams[0].iAmDeviceIdentifier == ('device', 20)
+        assert iams[1].vendorID == 999
+        assert app._i_am_data is data
+
+        # encoded again when the device object changes
+        app.localDevice.vendorIdentifier = 15
+        assert app._i_am_data is None
+
+        app.i_am()
+        iam = IAmRequest()
+        iam.decode(app.requests[-1])
+        assert iam.vendorID == 15
+
+    def test_delay(self):
+        if _debug: TestIAmSuppression._debug("test_delay")
+
+        app = IAmApplication()
+
+        # answered right away when asked directly
+        app.who_is_from("1", Address("20"))
+        assert app.destinations() == ["1"]
+
+        # answered a little later when asked with a broadcast
+        app.who_is_from("2")
+        app.who_is_from("3")
+        assert not app.requests
+        run_time_machine(app.i_am_max_delay + 0.1)
+        assert sorted(app.destinations()) == ["2", "3"]
+
+    def test_requester(self):
+        if _debug: TestIAmSuppression._debug("test_requester")
+
+        app = IAmApplication()
+        app.i_am_max_delay = 0.0
+
+        # a looping requester is answered once a second
+        for i in range(20):
+            app.who_is_from("1")
+            run_time_machine(0.1)
+        assert app.destinations() == ["1", "1"]
+        assert app.i_am_suppressed == 18
+
+    def test_storm(self):
+        if _debug: TestIAmSuppression._debug("test_storm")
+
+        app = IAmApplication()
+
+        # lots of requesters at once get one broadcast
+        for i in range(50):
+            app.who_is_from(str(i + 1))
+        run_time_machine(1.0)
+        assert app.destinations() == [str(GlobalBroadcast())]
+        assert app.i_am_sent == 1
+
+        # and not again for a while
+        app.who_is_from("1")
+        run_time_machine(0.1)
+        assert not app.requests
+
+    def test_rate(self):
+        if _debug: TestIAmSuppression._debug("test_rate")
+
+        app = IAmApplication()
+        app.i_am_max_delay = 0.0
+        app.i_am_rate = 1.0
+        app.i_am_burst = 2
+        app._i_am_tokens = 2.0
+
+        # the first ones go out right away, the rest wait and are
+        # answered together
+        for i in range(4):
+            app.who_is_from(str(i + 1), Address("20"))
+        assert app.destinations() == ["1", "2"]
+
+        run_time_machine(0.9)
+        assert not app.requests
+        run_time_machine(0.2)
+        assert app.destinations() == [str(GlobalBroadcast())]
+
+
 @bacpypes_debugging
 class TestWhoHasIHave(unittest.TestCase):
 
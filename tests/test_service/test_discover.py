@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test Discovery Services
+-----------------------
+"""
+
+import unittest
+
+from bacpypes.debugging import bacpypes_debugging, ModuleLogger
+
+from bacpypes.capability import Collector
+from bacpypes.pdu import Address
+from bacpypes.apdu import IAmRequest
+from bacpypes.task import TaskManager
+
+from bacpypes.app import DeviceInfoCache
+from bacpypes.service.device import WhoIsIAmServices
+from bacpypes.service.discover import WhoIsDiscovery
+
+from ..time_machine import reset_time_machine, run_time_machine
+
+# some debugging
+_debug = 0
+_log = ModuleLogger(globals())
+
+
+@bacpypes_debugging
+class DeviceSite(Collector, WhoIsIAmServices):
+
+    """Answer Who-Is requests for a set of devices, when too many answer at
+    once the rest of the responses are lost."""
+
+    def __init__(self, instances, buffer_size=150):
+        if _debug: DeviceSite._debug("__init__ %r buffer_size=%r", len(instances), buffer_size)
+
+        self.localDevice = None
+        self.deviceInfoCache = DeviceInfoCache()
+        Collector.__init__(self)
+
+        self.instances = sorted(instances)
+        self.buffer_size = buffer_size
+        self.lost_requests = 0
+        self.requests = []
+
+    def request(self, apdu):
+        if _debug: DeviceSite._debug("request %r", apdu)
+
+        low_limit = apdu.deviceInstanceRangeLowLimit
+        high_limit = apdu.deviceInstanceRangeHighLimit
+        self.requests.append((TaskManager().get_time(), low_limit, high_limit))
+
+        if self.lost_requests:
+            self.lost_requests -= 1
+            return
+
+        responses = [instance for instance in self.instances
+            if (low_limit is None) or (low_limit <= instance <= high_limit)]
+        for instance in responses[:self.buffer_size]:
+            i_am = IAmRequest(
+                iAmDeviceIdentifier=('device', instance),
+                maxAPDULengthAccepted=1476,
+                segmentationSupported='segmentedBoth',
+                vendorID=15,
+                )
+            i_am.pduSource = Address("%d:%d" % (instance // 250 + 1, instance % 250 + 1))
+            self.do_IAmRequest(i_am)
+
+
+@bacpypes_debugging
+class Discovery(WhoIsDiscovery):
+
+    def __init__(self, *args, **kwargs):
+        WhoIsDiscovery.__init__(self, *args, **kwargs)
+        self.found_devices = []
+        self.completed = False
+
+    def found(self, device_instance, address):
+        self.found_devices.append(device_instance)
+
+    def complete(self):
+        self.completed = True
+
+
+@bacpypes_debugging
+class TestWhoIsDiscovery(unittest.TestCase):
+
+    def setUp(self):
+        reset_time_machine()
+
+    def test_discover(self):
+        if _debug: TestWhoIsDiscovery._debug("test_discover")
+
+        instances = list(range(1000, 3000)) + [5, 70000, 4000000]
+        site = DeviceSite(instances)
+        discovery = Discovery(site)
+        discovery.start()
+        run_time_machine(3600.0)
+
+        # every device is found and in the cache
+        assert discovery.completed
+        assert discovery.coverage() == 1.0
+        assert sorted(discovery.found_devices) == sorted(instances)
+        for instance in instances:
+            assert site.deviceInfoCache.has_device_info(instance)
+
+        # finished looking, without too many requests
+        assert not site.device_discoveries
+        assert len(site.requests) < 100
+
+    def test_pacing(self):
+        if _debug: TestWhoIsDiscovery._debug("test_pacing")
+
+        site = DeviceSite(range(0, 4000))
+        discovery = Discovery(site, low_limit=0, high_limit=3999, span=100, response_rate=50.0)
+        discovery.start()
+        run_time_machine(600.0)
+        assert discovery.completed
+        assert len(discovery.found_devices) == 4000
+
+        # once the density is known there is time for the responses, every
+        # instance is a device
+        times = [when for when, low_limit, high_limit in site.requests]
+        sizes = [high_limit - low_limit + 1 for when, low_limit, high_limit in site.requests]
+        for i in range(5, len(times) - 1):
+            assert times[i + 1] - times[i] >= min(sizes[i], 150) / 50.0 - 0.001
+
+    def test_retry(self):
+        if _debug: TestWhoIsDiscovery._debug("test_retry")
+
+        site = DeviceSite([10])
+        site.lost_requests = 1
+        discovery = Discovery(site, low_limit=0, high_limit=99, span=100)
+        discovery.start()
+        run_time_machine(60.0)
+
+        # asked again
+        assert discovery.completed
+        assert discovery.found_devices == [10]
+        assert [(low_limit, high_limit) for when, low_limit, high_limit in site.requests] == \
+            [(0, 99), (0, 99)]
+
+    def test_stop(self):
+        if _debug: TestWhoIsDiscovery._debug("test_stop")
+
+        site = DeviceSite(range(1000, 3000))
+        discovery = Discovery(site)
+        discovery.start()
+        run_time_machine(10.0)
+
+        discovery.stop()
+        requests = len(site.requests)
+        run_time_machine(3600.0)
+
+        assert len(site.requests) == requests
+        assert not discovery.completed
+        assert 0.0 < discovery.coverage() < 1.0
@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test Polling Services
+---------------------
+"""
+
+import unittest
+
+from bacpypes.debugging import bacpypes_debugging, ModuleLogger
+
+from bacpypes.capability import Collector
+from bacpypes.pdu import Address
+from bacpypes.basetypes import ErrorType
+from bacpypes.iocb import IOCB
+from bacpypes.task import TaskManager
+
+from bacpypes.app import DeviceInfoCache
+from bacpypes.service.read import ReadPointListServices
+from bacpypes.service.poll import PointPoller
+
+from ..time_machine import reset_time_machine, run_time_machine
+
+# some debugging
+_debug = 0
+_log = ModuleLogger(globals())
+
+
+@bacpypes_debugging
+class PointSource(Collector, ReadPointListServices):
+
+    """Answer reads from a dictionary of values, right away or when the
+    test says so."""
+
+    def __init__(self, auto=True):
+        if _debug: PointSource._debug("__init__ auto=%r", auto)
+
+        self.localDevice = None
+        self.deviceInfoCache = DeviceInfoCache()
+        Collector.__init__(self)
+
+        self.auto = auto
+        self.values = {}
+        self.reads = []
+        self.pending = []
+
+    def read_points(self, points):
+        if _debug: PointSource._debug("read_points %r", points)
+
+        points = [self.normalize_point(point) for point in points]
+        self.reads.append((TaskManager().get_time(), points))
+
+        iocbs = [IOCB(point) for point in points]
+        if self.auto:
+            self.respond(iocbs)
+        else:
+            self.pending.extend(iocbs)
+
+        return iocbs
+
+    def respond(self, iocbs=None):
+        if iocbs is None:
+            iocbs, self.pending = self.pending, []
+
+        for iocb in iocbs:
+            value = self.values.get(iocb.args[0][1:3], None)
+            if value is None:
+                iocb.abort(ErrorType(errorClass='object', errorCode='unknownObject'))
+            else:
+                iocb.complete(value)
+
+
+def present_value(instance, address="1"):
+    return (address, ('analogValue', instance), 'presentValue')
+
+
+@bacpypes_debugging
+class Consumer:
+
+    def __init__(self):
+        self.changes = []
+
+    def __call__(self, point, value, error):
+        if _debug: Consumer._debug("__call__ %r %r %r", point, value, error)
+        self.changes.append((point[1][1], value, error))
+
+
+@bacpypes_debugging
+class TestPointPoller(unittest.TestCase):
+
+    def setUp(self):
+        reset_time_machine()
+
+    def test_intervals(self):
+        if _debug: TestPointPoller._debug("test_intervals")
+
+        source = PointSource()
+        poller = PointPoller(source, max_outstanding=10)
+        consumer = Consumer()
+
+        poller.add_point(present_value(1), 1000, consumer)
+        poller.add_point(present_value(2), 5000, consumer)
+        run_time_machine(20.0)
+
+        # read at their own intervals
+        counts = {}
+        for when, points in source.reads:
+            for point in points:
+                counts[point[1][1]] = counts.get(point[1][1], 0) + 1
+        assert counts[1] in (19, 20, 21)
+        assert counts[2] in (3, 4, 5)
+
+    def test_spread(self):
+        if _debug: TestPointPoller._debug("test_spread")
+
+        source = PointSource()
+        poller = PointPoller(source, coalesce=0.0, max_outstanding=100)
+        consumer = Consumer()
+
+        # devices with one point each
+        for i in range(100):
+            poller.add_point(present_value(1, str(i + 1)), 1000, consumer)
+        run_time_machine(1.5)
+
+        # they do not all go at once
+        times = set(when for when, points in source.reads)
+        assert len(times) > 50
+
+    def test_coalesce(self):
+        if _debug: TestPointPoller._debug("test_coalesce")
+
+        source = PointSource()
+        poller = PointPoller(source, coalesce=1.0, max_outstanding=10)
+        consumer = Consumer()
+
+        for i in range(20):
+            poller.add_point(present_value(i), 1000, consumer)
+        run_time_machine(10.0)
+
+        # points due soon are read along with the others
+        assert len(source.reads) <= 11
+
+    def test_changes(self):
+        if _debug: TestPointPoller._debug("test_changes")
+
+        source = PointSource()
+        source.values[(('analogValue', 1), 'presentValue')] = 1.0
+
+        poller = PointPoller(source)
+        consumer = Consumer()
+        poller.add_point(present_value(1), 1000, consumer)
+        poller.add_point(present_value(2), 1000, consumer)
+
+        run_time_machine(5.0)
+        assert len(source.reads) >= 4
+
+        # delivered once, the error too
+        assert sorted(change[:2] for change in consumer.changes) == [(1, 1.0), (2, None)]
+        assert [change[2].errorCode for change in consumer.changes if change[0] == 2] == ['unknownObject']
+
+        # the value changes
+        del consumer.changes[:]
+        source.values[(('analogValue', 1), 'presentValue')] = 2.0
+        source.values[(('analogValue', 2), 'presentValue')] = 3.0
+        run_time_machine(5.0)
+        assert sorted(consumer.changes) == [(1, 2.0, None), (2, 3.0, None)]
+
+        # a new subscriber gets the value right away
+        other = Consumer()
+        poller.add_point(present_value(1), 1000, other)
+        assert other.changes == [(1, 2.0, None)]
+
+    def test_remove(self):
+        if _debug: TestPointPoller._debug("test_remove")
+
+        source = PointSource()
+        poller = PointPoller(source)
+        consumer = Consumer()
+        other = Consumer()
+
+        poller.add_point(present_value(1), 1000, consumer)
+        poller.add_point(present_value(1), 500, other)
+        run_time_machine(5.0)
+        assert 9 <= len(source.reads) <= 11
+
+        # back to the longer interval
+        poller.remove_point(present_value(1), other)
+        del source.reads[:]
+        run_time_machine(5.0)
+        assert 4 <= len(source.reads) <= 6
+
+        # no longer read
+        poller.remove_point(present_value(1))
+        del source.reads[:]
+        run_time_machine(5.0)
+        assert not source.reads
+
+        with self.assertRaises(RuntimeError):
+            poller.remove_point(present_value(1))
+
+    def test_outstanding(self):
+        if _debug: TestPointPoller._debug("test_outstanding")
+
+        source = PointSource(auto=False)
+        poller = PointPoller(source, coalesce=0.0, max_outstanding=2)
+        consumer = Consumer()
+
+        for i in range(10):
+            poller.add_point(present_value(i), 1000, consumer)
+
+        # the device is slow, only two requests at a time
+        run_time_machine(5.0)
+        assert len(source.reads) == 2
+
+        # the rest go when they come back
+        source.respond()
+        run_time_machine(0.1)
+        assert len(source.reads) > 2
+        assert len(set(point for when, points in source.reads for point in points)) == 10
+
+        # and they are late
+        assert poller.late_count
+        assert poller.max_lag > 500.0
+
+    def test_request_rate(self):
+        if _debug: TestPointPoller._debug("test_request_rate")
+
+        source = PointSource()
+        poller = PointPoller(source, coalesce=0.0, request_rate=2.0, max_outstanding=10)
+        poller.request_rate_by_address[Address("2")] = 10.0
+        consumer = Consumer()
+
+        for i in range(10):
+            poller.add_point(present_value(i, "1"), 1000, consumer)
+            poller.add_point(present_value(i, "2"), 1000, consumer)
+        run_time_machine(10.0)
+
+        # no faster than the rate
+        for address, rate in ((Address("1"), 2.0), (Address("2"), 10.0)):
+            times = [when for when, points in source.reads if points[0][0] == address]
+            for previous, when in zip(times, times[1:]):
+                assert when - previous >= (1.0 / rate) - 0.000001
+            assert len(times) <= (10.0 * rate) + 1
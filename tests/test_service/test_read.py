@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test Read Services
+------------------
+"""
+
+import unittest
+
+from bacpypes.debugging import bacpypes_debugging, ModuleLogger
+
+from bacpypes.capability import Collector
+from bacpypes.pdu import Address
+from bacpypes.primitivedata import Unsigned, Real, CharacterString
+from bacpypes.constructeddata import Any
+from bacpypes.basetypes import ErrorType
+from bacpypes.apdu import ReadPropertyRequest, ReadPropertyACK, \
+    ReadPropertyMultipleRequest, ReadPropertyMultipleACK, \
+    ReadAccessResult, ReadAccessResultElement, ReadAccessResultElementChoice, \
+    RejectPDU, AbortPDU
+
+from bacpypes.iocb import IDLE
+from bacpypes.app import DeviceInfoCache
+from bacpypes.local.device import LocalDeviceObject
+from bacpypes.service.read import ReadPointListServices
+
+# some debugging
+_debug = 0
+_log = ModuleLogger(globals())
+
+
+@bacpypes_debugging
+class PointReader(Collector, ReadPointListServices):
+
+    """Keep the requests instead of sending them."""
+
+    def __init__(self, localDevice=None):
+        if _debug: PointReader._debug("__init__ %r", localDevice)
+
+        self.localDevice = localDevice
+        self.deviceInfoCache = DeviceInfoCache()
+        self.requests = []
+
+        Collector.__init__(self)
+
+    def add_device(self, address, **kwargs):
+        device_info = self.deviceInfoCache.get_device_info(Address(address))
+        for attr, value in kwargs.items():
+            setattr(device_info, attr, value)
+
+    def request_io(self, iocb):
+        if _debug: PointReader._debug("request_io %r", iocb)
+
+        self.requests.append(iocb)
+
+
+def present_values(count, address="1", object_type='analogValue'):
+    """Return a list of present value points."""
+    return [(address, (object_type, i), 'presentValue') for i in range(count)]
+
+def read_ack(*results):
+    """Build an ack from (object identifier, property identifier, value)
+    tuples, the value is an ErrorType for an access error."""
+    read_access_result_list = []
+    for objid, propid, value in results:
+        if isinstance(value, ErrorType):
+            read_result = ReadAccessResultElementChoice(propertyAccessError=value)
+        else:
+            read_result = ReadAccessResultElementChoice(propertyValue=Any(value))
+
+        if (not read_access_result_list) or (read_access_result_list[-1].objectIdentifier != objid):
+            read_access_result_list.append(ReadAccessResult(
+                objectIdentifier=objid,
+                listOfResults=[],
+                ))
+        read_access_result_list[-1].listOfResults.append(ReadAccessResultElement(
+            propertyIdentifier=propid,
+            readResult=read_result,
+            ))
+
+    return ReadPropertyMultipleACK(listOfReadAccessResults=read_access_result_list)
+
+
+@bacpypes_debugging
+class TestPlanRead(unittest.TestCase):
+
+    def test_group(self):
+        if _debug: TestPlanRead._debug("test_group")
+
+        reader = PointReader()
+        batches = reader.plan_read([
+            ("1", ('analogValue', 1), 'presentValue'),
+            ("2", ('analogValue', 1), 'presentValue'),
+            ("1", ('binaryValue', 2), 'presentValue'),
+            ("1", ('analogValue', 1), 'statusFlags'),
+            ("1", ('analogValue', 1), 'presentValue'),
+            ("1", ('analogValue', 1), 'priorityArray', 8),
+            ])
+
+        # grouped by device then object, duplicates read once
+        assert batches == [
+            (Address("1"), [
+                (Address("1"), ('analogValue', 1), 'presentValue', None),
+                (Address("1"), ('analogValue', 1), 'statusFlags', None),
+                (Address("1"), ('analogValue', 1), 'priorityArray', 8),
+                (Address("1"), ('binaryValue', 2), 'presentValue', None),
+                ]),
+            (Address("2"), [
+                (Address("2"), ('analogValue', 1), 'presentValue', None),
+                ]),
+            ]
+
+    def test_normalize(self):
+        if _debug: TestPlanRead._debug("test_normalize")
+
+        reader = PointReader()
+        assert reader.normalize_point(("1", (2, 1), 85)) == \
+            (Address("1"), ('analogValue', 1), 'presentValue', None)
+
+        with self.assertRaises(ValueError):
+            reader.normalize_point(("1", ('analogValue', 1)))
+
+    def test_max_apdu(self):
+        if _debug: TestPlanRead._debug("test_max_apdu")
+
+        reader = PointReader()
+        reader.add_device("1", maxApduLengthAccepted=1476)
+        reader.add_device("2", maxApduLengthAccepted=128)
+
+        points = present_values(100, "1") + present_values(100, "2")
+        batches = reader.plan_read(points)
+
+        # every point once, in order
+        assert [point for address, batch in batches for point in batch] == \
+            [reader.normalize_point(point) for point in points]
+
+        # small devices need more requests
+        big_batches = [batch for address, batch in batches if address == Address("1")]
+        small_batches = [batch for address, batch in batches if address == Address("2")]
+        assert len(big_batches) < len(small_batches)
+
+        # each one fits
+        for address, batch in batches:
+            request_limit, response_limit = reader.get_read_limits(address)
+            response_size = 3
+            for point in batch:
+                response_size += 7 + reader.estimate_point_size(point)[1]
+            assert response_size <= response_limit
+
+    def test_segmented(self):
+        if _debug: TestPlanRead._debug("test_segmented")
+
+        local_device = LocalDeviceObject(
+            objectName="iut",
+            objectIdentifier=("device", 20),
+            maxApduLengthAccepted=480,
+            segmentationSupported='segmentedBoth',
+            maxSegmentsAccepted=4,
+            vendorIdentifier=999,
+            )
+        reader = PointReader(local_device)
+        reader.add_device("1", maxApduLengthAccepted=480, segmentationSupported='noSegmentation')
+        reader.add_device("2", maxApduLengthAccepted=480, segmentationSupported='segmentedBoth')
+
+        assert reader.get_read_limits(Address("1")) == (480, 480)
+        assert reader.get_read_limits(Address("2")) == (480, 1920)
+
+        # responses that can be segmented need fewer requests
+        unsegmented = reader.plan_read(present_values(200, "1"))
+        segmented = reader.plan_read(present_values(200, "2"))
+        assert len(segmented) < len(unsegmented)
+
+    def test_unsupported(self):
+        if _debug: TestPlanRead._debug("test_unsupported")
+
+        reader = PointReader()
+        reader.read_multiple_unsupported.add(Address("1"))
+
+        batches = reader.plan_read(present_values(3, "1"))
+        assert [len(batch) for address, batch in batches] == [1, 1, 1]
+
+
+@bacpypes_debugging
+class TestReadPoints(unittest.TestCase):
+
+    def test_read_multiple(self):
+        if _debug: TestReadPoints._debug("test_read_multiple")
+
+        reader = PointReader()
+        iocbs = reader.read_points([
+            ("1", ('analogValue', 1), 'presentValue'),
+            ("1", ('analogValue', 1), 'objectName'),
+            ("1", ('analogValue', 2), 'presentValue'),
+            ("1", ('analogValue', 1), 'presentValue'),
+            ])
+        assert len(iocbs) == 4
+        assert iocbs[0] is iocbs[3]
+
+        # one request for all of them
+        assert len(reader.requests) == 1
+        request = reader.requests[0].args[0]
+        assert isinstance(request, ReadPropertyMultipleRequest)
+        assert request.pduDestination == Address("1")
+        assert [spec.objectIdentifier for spec in request.listOfReadAccessSpecs] == \
+            [('analogValue', 1), ('analogValue', 2)]
+
+        reader.requests[0].complete(read_ack(
+            (('analogValue', 1), 'presentValue', Real(1.5)),
+            (('analogValue', 1), 'objectName', CharacterString("av1")),
+            (('analogValue', 2), 'presentValue', ErrorType(errorClass='object', errorCode='unknownObject')),
+            ))
+
+        assert iocbs[0].ioResponse == 1.5
+        assert iocbs[1].ioResponse == "av1"
+        assert iocbs[2].ioError.errorCode == 'unknownObject'
+
+    def test_missing_result(self):
+        if _debug: TestReadPoints._debug("test_missing_result")
+
+        reader = PointReader()
+        iocbs = reader.read_points(present_values(2))
+
+        reader.requests[0].complete(read_ack(
+            (('analogValue', 0), 'presentValue', Real(1.0)),
+            ))
+
+        assert iocbs[0].ioResponse == 1.0
+        assert isinstance(iocbs[1].ioError, RuntimeError)
+
+    def test_read_property(self):
+        if _debug: TestReadPoints._debug("test_read_property")
+
+        # a single point is read with ReadProperty
+        reader = PointReader()
+        iocb, = reader.read_points([("1", ('analogValue', 1), 'priorityArray', 0)])
+
+        request = reader.requests[0].args[0]
+        assert isinstance(request, ReadPropertyRequest)
+        assert request.propertyArrayIndex == 0
+
+        reader.requests[0].complete(ReadPropertyACK(
+            objectIdentifier=('analogValue', 1),
+            propertyIdentifier='priorityArray',
+            propertyArrayIndex=0,
+            propertyValue=Any(Unsigned(16)),
+            ))
+        assert iocb.ioResponse == 16
+
+    def test_not_supported(self):
+        if _debug: TestReadPoints._debug("test_not_supported")
+
+        reader = PointReader()
+        iocbs = reader.read_points(present_values(2))
+
+        # the device rejects ReadPropertyMultiple
+        reader.requests.pop(0).abort(RejectPDU(reason='unrecognizedService'))
+        assert Address("1") in reader.read_multiple_unsupported
+
+        # read one at a time
+        assert len(reader.requests) == 2
+        for i, request_iocb in enumerate(reader.requests):
+            request = request_iocb.args[0]
+            assert isinstance(request, ReadPropertyRequest)
+            request_iocb.complete(ReadPropertyACK(
+                objectIdentifier=request.objectIdentifier,
+                propertyIdentifier=request.propertyIdentifier,
+                propertyValue=Any(Real(i)),
+                ))
+
+        assert [iocb.ioResponse for iocb in iocbs] == [0.0, 1.0]
+
+        # later reads go straight to ReadProperty
+        del reader.requests[:]
+        reader.read_points(present_values(2))
+        assert [request_iocb.args[0].__class__ for request_iocb in reader.requests] == \
+            [ReadPropertyRequest, ReadPropertyRequest]
+
+    def test_split(self):
+        if _debug: TestReadPoints._debug("test_split")
+
+        reader = PointReader()
+        iocbs = reader.read_points(present_values(3))
+
+        # the response would need to be segmented
+        reader.requests.pop(0).abort(AbortPDU(reason='segmentationNotSupported'))
+
+        # half as ReadProperty, the other half as ReadPropertyMultiple
+        assert len(reader.requests) == 2
+        assert isinstance(reader.requests[0].args[0], ReadPropertyRequest)
+        assert isinstance(reader.requests[1].args[0], ReadPropertyMultipleRequest)
+        assert Address("1") not in reader.read_multiple_unsupported
+
+        reader.requests[1].complete(read_ack(
+            (('analogValue', 1), 'presentValue', Real(1.0)),
+            (('analogValue', 2), 'presentValue', Real(2.0)),
+            ))
+        assert iocbs[0].ioState == IDLE
+        assert iocbs[1].ioResponse == 1.0
+        assert iocbs[2].ioResponse == 2.0
+
+    def test_error(self):
+        if _debug: TestReadPoints._debug("test_error")
+
+        reader = PointReader()
+        iocbs = reader.read_points(present_values(2))
+
+        # other errors are passed along to every point
+        error = AbortPDU(reason='noResponse')
+        reader.requests.pop(0).abort(error)
+        assert not reader.requests
+        assert [iocb.ioError for iocb in iocbs] == [error, error]
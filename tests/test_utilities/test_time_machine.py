@@ -11,7 +11,8 @@ import unittest
 
 from bacpypes.debugging import bacpypes_debugging, ModuleLogger
 
-from bacpypes.task import OneShotTask, FunctionTask, RecurringTask
+from bacpypes.task import OneShotTask, FunctionTask, RecurringTask, \
+    TimingWheel, COMPACT_THRESHOLD
 from ..time_machine import TimeMachine, reset_time_machine, run_time_machine, \
     xdatetime
 
@@ -164,6 +165,62 @@ class TestTimeMachine(unittest.TestCase):
         # function called at correct time
         assert almost_equal(ft.process_task_called, [t1])
 
+    def test_one_shot_suspend(self):
+        if _debug: TestTimeMachine._debug("test_one_shot_suspend")
+
+        # create a pair of tasks
+        ft1 = SampleOneShotTask()
+        ft2 = SampleOneShotTask()
+
+        # reset the time machine, install the tasks, suspend one
+        reset_time_machine()
+        ft1.install_task(1.0)
+        ft2.install_task(2.0)
+        ft1.suspend_task()
+        assert not ft1.isScheduled
+        run_time_machine(60.0)
+
+        # only the second one called
+        assert ft1.process_task_called == []
+        assert almost_equal(ft2.process_task_called, [2.0])
+
+    def test_one_shot_reschedule(self):
+        if _debug: TestTimeMachine._debug("test_one_shot_reschedule")
+
+        # create a function task
+        ft = SampleOneShotTask()
+
+        # reset the time machine, install the task, move it around
+        reset_time_machine()
+        ft.install_task(5.0)
+        ft.install_task(1.0)
+        ft.install_task(3.0)
+        run_time_machine(60.0)
+
+        # function called once at the last time
+        assert almost_equal(ft.process_task_called, [3.0])
+
+    def test_suspend_compact(self):
+        if _debug: TestTimeMachine._debug("test_suspend_compact")
+
+        # create a lot of tasks
+        tasks = [SampleOneShotTask() for i in range(COMPACT_THRESHOLD * 2)]
+
+        # reset the time machine, install the tasks, suspend all but one
+        reset_time_machine()
+        for i, ft in enumerate(tasks):
+            ft.install_task(i + 1.0)
+        for ft in tasks[:-1]:
+            ft.suspend_task()
+
+        # stale entries have been cleaned out
+        assert len(time_machine.tasks) <= COMPACT_THRESHOLD + 1
+        run_time_machine(len(tasks) + 1.0)
+
+        # only the last one called
+        assert all(ft.process_task_called == [] for ft in tasks[:-1])
+        assert almost_equal(tasks[-1].process_task_called, [len(tasks)])
+
     def test_function_task_immediate(self):
         if _debug: TestTimeMachine._debug("test_function_task_immediate")
         global sample_task_function_called
@@ -277,3 +334,92 @@ class TestTimeMachine(unittest.TestCase):
         # function called every day
         assert len(ft.process_task_called) == 31
 
+
+
+@bacpypes_debugging
+class TestTimingWheel(unittest.TestCase):
+
+    def setup_method(self, method):
+        if _debug: TestTimingWheel._debug("setup_method %r", method)
+
+        # reset the time machine and use a small wheel
+        reset_time_machine()
+        time_machine.wheel = TimingWheel(tick=0.1, slot_bits=2, levels=2)
+
+    def teardown_method(self, method):
+        if _debug: TestTimingWheel._debug("teardown_method %r", method)
+
+        # back to just the heap
+        time_machine.wheel = None
+
+    def test_wheel_order(self):
+        if _debug: TestTimingWheel._debug("test_wheel_order")
+
+        # create tasks in and beyond the wheel, install them out of order
+        tasks = [SampleOneShotTask() for i in range(5)]
+        for ft, when in zip(tasks, [3.0, 0.25, 1000.0, 0.2, 1.75]):
+            ft.install_task(when)
+
+        # most of them are in the wheel rather than the heap
+        assert len(time_machine.wheel) == 5
+        assert time_machine.tasks == []
+        run_time_machine(2000.0)
+
+        # each one called at exactly the right time
+        assert almost_equal(tasks[0].process_task_called, [3.0])
+        assert almost_equal(tasks[1].process_task_called, [0.25])
+        assert almost_equal(tasks[2].process_task_called, [1000.0])
+        assert almost_equal(tasks[3].process_task_called, [0.2])
+        assert almost_equal(tasks[4].process_task_called, [1.75])
+
+    def test_wheel_suspend_reschedule(self):
+        if _debug: TestTimingWheel._debug("test_wheel_suspend_reschedule")
+
+        # create some tasks
+        ft1 = SampleOneShotTask()
+        ft2 = SampleOneShotTask()
+
+        # install them, suspend one and move the other
+        ft1.install_task(1.0)
+        ft2.install_task(2.0)
+        ft1.suspend_task()
+        ft2.install_task(0.5)
+        run_time_machine(60.0)
+
+        # only the second one called at its new time
+        assert ft1.process_task_called == []
+        assert almost_equal(ft2.process_task_called, [0.5])
+
+    def test_wheel_recurring(self):
+        if _debug: TestTimingWheel._debug("test_wheel_recurring")
+
+        # create a recurring task
+        ft = SampleRecurringTask()
+
+        # install the task, let it run
+        ft.install_task(1000.0)
+        run_time_machine(5.0)
+
+        # function called, 5 seconds have passed
+        assert almost_equal(ft.process_task_called, [1.0, 2.0, 3.0, 4.0])
+        assert time_machine.current_time == 5.0
+
+    def test_wheel_compact(self):
+        if _debug: TestTimingWheel._debug("test_wheel_compact")
+
+        # create a lot of tasks
+        tasks = [SampleOneShotTask() for i in range(COMPACT_THRESHOLD * 2)]
+
+        # install the tasks, suspend all but one
+        for i, ft in enumerate(tasks):
+            ft.install_task(i + 1.0)
+        for ft in tasks[:-1]:
+            ft.suspend_task()
+
+        # stale entries have been cleaned out
+        assert len(time_machine.wheel) <= COMPACT_THRESHOLD + 1
+        run_time_machine(len(tasks) + 1.0)
+
+        # only the last one called
+        assert all(ft.process_task_called == [] for ft in tasks[:-1])
+        assert almost_equal(tasks[-1].process_task_called, [len(tasks)])
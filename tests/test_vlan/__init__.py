@@ -9,4 +9,5 @@ This module tests the VLAN networking.
 
 from . import test_network
 from . import test_ipnetwork
+from . import test_priority
 
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Test Network Priority
+---------------------
+
+This module floods a rate limited VLAN with normal priority traffic and
+checks that urgent, critical equipment and life safety messages are still
+delivered promptly.
+"""
+
+import unittest
+
+from bacpypes.debugging import bacpypes_debugging, ModuleLogger, btox, xtob
+
+from bacpypes.pdu import PDU
+from bacpypes.comm import Client, bind
+from bacpypes.vlan import Network, Node
+
+from ..time_machine import reset_time_machine, run_time_machine, current_time
+
+# some debugging
+_debug = 0
+_log = ModuleLogger(globals())
+
+# network delivers this many PDUs per second
+RATE = 100.0
+
+# number of normal priority PDUs in the flood
+FLOOD = 1000
+
+
+@bacpypes_debugging
+class Recorder(Client):
+
+    """Save the PDUs it receives and the time they were received."""
+
+    def __init__(self):
+        if _debug: Recorder._debug("__init__")
+        Client.__init__(self)
+
+        self.received = []
+
+    def send(self, pdu):
+        if _debug: Recorder._debug("send %r", pdu)
+
+        self.request(pdu)
+
+    def confirmation(self, pdu):
+        if _debug: Recorder._debug("confirmation %r", pdu)
+
+        self.received.append((current_time(), pdu))
+
+
+@bacpypes_debugging
+class TestNetworkPriority(unittest.TestCase):
+
+    def setup_method(self, method):
+        if _debug: TestNetworkPriority._debug("setup_method %r", method)
+
+        # a slow network with a sender and a receiver
+        self.vlan = Network(broadcast_address=0, rate=RATE)
+
+        self.sender = Recorder()
+        bind(self.sender, Node(1, self.vlan))
+
+        self.receiver = Recorder()
+        bind(self.receiver, Node(2, self.vlan))
+
+    def test_fifo_within_priority(self):
+        if _debug: TestNetworkPriority._debug("test_fifo_within_priority")
+
+        # reset the time machine, send a few
+        reset_time_machine()
+        for i in range(10):
+            self.sender.send(PDU(xtob('%02x' % (i,)), destination=2))
+        run_time_machine(60.0)
+
+        # received in order, one delivery time apart
+        assert [btox(pdu.pduData) for when, pdu in self.receiver.received] == ['%02x' % (i,) for i in range(10)]
+        when = [when for when, pdu in self.receiver.received]
+        assert abs((when[-1] - when[0]) - 9 / RATE) < 0.000001
+
+    def test_priority_under_flood(self):
+        if _debug: TestNetworkPriority._debug("test_priority_under_flood")
+
+        # reset the time machine
+        reset_time_machine()
+
+        # saturate the network with normal priority traffic
+        for i in range(FLOOD):
+            self.sender.send(PDU(b'normal', destination=2))
+
+        # the urgent messages are behind the whole flood
+        for priority in (1, 2, 3):
+            self.sender.send(PDU(b'urgent', destination=2, networkPriority=priority))
+        run_time_machine(60.0)
+
+        # everything was delivered
+        received = self.receiver.received
+        assert len(received) == FLOOD + 3
+
+        # higher priorities jump the queue, life safety first, and are
+        # delivered within the time it takes to send a few PDUs
+        urgent = [(when, pdu.pduNetworkPriority) for when, pdu in received if pdu.pduNetworkPriority]
+        assert [priority for when, priority in urgent] == [3, 2, 1]
+        assert all(when <= 4 / RATE for when, priority in urgent)
+
+        # the flood takes its time
+        assert received[-1][0] >= (FLOOD - 1) / RATE
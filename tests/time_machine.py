@@ -7,7 +7,6 @@ Testing Time Machine
 
 import re
 import time
-from heapq import heappop
 
 from bacpypes.debugging import bacpypes_debugging, ModuleLogger
 
@@ -85,12 +84,13 @@ class TimeMachine(_TaskManager):
             if _debug: TimeMachine._debug("    - time limit reached or exceeded")
             return False
 
-        if not self.tasks:
+        # peek at the next task and see when it is supposed to run
+        entry = self.peek_task()
+        if not entry:
             if _debug: TimeMachine._debug("    - no more tasks")
             return False
 
-        # peek at the next task and see when it is supposed to run
-        when, task = self.tasks[0]
+        when, task = entry
         if when >= self.time_limit:
             if _debug: TimeMachine._debug("    - next task at or exceeds time limit")
             return False
@@ -114,12 +114,12 @@ class TimeMachine(_TaskManager):
         if (self.time_limit is not None) and (self.current_time >= self.time_limit):
             if _debug: TimeMachine._debug("    - time limit reached")
 
-        elif not self.tasks:
+        elif not self.peek_task():
             if _debug: TimeMachine._debug("    - no more tasks")
 
         else:
             # peek at the next task and see when it is supposed to run
-            when, _ = self.tasks[0]
+            when, _ = self.peek_task()
             if when >= self.time_limit:
                 if _debug: TimeMachine._debug("    - time limit reached")
 
@@ -127,13 +127,10 @@ class TimeMachine(_TaskManager):
                 self.current_time = self.time_limit
 
             else:
-                # pull it off the list
-                when, task = heappop(self.tasks)
+                # pull it off the list, it is no longer scheduled
+                when, task = self.pop_task()
                 if _debug: TimeMachine._debug("    - when, task: %r, %s", when, task)
 
-                # mark that it is no longer scheduled
-                task.isScheduled = False
-
                 # advance the time
                 self.current_time = when
 
@@ -254,6 +251,7 @@ def reset_time_machine(start_time=0.0):
 
     # begin time at the beginning
     time_machine.tasks = []
+    time_machine.stale_tasks = 0
     time_machine.current_time = start_time
     time_machine.time_limit = None
 